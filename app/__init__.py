@@ -8,24 +8,30 @@ from pathlib import Path
 from datetime import datetime
 import asyncio
 import os
+import sys
 
-from hook.babel_doc_hook import hook
 from .routers.upload import router as upload_router
 from .routers.translate import router as translate_router
 from .routers.tasks import router as tasks_router
 from .routers.download import router as download_router
+from .routers.metrics import router as metrics_router
+from .routers.health import router as health_router
 from core.config import UPLOADS_DIR, OUTPUTS_DIR, MAINTENANCE_ENABLED, MAINTENANCE_INTERVAL_SECONDS, MAINTENANCE_DELETE_ORPHANS
-from app.repositories.history_repository import list_tasks as repo_list_tasks, mark_task_invalid, save_or_update_history as repo_save_or_update, get_task_full as repo_get_task_full
-from app.db import init_db
+from app.repositories.history_repository import list_tasks as repo_list_tasks, mark_task_invalid, save_or_update_history as repo_save_or_update, get_task_full as repo_get_task_full, backfill_history_columns
+from app.db import init_db, run_db, run_db_write, shutdown_db_executors
 from app.services.translation_service import active_translations, active_tasks, schedule_translation, drain_queue
+from app.services.retention_service import run_retention
 from app.schemas import TranslationRequest
 
+# 旧记录回填的每批条数
+_BACKFILL_BATCH = 500
+
 
 def create_app() -> FastAPI:
-    """应用工厂：创建并配置 FastAPI 应用，注册路由与中间件"""
-    # 执行外部库 hook
-    hook()
+    """应用工厂：创建并配置 FastAPI 应用，注册路由与中间件
 
+    不在此处导入 BabelDOC 与图片处理依赖：外部库 hook 在首个翻译任务构建配置时（或启动预热中）安装。
+    """
     app = FastAPI(title="Pdf Translate API", version="1.0.0")
     app.add_middleware(
         CORSMiddleware,
@@ -40,6 +46,8 @@ def create_app() -> FastAPI:
     app.include_router(translate_router, prefix="/api")
     app.include_router(tasks_router, prefix="/api")
     app.include_router(download_router, prefix="/api")
+    app.include_router(metrics_router, prefix="/api")
+    app.include_router(health_router, prefix="/api")
     
     # 前端静态托管（如果存在导出目录）。可通过环境变量 FRONTEND_OUT_DIR 指定目录，默认 front/out。
     try:
@@ -107,7 +115,7 @@ def create_app() -> FastAPI:
         fixed_running_completed = 0
 
         try:
-            tasks = repo_list_tasks()
+            tasks = await run_db(repo_list_tasks)
         except Exception:
             tasks = []
 
@@ -154,7 +162,7 @@ def create_app() -> FastAPI:
                 src = UPLOADS_DIR / f"{fid}.pdf"
                 if not src.exists() and status != "invalid":
                     try:
-                        if mark_task_invalid(task_id, "源文件缺失，任务已自动失效"):
+                        if await run_db_write(mark_task_invalid, task_id, "源文件缺失，任务已自动失效"):
                             invalid_tasks += 1
                     except Exception:
                         pass
@@ -174,7 +182,7 @@ def create_app() -> FastAPI:
                     mono = list(out_dir.glob(f"{fid}.*.mono.pdf"))
                     if mono:
                         try:
-                            repo_save_or_update({
+                            await run_db_write(repo_save_or_update, {
                                 "task_id": task_id,
                                 "status": "completed",
                                 "filename": fname,
@@ -190,6 +198,19 @@ def create_app() -> FastAPI:
 
         return deleted_orphans, invalid_tasks, fixed_running_completed
 
+    async def perform_retention():
+        """数据保留：分批清理超出保留策略的任务、输出目录与下载日志（先于维护扫描执行，扫描只覆盖保留下来的记录）。"""
+        try:
+            stats = await run_retention()
+            if stats.get("batches"):
+                print(
+                    f"[retention] tasks={stats['tasks']} (expired={stats['expired']}, over_quota={stats['over_quota']}), "
+                    f"download_logs={stats['download_logs']}, output_dirs={stats['output_dirs']}, "
+                    f"freed_bytes={stats['freed_bytes']}, batches={stats['batches']}, ms={stats['ms']} at {datetime.now().isoformat()}"
+                )
+        except Exception as e:
+            print(f"[retention] failed: {e} at {datetime.now().isoformat()}")
+
     @app.on_event("startup")
     async def on_startup():
         # 初始化数据库（确保 SQLModel 表结构就绪）
@@ -197,8 +218,30 @@ def create_app() -> FastAPI:
             init_db()
         except Exception:
             pass
+        # 升级前写入的任务记录：查询列在后台分批回填（每批一个短事务，经写线程与正常写入交替执行）
+        try:
+            async def _backfill_history():
+                last_task_id, backfilled = "", 0
+                while True:
+                    last_task_id, n = await run_db_write(backfill_history_columns, last_task_id, _BACKFILL_BATCH)
+                    backfilled += n
+                    if n < _BACKFILL_BATCH:
+                        break
+                if backfilled:
+                    print(f"[migrate] backfilled_history_rows={backfilled} at {datetime.now().isoformat()}")
+
+            app.state._backfill_task = asyncio.create_task(_backfill_history())
+        except Exception:
+            pass
+        # 启动预热（后台线程，不阻塞启动）：字体、共享布局模型、OCR 引擎与图片工作进程；/api/ready 报告进度
+        try:
+            from core.model_warmup import start_warmup
+            start_warmup()
+        except Exception:
+            pass
         # 启动时立即执行一次维护
         try:
+            await perform_retention()
             d, i, f = await perform_maintenance()
             print(f"[maintenance] deleted_orphan_files={d}, invalid_tasks={i}, fixed_running_completed={f} at {datetime.now().isoformat()}")
         except Exception:
@@ -206,7 +249,7 @@ def create_app() -> FastAPI:
 
         # 启动时恢复未完成的任务：running/queued 且进度 < 100，按创建时间入队/启动
         try:
-            tasks = repo_list_tasks()
+            tasks = await run_db(repo_list_tasks)
             resumed_running = 0
             resumed_queued = 0
             for t in tasks:
@@ -220,7 +263,7 @@ def create_app() -> FastAPI:
                     # 获取完整记录以还原配置
                     full = {}
                     try:
-                        full = repo_get_task_full(task_id)
+                        full = await run_db(repo_get_task_full, task_id)
                     except Exception:
                         full = {}
                     data = full.get("data") or {}
@@ -287,6 +330,7 @@ def create_app() -> FastAPI:
                     while True:
                         try:
                             await asyncio.sleep(MAINTENANCE_INTERVAL_SECONDS)
+                            await perform_retention()
                             d, i, f = await perform_maintenance()
                             print(f"[maintenance] deleted_orphan_files={d}, invalid_tasks={i}, fixed_running_completed={f} at {datetime.now().isoformat()}")
                         except asyncio.CancelledError:
@@ -300,15 +344,34 @@ def create_app() -> FastAPI:
 
     @app.on_event("shutdown")
     async def on_shutdown():
-        # 关闭时取消定时任务
+        # 关闭时取消定时任务与未完成的回填
+        for name in ("_maintenance_task", "_backfill_task"):
+            try:
+                task = getattr(app.state, name, None)
+                if task:
+                    task.cancel()
+                    try:
+                        await task
+                    except (Exception, asyncio.CancelledError):
+                        pass
+            except Exception:
+                pass
+        # 关闭图片处理进程池（未加载过图片模块时无需关闭，也避免在关闭阶段导入整个图片处理栈）
         try:
-            task = getattr(app.state, "_maintenance_task", None)
-            if task:
-                task.cancel()
-                try:
-                    await task
-                except Exception:
-                    pass
+            image_pool = sys.modules.get("core.image_pool")
+            if image_pool is not None:
+                image_pool.shutdown_image_pool()
+        except Exception:
+            pass
+        # 写完审计日志队列（须在关闭数据库线程池之前）
+        try:
+            from app.services.audit_log import audit_log
+            await asyncio.to_thread(audit_log.close)
+        except Exception:
+            pass
+        # 等待已提交的数据库写入落库后关闭数据库线程池
+        try:
+            shutdown_db_executors()
         except Exception:
             pass
 
@@ -1,11 +1,30 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
-from typing import Generator
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Generator, Optional, TypeVar
 from pathlib import Path
 
+from sqlalchemy import Index, event, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
 from sqlmodel import SQLModel, Field, create_engine, Session
 
-from core.config import DB_PATH
+from core.config import (
+    DB_PATH,
+    DB_JOURNAL_MODE,
+    DB_SYNCHRONOUS,
+    DB_MMAP_SIZE_MB,
+    DB_BUSY_TIMEOUT_MS,
+    DB_POOL_SIZE,
+    DB_READ_WORKERS,
+)
+
+logger = logging.getLogger(__name__)
+T = TypeVar("T")
 
 
 # === 数据库与模型定义（SQLModel） ===
@@ -14,8 +33,46 @@ from core.config import DB_PATH
 DB_FILE = Path(DB_PATH).resolve()
 DB_URL = f"sqlite:///{DB_FILE}"
 
-# SQLite 在多线程环境下需要关闭 check_same_thread
-engine = create_engine(DB_URL, echo=False, connect_args={"check_same_thread": False})
+_JOURNAL_MODES = {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"}
+_SYNCHRONOUS_LEVELS = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+
+def _tune_sqlite_engine(target: Engine) -> Engine:
+    """为引擎的每个新连接设置 PRAGMA：WAL 下读者不被写者阻塞，synchronous=NORMAL 只在检查点时 fsync，
+    mmap 减少读路径的系统调用，busy_timeout 让并发写入等待锁而不是立即报 database is locked。
+    """
+    journal_mode = DB_JOURNAL_MODE if DB_JOURNAL_MODE in _JOURNAL_MODES else "WAL"
+    synchronous = DB_SYNCHRONOUS if DB_SYNCHRONOUS in _SYNCHRONOUS_LEVELS else "NORMAL"
+
+    @event.listens_for(target, "connect")
+    def _set_pragmas(dbapi_connection, _record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f"PRAGMA busy_timeout={int(DB_BUSY_TIMEOUT_MS)}")
+            cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+            cursor.execute(f"PRAGMA synchronous={synchronous}")
+            cursor.execute(f"PRAGMA mmap_size={int(DB_MMAP_SIZE_MB) * 1024 * 1024}")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+        finally:
+            cursor.close()
+
+    return target
+
+
+def create_db_engine(url: str = DB_URL) -> Engine:
+    """创建 SQLite 引擎：连接由连接池复用，PRAGMA 只在建立连接时执行一次。"""
+    # SQLite 在多线程环境下需要关闭 check_same_thread
+    return _tune_sqlite_engine(create_engine(
+        url,
+        echo=False,
+        connect_args={"check_same_thread": False},
+        poolclass=QueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_POOL_SIZE,
+    ))
+
+
+engine = create_db_engine()
 
 
 class TranslationHistory(SQLModel, table=True):
@@ -36,6 +93,19 @@ class TranslationHistory(SQLModel, table=True):
     data: str = Field(default="{}")
     created_at: str
     updated_at: str
+    # 从 data JSON 提升的查询列：由 save_or_update_history 同步写入，旧记录由 backfill_history_columns 分批回填
+    owner_ip: str | None = None
+    owner_token_hash: str | None = Field(default=None, index=True)
+    file_id: str | None = Field(default=None, index=True)
+    content_hash: str | None = Field(default=None, index=True)
+    translate_images_experimental: bool | None = None
+    image_text_overlay: bool | None = None
+
+    __table_args__ = (
+        # 任务列表按 (created_at, task_id) 倒序做游标分页；“仅本人”列表先按 owner_ip 过滤，过滤、排序与翻页都在索引内完成
+        Index("ix_translation_history_created_at_task_id", "created_at", "task_id"),
+        Index("ix_translation_history_owner_ip_created_at_task_id", "owner_ip", "created_at", "task_id"),
+    )
 
 
 class DownloadLog(SQLModel, table=True):
@@ -50,7 +120,8 @@ class DownloadLog(SQLModel, table=True):
     user_agent: str | None = None
     bytes_sent: int | None = 0
     success: int | None = 0
-    created_at: str | None = None
+    # 保留策略按时间清理旧日志
+    created_at: str | None = Field(default=None, index=True)
     finished_at: str | None = None
 
 
@@ -63,11 +134,53 @@ class Upload(SQLModel, table=True):
     user_ip: str | None = None
     user_agent: str | None = None
     upload_time: str | None = None
+    # 文件内容的 SHA-256（上传时流式计算）
+    content_hash: str | None = None
+    # 上传预检结果（见 core/pdf_preflight.py）：pending / ok / rejected
+    preflight_status: str | None = None
+    preflight_error: str | None = None
+    preflight_at: str | None = None
+    page_count: int | None = None
+    text_pages: int | None = None
+    text_chars: int | None = None
+    image_count: int | None = None
+    image_pixels: int | None = None
+    encrypted: int | None = None
+    estimated_tokens: int | None = None
+
+
+# 已被复合索引替换的旧索引：表名 -> 索引名。只删除这里列出的索引，运维手工添加的索引与新版本声明的索引不受影响
+_REPLACED_INDEXES = {
+    "translation_history": ("ix_translation_history_owner_ip_created_at",),
+}
+
+
+def _migrate_schema() -> None:
+    """为已存在的表补齐模型中新增的列与索引，并删除已被替换的旧索引。
+
+    SQLite 的 ADD COLUMN 只改表结构、不重写已有行，可在服务运行中执行；新增列的数据由各自的回填逻辑分批补齐。
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                col_type = column.type.compile(dialect=engine.dialect)
+                conn.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {col_type}')
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+            for name in _REPLACED_INDEXES.get(table.name, ()):
+                conn.exec_driver_sql(f'DROP INDEX IF EXISTS "{name}"')
 
 
 def init_db() -> None:
-    """初始化数据库表结构（若不存在则创建）。"""
+    """初始化数据库表结构（若不存在则创建），并为旧库补齐新增列与索引。"""
     SQLModel.metadata.create_all(engine)
+    _migrate_schema()
 
 
 def get_session() -> Generator[Session, None, None]:
@@ -76,10 +189,76 @@ def get_session() -> Generator[Session, None, None]:
         yield session
 
 
+# === 数据库执行器 ===
+# 仓储函数是同步的（SQLite 驱动不支持 asyncio），在事件循环中直接调用会阻塞所有请求直到提交完成。
+# 异步代码经 run_db / run_db_write 把调用交给专用线程：读取使用多个线程并发执行（WAL 下互不阻塞）；
+# 写入固定在单个线程按提交顺序执行——SQLite 同一时刻只允许一个写者，单线程写入既避免锁竞争，
+# 也保证同一任务的状态更新（排队 -> 运行 -> 进度 -> 完成）不会乱序落库。
+
+_executors_lock = threading.Lock()
+_read_executor: Optional[ThreadPoolExecutor] = None
+_write_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor(write: bool) -> ThreadPoolExecutor:
+    global _read_executor, _write_executor
+    with _executors_lock:
+        if write:
+            if _write_executor is None:
+                _write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-write")
+            return _write_executor
+        if _read_executor is None:
+            _read_executor = ThreadPoolExecutor(max_workers=DB_READ_WORKERS, thread_name_prefix="db-read")
+        return _read_executor
+
+
+async def run_db(fn: Callable[..., T], *args, **kwargs) -> T:
+    """在数据库读线程池中执行同步的仓储调用（只读查询）。"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(False), functools.partial(fn, *args, **kwargs))
+
+
+async def run_db_write(fn: Callable[..., T], *args, **kwargs) -> T:
+    """在数据库写线程中执行同步的仓储调用，与 submit_db_write 提交的写入共享同一顺序。"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(True), functools.partial(fn, *args, **kwargs))
+
+
+def _log_write_error(future: Future) -> None:
+    exc = future.exception()
+    if exc is not None:
+        logger.warning(f"后台数据库写入失败: {exc}")
+
+
+def submit_db_write(fn: Callable[..., object], *args, **kwargs) -> Future:
+    """提交一次写入但不等待（供同步代码使用，例如调度器更新任务状态）；调用方需传入数据快照。
+
+    同步代码中的写入也应经此提交（需要结果时调用 .result()）：与任务进度等写入在同一线程按顺序落库，不争用写锁。
+    """
+    future = _get_executor(True).submit(fn, *args, **kwargs)
+    future.add_done_callback(_log_write_error)
+    return future
+
+
+def shutdown_db_executors() -> None:
+    """关闭数据库线程池（等待已提交的写入完成）。"""
+    global _read_executor, _write_executor
+    with _executors_lock:
+        executors, _read_executor, _write_executor = (_read_executor, _write_executor), None, None
+    for executor in executors:
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
 __all__ = [
     "engine",
     "init_db",
     "get_session",
+    "create_db_engine",
+    "run_db",
+    "run_db_write",
+    "submit_db_write",
+    "shutdown_db_executors",
     "TranslationHistory",
     "DownloadLog",
     "Upload",
@@ -1,11 +1,15 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
+import base64
+import hashlib
 import json
+import threading
+import time
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 
-from sqlmodel import select
-from sqlalchemy import text, func, or_
+from sqlmodel import delete, select
+from sqlalchemy import text, func, or_, tuple_
 
 from app.db import (
     TranslationHistory,
@@ -15,6 +19,52 @@ from app.db import (
 )
 from sqlmodel import Session
 
+from core.config import TASKS_TOTAL_CACHE_SECONDS
+
+
+# 任务状态变化（新建、状态更新、失效、删除）的回调：进程内按任务缓存的数据（例如下载元数据）据此失效
+_task_change_listeners: List[Callable[[str], None]] = []
+
+
+def add_task_change_listener(fn: Callable[[str], None]) -> None:
+    if fn not in _task_change_listeners:
+        _task_change_listeners.append(fn)
+
+
+def _notify_task_change(task_ids) -> None:
+    for fn in list(_task_change_listeners):
+        for task_id in task_ids:
+            try:
+                fn(task_id)
+            except Exception:
+                pass
+
+
+def _hash_owner_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _apply_indexed_columns(obj: TranslationHistory, task_data: Dict) -> None:
+    """把 data JSON 中用于查询的字段同步到独立列；task_data 中缺失的字段不覆盖已有值（维护任务等只提交部分字段）。"""
+    fname = task_data.get("filename") or obj.filename or ""
+    fid = fname[:-4] if fname.endswith(".pdf") else fname
+    if fid:
+        obj.file_id = fid
+    if task_data.get("owner_ip") is not None:
+        obj.owner_ip = task_data.get("owner_ip")
+    if task_data.get("owner_token"):
+        obj.owner_token_hash = _hash_owner_token(task_data["owner_token"])
+    if task_data.get("content_hash"):
+        obj.content_hash = task_data.get("content_hash")
+    cfg = task_data.get("config")
+    if isinstance(cfg, dict):
+        tie = cfg.get("translate_images_experimental")
+        if isinstance(tie, bool):
+            obj.translate_images_experimental = tie
+        ito = cfg.get("image_text_overlay")
+        if isinstance(ito, bool):
+            obj.image_text_overlay = ito
+
 
 def save_or_update_history(task_data: Dict, session: Session | None = None):
     """将任务状态写入数据库，若存在则更新（UPSERT）。
@@ -40,12 +90,14 @@ def save_or_update_history(task_data: Dict, session: Session | None = None):
         owns_session = True
     try:
         obj = session.get(TranslationHistory, task_id)
-        if not obj:
+        created = obj is None
+        if created:
             obj = TranslationHistory(
                 task_id=task_id,
                 created_at=now,
                 updated_at=now,
             )
+        status_changed = created or obj.status != task_data.get("status")
         # 更新字段
         obj.status = task_data.get("status")
         obj.filename = task_data.get("filename")
@@ -59,74 +111,126 @@ def save_or_update_history(task_data: Dict, session: Session | None = None):
         obj.error = task_data.get("error")
         obj.data = data_json
         obj.updated_at = now
+        _apply_indexed_columns(obj, task_data)
 
         session.add(obj)
         session.commit()
+        if created:
+            _invalidate_total_cache()
+        if status_changed:
+            _notify_task_change([task_id])
     finally:
         if owns_session:
             session.close()
 
 
+# 列表查询只读取这些列（不读取 data JSON）
+_LIST_COLUMNS = (
+    TranslationHistory.task_id,
+    TranslationHistory.status,
+    TranslationHistory.filename,
+    TranslationHistory.file_id,
+    TranslationHistory.source_lang,
+    TranslationHistory.target_lang,
+    TranslationHistory.translate_images_experimental,
+    TranslationHistory.image_text_overlay,
+    TranslationHistory.progress,
+    TranslationHistory.stage,
+    TranslationHistory.start_time,
+    TranslationHistory.end_time,
+    TranslationHistory.message,
+    TranslationHistory.error,
+    TranslationHistory.owner_ip,
+    TranslationHistory.created_at,
+    TranslationHistory.updated_at,
+    # 原始上传文件名：与 uploads 表左连接一次取得，不再逐行查询
+    Upload.filename.label("original_filename"),
+)
+
+
+def _select_tasks():
+    return select(*_LIST_COLUMNS).outerjoin(Upload, Upload.file_id == TranslationHistory.file_id)
+
+
+def _task_row_dict(row) -> Dict:
+    return {
+        "task_id": row.task_id,
+        "status": row.status,
+        "filename": row.filename,
+        "original_filename": row.original_filename or None,
+        "source_lang": row.source_lang,
+        "target_lang": row.target_lang,
+        "translate_images_experimental": row.translate_images_experimental,
+        "image_text_overlay": row.image_text_overlay,
+        "progress": row.progress,
+        "stage": row.stage,
+        "start_time": row.start_time,
+        "end_time": row.end_time,
+        "message": row.message,
+        "error": row.error,
+        "owner_ip": row.owner_ip,
+        "created_at": row.created_at,
+        "updated_at": row.updated_at,
+    }
+
+
 def list_tasks(session: Session | None = None) -> List[Dict]:
-    tasks: List[Dict] = []
     owns_session = False
     if session is None:
         session = Session(engine)
         owns_session = True
     try:
-        stmt = select(TranslationHistory).order_by(TranslationHistory.updated_at.desc())
-        for obj in session.exec(stmt).all():
-            # 解析 data JSON 以提取 owner_ip 与配置（若存在）
-            owner_ip = None
-            translate_images_experimental = None
-            try:
-                data = json.loads(obj.data) if obj.data else {}
-                owner_ip = data.get("owner_ip")
-                cfg = data.get("config") or {}
-                # 将前端传入的实验性开关暴露为独立字段，便于前端显示“配置”列
-                tie = cfg.get("translate_images_experimental")
-                if isinstance(tie, bool):
-                    translate_images_experimental = tie
-                # 新增：文字覆写开关
-                image_text_overlay = cfg.get("image_text_overlay") if isinstance(cfg, dict) else None
-            except Exception:
-                owner_ip = None
-                translate_images_experimental = None
-                image_text_overlay = None
-
-            # 原始上传文件名（若能从 uploads 表查到）
-            original_filename = None
-            try:
-                fname = obj.filename or ""
-                fid = fname[:-4] if fname.endswith(".pdf") else fname
-                if fid:
-                    upload_info = get_upload_info(fid, session)
-                    original_filename = (upload_info or {}).get("filename") or None
-            except Exception:
-                original_filename = None
-            tasks.append({
-                "task_id": obj.task_id,
-                "status": obj.status,
-                "filename": obj.filename,
-                "original_filename": original_filename,
-                "source_lang": obj.source_lang,
-                "target_lang": obj.target_lang,
-                "translate_images_experimental": translate_images_experimental,
-                "image_text_overlay": image_text_overlay,
-                "progress": obj.progress,
-                "stage": obj.stage,
-                "start_time": obj.start_time,
-                "end_time": obj.end_time,
-                "message": obj.message,
-                "error": obj.error,
-                "owner_ip": owner_ip,
-                "created_at": obj.created_at,
-                "updated_at": obj.updated_at,
-            })
+        stmt = _select_tasks().order_by(TranslationHistory.updated_at.desc())
+        return [_task_row_dict(row) for row in session.exec(stmt).all()]
     finally:
         if owns_session:
             session.close()
-    return tasks
+
+
+# 任务总数缓存：(数据库, 筛选条件) -> (过期时间, 总数)；新建/删除任务时清空
+_total_cache: Dict[Tuple[str, Optional[str]], Tuple[float, int]] = {}
+_total_cache_lock = threading.Lock()
+
+
+def _invalidate_total_cache() -> None:
+    with _total_cache_lock:
+        _total_cache.clear()
+
+
+def _count_tasks(session: Session, where_clause, owner_ip_filter: Optional[str]) -> int:
+    key = (str(session.get_bind().url), owner_ip_filter)
+    now = time.monotonic()
+    if TASKS_TOTAL_CACHE_SECONDS > 0:
+        with _total_cache_lock:
+            cached = _total_cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+    count_stmt = select(func.count(TranslationHistory.task_id))
+    if where_clause is not None:
+        count_stmt = count_stmt.where(where_clause)
+    total = int(session.exec(count_stmt).one())
+    if TASKS_TOTAL_CACHE_SECONDS > 0:
+        with _total_cache_lock:
+            _total_cache[key] = (now + TASKS_TOTAL_CACHE_SECONDS, total)
+    return total
+
+
+def encode_cursor(created_at: str, task_id: str) -> str:
+    """分页游标：最后一条记录的 (created_at, task_id)，base64url 编码后对客户端不透明。"""
+    raw = json.dumps([created_at, task_id], separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """解析分页游标；格式无效时抛出 ValueError。"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, task_id = json.loads(raw.decode("utf-8"))
+    except Exception as e:
+        raise ValueError(f"无效的分页游标: {cursor}") from e
+    if not isinstance(created_at, str) or not isinstance(task_id, str):
+        raise ValueError(f"无效的分页游标: {cursor}")
+    return created_at, task_id
 
 
 def list_tasks_db(
@@ -134,11 +238,15 @@ def list_tasks_db(
     page: int = 1,
     page_size: int = 15,
     owner_ip_filter: Optional[str] = None,
-) -> Tuple[List[Dict], int]:
-    """数据库级分页与“仅本人”筛选（基于 TranslationHistory.data 的 JSON LIKE 过滤）：
-    - 使用 LIKE 匹配 data JSON 中的 owner_ip 字段，同时按更新时间倒序分页。
-    - 返回 (tasks, total)
-    注：为兼容性与简化实现，此函数不对 uploads 表进行 JOIN；original_filename 仍通过 get_upload_info 填充。
+    cursor: Optional[str] = None,
+) -> Tuple[List[Dict], int, Optional[str]]:
+    """数据库级分页与“仅本人”筛选：
+    - 按 (created_at, task_id) 倒序；提供 cursor 时从游标之后继续（键集分页），每页代价与翻到第几页无关；
+      未提供时按 page 偏移分页（兼容旧参数）。
+    - owner_ip 为独立列，与 (created_at, task_id) 组成联合索引，过滤、排序与翻页都在索引内完成。
+    - original_filename 通过左连接 uploads 表取得，不逐行查询。
+    - total 缓存 TASKS_TOTAL_CACHE_SECONDS 秒（新建或删除任务时失效），缓存命中时每页只有一次查询。
+    - 返回 (tasks, total, next_cursor)；没有更多记录时 next_cursor 为 None。
     """
     owns_session = False
     if session is None:
@@ -162,78 +270,70 @@ def list_tasks_db(
         # 构建过滤条件
         where_clause = None
         if owner_ip_filter:
-            # LIKE 模式：匹配诸如  "owner_ip": "1.2.3.4"  的 JSON 片段（更精确地匹配引号包裹的 IP）
-            pattern = f'%"owner_ip"%"{owner_ip_filter}"%'
-            where_clause = TranslationHistory.data.like(pattern)
+            where_clause = TranslationHistory.owner_ip == owner_ip_filter
 
-        # 统计总数
-        count_stmt = select(func.count(TranslationHistory.task_id))
-        if where_clause is not None:
-            count_stmt = count_stmt.where(where_clause)
-        total = int(session.exec(count_stmt).one())
+        total = _count_tasks(session, where_clause, owner_ip_filter)
 
-        # 分页查询（按创建时间降序）
-        stmt = select(TranslationHistory).order_by(TranslationHistory.created_at.desc())
+        # 分页查询（按创建时间降序，task_id 保证顺序稳定）；多取一条判断是否还有下一页
+        stmt = _select_tasks().order_by(TranslationHistory.created_at.desc(), TranslationHistory.task_id.desc())
         if where_clause is not None:
             stmt = stmt.where(where_clause)
-        stmt = stmt.offset((page - 1) * page_size).limit(page_size)
-
-        tasks: List[Dict] = []
-        for obj in session.exec(stmt).all():
-            # 解析 data JSON
-            owner_ip = None
-            translate_images_experimental = None
-            image_text_overlay = None
-            data = {}
+        if cursor:
+            created_at, task_id = decode_cursor(cursor)
+            stmt = stmt.where(tuple_(TranslationHistory.created_at, TranslationHistory.task_id) < (created_at, task_id))
+        else:
+            stmt = stmt.offset((page - 1) * page_size)
+        rows = session.exec(stmt.limit(page_size + 1)).all()
+
+        tasks = [_task_row_dict(row) for row in rows[:page_size]]
+        next_cursor = None
+        if len(rows) > page_size:
+            last = rows[page_size - 1]
+            next_cursor = encode_cursor(last.created_at, last.task_id)
+        return tasks, total, next_cursor
+    finally:
+        if owns_session:
+            session.close()
+
+
+def backfill_history_columns(after_task_id: str = "", limit: int = 500) -> Tuple[str, int]:
+    """为升级前写入的记录从 data JSON 回填查询列（file_id 为空视为未回填）。
+
+    按 task_id 游标分批处理，每批一个短事务，返回 (本批最后一个 task_id, 本批条数)；条数小于 limit 表示已完成。
+    """
+    with Session(engine) as session:
+        stmt = (
+            select(TranslationHistory)
+            .where(TranslationHistory.file_id.is_(None), TranslationHistory.task_id > after_task_id)
+            .order_by(TranslationHistory.task_id)
+            .limit(limit)
+        )
+        rows = session.exec(stmt).all()
+        if not rows:
+            return after_task_id, 0
+        for obj in rows:
             try:
                 data = json.loads(obj.data) if obj.data else {}
-                owner_ip = data.get("owner_ip")
-                cfg = data.get("config") or {}
-                tie = cfg.get("translate_images_experimental")
-                if isinstance(tie, bool):
-                    translate_images_experimental = tie
-                image_text_overlay = cfg.get("image_text_overlay") if isinstance(cfg, dict) else None
             except Exception:
                 data = {}
-                owner_ip = None
-                translate_images_experimental = None
-                image_text_overlay = None
-
-            # 原始上传文件名（通过 uploads 表查询）
-            original_filename = None
-            try:
-                fname = obj.filename or ""
-                fid = fname[:-4] if fname.endswith(".pdf") else fname
-                if fid:
-                    upload_info = get_upload_info(fid, session)
-                    original_filename = (upload_info or {}).get("filename") or None
-            except Exception:
-                original_filename = None
-
-            tasks.append({
-                "task_id": obj.task_id,
-                "status": obj.status,
-                "filename": obj.filename,
-                "original_filename": original_filename,
-                "source_lang": obj.source_lang,
-                "target_lang": obj.target_lang,
-                "translate_images_experimental": translate_images_experimental,
-                "image_text_overlay": image_text_overlay,
-                "progress": obj.progress,
-                "stage": obj.stage,
-                "start_time": obj.start_time,
-                "end_time": obj.end_time,
-                "message": obj.message,
-                "error": obj.error,
-                "owner_ip": owner_ip,
-                "created_at": obj.created_at,
-                "updated_at": obj.updated_at,
-            })
-
-        return tasks, total
-    finally:
-        if owns_session:
-            session.close()
+            _apply_indexed_columns(obj, data if isinstance(data, dict) else {})
+            # 无法解析出文件的记录同样标记为已处理
+            if obj.file_id is None:
+                obj.file_id = ""
+        # 内容摘要来自上传记录（升级前的上传没有摘要，保持为空）
+        file_ids = {obj.file_id for obj in rows if obj.file_id and not obj.content_hash}
+        if file_ids:
+            hashes = dict(session.exec(
+                select(Upload.file_id, Upload.content_hash).where(Upload.file_id.in_(file_ids), Upload.content_hash.is_not(None))
+            ).all())
+            for obj in rows:
+                if obj.file_id in hashes and not obj.content_hash:
+                    obj.content_hash = hashes[obj.file_id]
+        session.add_all(rows)
+        session.commit()
+        # 回填了 owner_ip，“仅本人”的缓存总数随之变化
+        _invalidate_total_cache()
+        return rows[-1].task_id, len(rows)
 
 
 def get_task_status(task_id: str, session: Session | None = None) -> Dict:
@@ -306,23 +406,145 @@ def delete_history(task_id: str, session: Session | None = None) -> bool:
             return False
         session.delete(obj)
         session.commit()
+        _invalidate_total_cache()
+        _notify_task_change([task_id])
         return True
     finally:
         if owns_session:
             session.close()
 
 
+# 保留策略不清理仍在进行中的任务
+_ACTIVE_STATUSES = ("running", "queued")
+
+
+def select_retention_candidates(
+    cutoff: Optional[str],
+    max_per_owner: int,
+    limit: int,
+    session: Session | None = None,
+) -> List[Dict]:
+    """选出一批需要清理的任务记录（完整行，供归档）：
+    - cutoff: 创建时间早于该 ISO 时间的记录（None 表示不按时间清理）
+    - max_per_owner: 每个 owner_ip 只保留最新的若干条（0 表示不限；没有 owner_ip 的记录不受此限制）
+    每条记录附带 retention_reason（expired / over_quota）；排队与运行中的任务不会被选中。
+    """
+    owns_session = False
+    if session is None:
+        session = Session(engine)
+        owns_session = True
+    try:
+        picked: Dict[str, Dict] = {}
+        not_active = or_(TranslationHistory.status.is_(None), TranslationHistory.status.not_in(_ACTIVE_STATUSES))
+        if cutoff:
+            stmt = (
+                select(TranslationHistory)
+                .where(TranslationHistory.created_at < cutoff, not_active)
+                .order_by(TranslationHistory.created_at, TranslationHistory.task_id)
+                .limit(limit)
+            )
+            for obj in session.exec(stmt).all():
+                picked[obj.task_id] = {**obj.model_dump(), "retention_reason": "expired"}
+        if max_per_owner > 0 and len(picked) < limit:
+            # 按 owner_ip 分组倒序编号，编号超过上限的即为超额的旧记录
+            ranked = (
+                select(
+                    TranslationHistory.task_id,
+                    func.row_number().over(
+                        partition_by=TranslationHistory.owner_ip,
+                        order_by=(TranslationHistory.created_at.desc(), TranslationHistory.task_id.desc()),
+                    ).label("rn"),
+                )
+                .where(TranslationHistory.owner_ip.is_not(None), TranslationHistory.owner_ip != "")
+                .subquery()
+            )
+            stmt = (
+                select(TranslationHistory)
+                .join(ranked, ranked.c.task_id == TranslationHistory.task_id)
+                .where(ranked.c.rn > max_per_owner, not_active)
+                .order_by(TranslationHistory.created_at, TranslationHistory.task_id)
+                .limit(limit)
+            )
+            for obj in session.exec(stmt).all():
+                if obj.task_id not in picked and len(picked) < limit:
+                    picked[obj.task_id] = {**obj.model_dump(), "retention_reason": "over_quota"}
+        return list(picked.values())
+    finally:
+        if owns_session:
+            session.close()
+
+
+def purge_history(task_ids: List[str], session: Session | None = None) -> int:
+    """批量删除任务记录，返回删除条数。"""
+    if not task_ids:
+        return 0
+    owns_session = False
+    if session is None:
+        session = Session(engine)
+        owns_session = True
+    try:
+        result = session.exec(delete(TranslationHistory).where(TranslationHistory.task_id.in_(task_ids)))
+        session.commit()
+        _invalidate_total_cache()
+        _notify_task_change(task_ids)
+        return int(result.rowcount or 0)
+    finally:
+        if owns_session:
+            session.close()
+
+
+def select_expired_download_logs(cutoff: str, limit: int, session: Session | None = None) -> List[Dict]:
+    """选出一批创建时间早于 cutoff 的下载日志（完整行，供归档）。"""
+    owns_session = False
+    if session is None:
+        session = Session(engine)
+        owns_session = True
+    try:
+        stmt = select(DownloadLog).where(DownloadLog.created_at < cutoff).order_by(DownloadLog.created_at, DownloadLog.id).limit(limit)
+        return [obj.model_dump() for obj in session.exec(stmt).all()]
+    finally:
+        if owns_session:
+            session.close()
+
+
+def purge_download_logs(ids: List[int], session: Session | None = None) -> int:
+    """批量删除下载日志，返回删除条数。"""
+    if not ids:
+        return 0
+    owns_session = False
+    if session is None:
+        session = Session(engine)
+        owns_session = True
+    try:
+        result = session.exec(delete(DownloadLog).where(DownloadLog.id.in_(ids)))
+        session.commit()
+        return int(result.rowcount or 0)
+    finally:
+        if owns_session:
+            session.close()
+
+
 __all__ = [
+    "add_task_change_listener",
     "save_or_update_history",
     "list_tasks",
     "list_tasks_db",
+    "backfill_history_columns",
+    "encode_cursor",
+    "decode_cursor",
     "get_task_status",
     "delete_history",
+    "select_retention_candidates",
+    "purge_history",
+    "select_expired_download_logs",
+    "purge_download_logs",
     "mark_task_invalid",
     "get_task_full",
     "log_download",
     "log_upload",
+    "log_audit_batch",
     "get_upload_info",
+    "save_preflight",
 ]
 
 def mark_task_invalid(task_id: str, message: str, session: Session | None = None) -> bool:
@@ -342,11 +564,66 @@ def mark_task_invalid(task_id: str, message: str, session: Session | None = None
         obj.updated_at = now
         session.add(obj)
         session.commit()
+        _notify_task_change([task_id])
         return True
     finally:
         if owns_session:
             session.close()
 
+def _download_log(
+    task_id: str,
+    file_type: str,
+    filename: str,
+    path: str,
+    user_ip: str,
+    user_agent: str,
+    bytes_sent: int,
+    success: bool,
+    created_at: str,
+    finished_at: str,
+) -> DownloadLog:
+    return DownloadLog(
+        task_id=task_id,
+        file_type=file_type,
+        filename=filename,
+        path=path,
+        user_ip=user_ip,
+        user_agent=user_agent,
+        bytes_sent=int(bytes_sent or 0),
+        success=1 if success else 0,
+        created_at=created_at,
+        finished_at=finished_at,
+    )
+
+
+def _apply_upload(
+    session: Session,
+    file_id: str,
+    filename: str,
+    size: int,
+    user_ip: str,
+    user_agent: str,
+    upload_time: str,
+    preflight_status: Optional[str] = None,
+    content_hash: Optional[str] = None,
+) -> Upload:
+    obj = session.get(Upload, file_id)
+    if not obj:
+        obj = Upload(file_id=file_id)
+    obj.filename = filename
+    obj.size = int(size or 0)
+    obj.user_ip = user_ip or ""
+    obj.user_agent = user_agent or ""
+    obj.upload_time = upload_time
+    # 预检可能先于上传记录落库完成，不用 pending 覆盖已有结果
+    if preflight_status is not None and obj.preflight_status in (None, preflight_status):
+        obj.preflight_status = preflight_status
+    if content_hash is not None:
+        obj.content_hash = content_hash
+    session.add(obj)
+    return obj
+
+
 def log_download(
     task_id: str,
     file_type: str,
@@ -361,19 +638,7 @@ def log_download(
 ) -> bool:
     """记录下载日志"""
     with Session(engine) as session:
-        obj = DownloadLog(
-            task_id=task_id,
-            file_type=file_type,
-            filename=filename,
-            path=path,
-            user_ip=user_ip,
-            user_agent=user_agent,
-            bytes_sent=int(bytes_sent or 0),
-            success=1 if success else 0,
-            created_at=created_at,
-            finished_at=finished_at,
-        )
-        session.add(obj)
+        session.add(_download_log(task_id, file_type, filename, path, user_ip, user_agent, bytes_sent, success, created_at, finished_at))
         session.commit()
         return True
 
@@ -384,21 +649,27 @@ def log_upload(
     user_ip: str,
     user_agent: str,
     upload_time: str,
+    preflight_status: Optional[str] = None,
+    content_hash: Optional[str] = None,
 ) -> bool:
     """记录上传日志（保存上传者 IP）。支持 UPSERT。"""
     with Session(engine) as session:
-        obj = session.get(Upload, file_id)
-        if not obj:
-            obj = Upload(file_id=file_id)
-        obj.filename = filename
-        obj.size = int(size or 0)
-        obj.user_ip = user_ip or ""
-        obj.user_agent = user_agent or ""
-        obj.upload_time = upload_time
-        session.add(obj)
+        _apply_upload(session, file_id, filename, size, user_ip, user_agent, upload_time, preflight_status, content_hash)
         session.commit()
         return True
 
+
+def log_audit_batch(downloads: List[Dict], uploads: List[Dict]) -> int:
+    """在一个事务中写入一批下载日志与上传记录（参数同 log_download / log_upload），返回写入条数。"""
+    with Session(engine) as session:
+        session.add_all([_download_log(**row) for row in downloads])
+        for row in uploads:
+            _apply_upload(session, **row)
+            # 同一批内可能有同一文件的多条记录，先刷新使后续 get 能取到
+            session.flush()
+        session.commit()
+        return len(downloads) + len(uploads)
+
 def get_upload_info(file_id: str, session: Session | None = None) -> Dict:
     """获取上传记录，主要用于查询上传者 IP。"""
     owns_session = False
@@ -416,7 +687,46 @@ def get_upload_info(file_id: str, session: Session | None = None) -> Dict:
             "user_ip": obj.user_ip,
             "user_agent": obj.user_agent,
             "upload_time": obj.upload_time,
+            "content_hash": obj.content_hash,
+            "preflight": _preflight_dict(obj),
         }
     finally:
         if owns_session:
             session.close()
+
+
+def _preflight_dict(obj: Upload) -> Dict:
+    return {
+        "status": obj.preflight_status,
+        "error": obj.preflight_error,
+        "checked_at": obj.preflight_at,
+        "page_count": obj.page_count,
+        "text_pages": obj.text_pages,
+        "text_chars": obj.text_chars,
+        "has_text_layer": (obj.text_pages > 0) if obj.text_pages is not None else None,
+        "image_count": obj.image_count,
+        "image_pixels": obj.image_pixels,
+        "encrypted": bool(obj.encrypted) if obj.encrypted is not None else None,
+        "estimated_tokens": obj.estimated_tokens,
+    }
+
+
+def save_preflight(file_id: str, result: Dict) -> bool:
+    """写入上传预检结果（字段见 core.pdf_preflight.analyze_pdf）；上传记录不存在时新建。"""
+    with Session(engine) as session:
+        obj = session.get(Upload, file_id)
+        if not obj:
+            obj = Upload(file_id=file_id)
+        obj.preflight_status = result.get("status")
+        obj.preflight_error = result.get("error")
+        obj.preflight_at = datetime.now().isoformat()
+        obj.page_count = result.get("page_count")
+        obj.text_pages = result.get("text_pages")
+        obj.text_chars = result.get("text_chars")
+        obj.image_count = result.get("image_count")
+        obj.image_pixels = result.get("image_pixels")
+        obj.encrypted = 1 if result.get("encrypted") else 0
+        obj.estimated_tokens = result.get("estimated_tokens")
+        session.add(obj)
+        session.commit()
+        return True
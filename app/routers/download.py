@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
 import base64
+import email.utils
 import hmac
 import json
 import time
@@ -24,7 +25,10 @@ from core.config import (
     MAX_CONCURRENT_DOWNLOADS,
     DOWNLOAD_LOG_ENABLED,
 )
-from app.repositories.history_repository import get_task_full, log_download, get_upload_info
+from app.db import run_db
+from app.repositories.history_repository import get_task_full, get_upload_info
+from app.services.audit_log import audit_log
+from app.services.download_cache import download_cache
 from app.schemas import DownloadTokenResponse
 
 
@@ -151,6 +155,85 @@ def _validate_download_token(token: str, expect_task_id: str, expect_file_type:
         return False
 
 
+async def _load_download_meta(task_id: str) -> dict:
+    """任务的下载相关信息：状态、上传者 IP 与令牌、原始文件名；任务不存在时返回空字典。
+
+    已完成的任务经 download_cache 缓存，各文件类型解析出的路径等在 files 中按需补充（见 _resolve_file）。
+    """
+    meta = download_cache.get(task_id)
+    if meta is not None:
+        return meta
+    version = download_cache.version()
+    task = await run_db(get_task_full, task_id)
+    if not task:
+        return {}
+    meta = {"task": task, "status": task.get("status")}
+    if meta["status"] != "completed":
+        return meta
+    data = task.get("data") or {}
+    fname = task.get("filename") or ""
+    fid = fname[:-4] if fname.endswith(".pdf") else fname
+    try:
+        upload_info = await run_db(get_upload_info, fid)
+    except Exception:
+        upload_info = {}
+    meta.update({
+        "owner_ip": data.get("owner_ip") or "",
+        "upload_ip": (upload_info or {}).get("user_ip") or "",
+        "owner_token": data.get("owner_token") or "",
+        "original_filename": (upload_info or {}).get("filename") or (fid + ".pdf"),
+        "files": {},
+    })
+    download_cache.put(task_id, meta, version)
+    return meta
+
+
+def _content_disposition(meta: dict, path: Path) -> str:
+    """生成下载文件名：原文件名.目标语言.pdf（自动移除方括号），按 RFC 5987/6266 编码为 Content-Disposition。"""
+    task = meta["task"]
+    try:
+        orig = meta["original_filename"]
+        base = orig[:-4] if orig.lower().endswith('.pdf') else orig
+        base = _sanitize_filename_base(base)
+        lang_out = task.get("target_lang") or (task.get("data") or {}).get("config", {}).get("lang_out") or "out"
+        safe_name = f"{base}.{lang_out}.pdf"
+    except Exception:
+        safe_name = path.name
+    # 按 RFC 5987/6266 规范对文件名进行百分号编码，避免响应头非 ASCII 字符导致的 latin-1 编码错误
+    try:
+        # 仅在 filename* 参数中使用 UTF-8 百分号编码（兼容现代浏览器）
+        encoded = urllib.parse.quote(str(safe_name), safe="", encoding="utf-8", errors="strict")
+        # 同时提供一个 ASCII 回退的 filename 参数，兼容旧浏览器/代理
+        ascii_fallback_base = _sanitize_filename_base(str(safe_name[:-4] if str(safe_name).lower().endswith('.pdf') else safe_name))
+        ascii_fallback = ascii_fallback_base.encode('ascii', 'ignore').decode('ascii')
+        if not ascii_fallback:
+            ascii_fallback = 'download'
+        ascii_fallback = ascii_fallback.strip() + '.pdf'
+        # 注意：整个 Header 值必须是可被 latin-1 编码的 ASCII 字符串
+        return f"attachment; filename=\"{ascii_fallback}\"; filename*=UTF-8''{encoded}"
+    except Exception:
+        # 退化为纯 ASCII 文件名，避免抛错
+        return "attachment; filename=download.pdf"
+
+
+def _resolve_file(meta: dict, file_type: str) -> Optional[dict]:
+    """解析下载文件并记录路径、大小、修改时间与 Content-Disposition；文件不存在时返回 None。"""
+    files = meta["files"]
+    entry = files.get(file_type)
+    if entry is None:
+        path = _resolve_path(meta["task"], file_type)
+        if not path.exists() or not path.is_file():
+            return None
+        st = path.stat()
+        entry = files[file_type] = {
+            "path": path,
+            "size": st.st_size,
+            "mtime": st.st_mtime,
+            "content_disposition": _content_disposition(meta, path),
+        }
+    return entry
+
+
 @router.post("/tasks/{task_id}/download/token", response_model=DownloadTokenResponse)
 async def create_download_token(task_id: str, request: Request, file_type: Literal["mono", "glossary"] = "mono"):
     """创建下载令牌（仅允许上传者创建）。
@@ -160,20 +243,19 @@ async def create_download_token(task_id: str, request: Request, file_type: Liter
     - 严格模式 (DOWNLOAD_REQUIRE_OWNER_TOKEN=True)：必须提供与任务匹配的上传者令牌（Header: X-Owner-Token）。
     - 默认模式：优先令牌，其次以上传者 IP 验证；若缺少上传者 IP，则拒绝创建令牌。
     """
-    task = get_task_full(task_id)
-    if not task:
+    meta = await _load_download_meta(task_id)
+    if not meta:
         raise HTTPException(status_code=404, detail="任务不存在")
-    if task.get("status") != "completed":
+    if meta["status"] != "completed":
         raise HTTPException(status_code=403, detail="任务未完成，暂不可创建令牌")
 
-    data = task.get("data") or {}
-    owner_ip = data.get("owner_ip") or ""
+    owner_ip = meta["owner_ip"]
     # 提取请求方 IP（优先使用 X-Forwarded-For）
     forwarded = request.headers.get("x-forwarded-for") or request.headers.get("X-Forwarded-For")
     requester_ip = forwarded.split(",")[0].strip() if forwarded else (request.client.host if request.client else "")
 
     provided_token = request.headers.get("X-Owner-Token") or request.headers.get("x-owner-token")
-    data_token = (data.get("owner_token") or "")
+    data_token = meta["owner_token"]
 
     if DOWNLOAD_REQUIRE_OWNER_TOKEN:
         if (not provided_token) or (not data_token) or (provided_token != data_token):
@@ -207,11 +289,12 @@ async def direct_download(
     - 若提供有效 token（通过 /download/token 获取），可直接下载。
     - 否则遵循旧逻辑：严格模式需要上传者令牌；默认模式优先令牌，其次按上传者 IP 校验。
     """
-    task = get_task_full(task_id)
-    if not task:
+    meta = await _load_download_meta(task_id)
+    if not meta:
         raise HTTPException(status_code=404, detail="任务不存在")
-    if task.get("status") != "completed":
+    if meta["status"] != "completed":
         raise HTTPException(status_code=403, detail="任务未完成，暂不可下载")
+    task = meta["task"]
 
     # 提取请求方 IP（优先使用 X-Forwarded-For）
     forwarded = request.headers.get("x-forwarded-for") or request.headers.get("X-Forwarded-For")
@@ -220,17 +303,8 @@ async def direct_download(
     else:
         requester_ip = request.client.host if request.client else ""
 
-    # 获取上传者 IP（优先任务 data 中记录，其次查询 uploads 表）
-    data = task.get("data") or {}
-    owner_ip = data.get("owner_ip") or ""
-    if not owner_ip:
-        try:
-            fname = task.get("filename") or ""
-            fid = fname[:-4] if fname.endswith(".pdf") else fname
-            upload_info = get_upload_info(fid)
-            owner_ip = (upload_info or {}).get("user_ip") or ""
-        except Exception:
-            owner_ip = ""
+    # 获取上传者 IP（优先任务 data 中记录，其次为 uploads 表中的记录）
+    owner_ip = meta["owner_ip"] or meta["upload_ip"]
 
     # 若提供下载 token，优先校验 token（通过后无需再进行上传者校验）
     if token:
@@ -239,7 +313,7 @@ async def direct_download(
     else:
         # 若配置要求令牌，则校验上传者令牌（支持 Header: X-Owner-Token 或 Query: owner_token）
         provided_token = owner_token or request.headers.get("X-Owner-Token") or request.headers.get("x-owner-token")
-        data_token = (data.get("owner_token") or "")
+        data_token = meta["owner_token"]
         if DOWNLOAD_REQUIRE_OWNER_TOKEN:
             # 严格模式：必须提供且匹配上传者令牌
             if (not provided_token) or (not data_token) or (provided_token != data_token):
@@ -254,9 +328,10 @@ async def direct_download(
                 if requester_ip and (owner_ip != requester_ip):
                     raise HTTPException(status_code=403, detail="仅允许上传者下载该文件")
 
-    path = _resolve_path(task, file_type)
-    if not path.exists() or not path.is_file():
+    resolved = _resolve_file(meta, file_type)
+    if resolved is None:
         raise HTTPException(status_code=404, detail="PDF 不存在")
+    path = resolved["path"]
 
     # 并发控制
     app = request.app
@@ -271,7 +346,7 @@ async def direct_download(
         # 申请失败则直接报错
         raise HTTPException(status_code=500, detail="下载服务繁忙，请稍后再试")
 
-    file_size = path.stat().st_size
+    file_size = resolved["size"]
     range_header = request.headers.get("range") or request.headers.get("Range")
 
     start = 0
@@ -279,6 +354,7 @@ async def direct_download(
     status_code = 200
     headers = {
         "Accept-Ranges": "bytes",
+        "Last-Modified": email.utils.formatdate(resolved["mtime"], usegmt=True),
     }
 
     if range_header and range_header.startswith("bytes="):
@@ -306,7 +382,13 @@ async def direct_download(
     sent_bytes = 0
 
     def file_iter():
-        with open(path, "rb") as f:
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            # 缓存的路径已被删除（例如被其他进程清理），下次请求重新解析
+            download_cache.invalidate(task_id)
+            raise
+        with f:
             f.seek(start)
             remain = end - start + 1
             while remain > 0:
@@ -320,7 +402,7 @@ async def direct_download(
                 yield data
 
     def finalize():
-        # 释放并发信号量，并记录下载日志
+        # 释放并发信号量，并记录下载日志（进入缓冲队列，由后台批量写入）
         try:
             app.state.download_semaphore.release()
         except Exception:
@@ -329,7 +411,7 @@ async def direct_download(
             try:
                 user_ip = request.client.host if request.client else ""
                 user_agent = request.headers.get("user-agent", "")
-                log_download(
+                audit_log.record_download(
                     task_id=task_id,
                     file_type=file_type,
                     filename=task.get("filename") or "",
@@ -346,33 +428,7 @@ async def direct_download(
 
     media_type = "application/pdf"
     headers["Content-Length"] = str(end - start + 1)
-    # 生成下载文件名：原文件名.目标语言.pdf（自动移除方括号）
-    try:
-        fname = task.get("filename") or ""
-        fid = fname[:-4] if fname.endswith(".pdf") else fname
-        upload_info = get_upload_info(fid)
-        orig = (upload_info or {}).get("filename") or (fid + ".pdf")
-        base = orig[:-4] if orig.lower().endswith('.pdf') else orig
-        base = _sanitize_filename_base(base)
-        lang_out = task.get("target_lang") or (task.get("data") or {}).get("config", {}).get("lang_out") or "out"
-        safe_name = f"{base}.{lang_out}.pdf"
-    except Exception:
-        safe_name = path.name
-    # 按 RFC 5987/6266 规范对文件名进行百分号编码，避免响应头非 ASCII 字符导致的 latin-1 编码错误
-    try:
-        # 仅在 filename* 参数中使用 UTF-8 百分号编码（兼容现代浏览器）
-        encoded = urllib.parse.quote(str(safe_name), safe="", encoding="utf-8", errors="strict")
-        # 同时提供一个 ASCII 回退的 filename 参数，兼容旧浏览器/代理
-        ascii_fallback_base = _sanitize_filename_base(str(safe_name[:-4] if str(safe_name).lower().endswith('.pdf') else safe_name))
-        ascii_fallback = ascii_fallback_base.encode('ascii', 'ignore').decode('ascii')
-        if not ascii_fallback:
-            ascii_fallback = 'download'
-        ascii_fallback = ascii_fallback.strip() + '.pdf'
-        # 注意：整个 Header 值必须是可被 latin-1 编码的 ASCII 字符串
-        headers["Content-Disposition"] = f"attachment; filename=\"{ascii_fallback}\"; filename*=UTF-8''{encoded}"
-    except Exception:
-        # 退化为纯 ASCII 文件名，避免抛错
-        headers["Content-Disposition"] = "attachment; filename=download.pdf"
+    headers["Content-Disposition"] = resolved["content_disposition"]
     return StreamingResponse(file_iter(), status_code=status_code, media_type=media_type, headers=headers, background=BackgroundTask(finalize))
 
 
@@ -0,0 +1,20 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from core.model_warmup import is_ready, warmup_state
+
+
+router = APIRouter(tags=["health"])
+
+
+@router.get("/ready")
+async def ready():
+    """就绪探针：启动预热完成（或未启用预热）时返回 200，预热进行中返回 503。"""
+    state = warmup_state()
+    ok = is_ready()
+    return JSONResponse(status_code=200 if ok else 503, content={"ready": ok, **state})
+
+
+__all__ = ["router"]
@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+from fastapi import APIRouter
+
+from core.ocr_pool import get_ocr_pool
+from core.onnx_cache import cache_stats
+
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics")
+async def get_metrics():
+    """进程内缓存与资源池统计：字体对象、字形 advance 与字形掩码缓存的容量与命中情况，OCR 引擎池的借用情况、ONNX 优化图缓存的命中情况、数据保留的清理统计、审计日志队列的写入/丢弃计数与下载元数据缓存的命中情况。"""
+    # 字体与排版模块依赖 PIL/numpy，按需导入，不拖慢 API 进程启动
+    from core.font_manager import font_manager
+    from core.text_layout import advance_cache, glyph_cache
+    from app.services.audit_log import audit_log
+    from app.services.download_cache import download_cache
+    from app.services.retention_service import retention_stats
+
+    return {
+        "fonts": font_manager.stats(),
+        "text_advances": advance_cache.stats(),
+        "glyph_masks": glyph_cache.stats(),
+        "ocr_engines": get_ocr_pool().stats(),
+        "onnx_cache": cache_stats(),
+        "retention": retention_stats(),
+        "audit_log": audit_log.stats(),
+        "download_cache": download_cache.stats(),
+    }
+
+
+__all__ = ["router"]
@@ -1,10 +1,11 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
 import shutil
-from fastapi import APIRouter, HTTPException, Request, Depends
+import asyncio
+from fastapi import APIRouter, HTTPException, Request
 from starlette.websockets import WebSocket, WebSocketDisconnect
 import json
-from sqlmodel import Session
+from typing import Optional
 
 from app.schemas import (
     DeleteTasksRequest,
@@ -13,7 +14,7 @@ from app.schemas import (
     DeleteTasksResponse,
 )
 from app.repositories.history_repository import list_tasks_db as repo_list_tasks_db, list_tasks as repo_list_tasks, get_task_status as repo_get_task_status, delete_history, get_task_full, get_upload_info
-from app.db import get_session
+from app.db import run_db, run_db_write
 from app.services.translation_service import active_translations, active_tasks, connected_clients, cancel_task, remove_from_queue, pending_queue
 from core.config import OUTPUTS_DIR, DOWNLOAD_REQUIRE_OWNER_TOKEN
 
@@ -27,12 +28,13 @@ async def list_tasks(
     page: int = 1,
     page_size: int = 15,
     only_mine: bool = False,
-    session: Session = Depends(get_session),
+    cursor: Optional[str] = None,
 ):
     """列出任务（支持分页与“仅本人”筛选），并为排队任务返回队列位置。
     - page: 页码（从1开始）
     - page_size: 每页数量（默认15）
     - only_mine: 仅返回当前请求者的任务（依据 owner_ip）
+    - cursor: 上一页返回的 next_cursor；提供时从该位置继续（忽略 page），翻页代价与页码无关
     """
     try:
         # 读取请求者 IP（优先 X-Forwarded-For）
@@ -44,7 +46,12 @@ async def list_tasks(
 
         # 在数据库层进行分页与“仅本人”筛选
         owner_ip = requester_ip if only_mine else None
-        tasks, total = repo_list_tasks_db(session=session, page=page, page_size=page_size, owner_ip_filter=owner_ip)
+        try:
+            tasks, total, next_cursor = await run_db(
+                repo_list_tasks_db, page=page, page_size=page_size, owner_ip_filter=owner_ip, cursor=cursor
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
         # 计算队列位置：基于内存中的 pending_queue
         try:
@@ -72,7 +79,10 @@ async def list_tasks(
             "total": total,
             "page": int(page or 1),
             "page_size": int(page_size or 15),
+            "next_cursor": next_cursor,
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"查询任务列表失败: {str(e)}")
 
@@ -92,7 +102,7 @@ async def get_client_ip(request: Request):
 
 
 @router.get("/tasks/{task_id}/status", response_model=TaskStatusResponse)
-async def get_task_status(task_id: str, session: Session = Depends(get_session)):
+async def get_task_status(task_id: str):
     try:
         # 优先返回内存中的最新状态
         if task_id in active_translations:
@@ -108,7 +118,7 @@ async def get_task_status(task_id: str, session: Session = Depends(get_session))
                 "end_time": data.get("end_time"),
             }
 
-        data = repo_get_task_status(task_id, session)
+        data = await run_db(repo_get_task_status, task_id)
         if not data:
             raise HTTPException(status_code=404, detail="任务不存在")
         # 确保包含 task_id 字段
@@ -121,7 +131,7 @@ async def get_task_status(task_id: str, session: Session = Depends(get_session))
 
 
 @router.post("/tasks/delete", response_model=DeleteTasksResponse)
-async def delete_tasks(request: DeleteTasksRequest, http_request: Request, session: Session = Depends(get_session)):
+async def delete_tasks(request: DeleteTasksRequest, http_request: Request):
     deleted = []
     not_found = []
     cancelled = []
@@ -138,7 +148,7 @@ async def delete_tasks(request: DeleteTasksRequest, http_request: Request, sessi
     for tid in request.task_ids:
         try:
             # 权限校验：优先令牌，其次 IP；严格模式必须令牌
-            task_full = get_task_full(tid, session)
+            task_full = await run_db(get_task_full, tid)
             if not task_full:
                 not_found.append(tid)
                 continue
@@ -149,7 +159,7 @@ async def delete_tasks(request: DeleteTasksRequest, http_request: Request, sessi
                 try:
                     fname = task_full.get("filename") or ""
                     fid = fname[:-4] if fname.endswith(".pdf") else fname
-                    upload_info = get_upload_info(fid, session)
+                    upload_info = await run_db(get_upload_info, fid)
                     owner_ip = (upload_info or {}).get("user_ip") or ""
                 except Exception:
                     owner_ip = ""
@@ -200,12 +210,12 @@ async def delete_tasks(request: DeleteTasksRequest, http_request: Request, sessi
 
             # 删除输出文件夹
             try:
-                shutil.rmtree(OUTPUTS_DIR / tid, ignore_errors=True)
+                await asyncio.to_thread(shutil.rmtree, OUTPUTS_DIR / tid, ignore_errors=True)
             except Exception:
                 pass
 
             # 删除数据库中的记录
-            if delete_history(tid, session):
+            if await run_db_write(delete_history, tid):
                 deleted.append(tid)
             else:
                 not_found.append(tid)
@@ -1,14 +1,20 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
+import asyncio
+import hashlib
 import uuid
 from datetime import datetime
 
 import aiofiles
-from fastapi import APIRouter, UploadFile, File, HTTPException, Request
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request, BackgroundTasks
 import logging
 
-from core.config import UPLOADS_DIR
-from app.schemas import UploadResponse
+from core.config import UPLOADS_DIR, PREFLIGHT_ENABLED
+from core.pdf_preflight import PREFLIGHT_PENDING
+from app.db import run_db_write
+from app.schemas import UploadResponse, PreflightResponse
+from app.services.audit_log import audit_log
+from app.services.preflight_service import run_preflight, ensure_preflight
 
 
 router = APIRouter(tags=["upload"])
@@ -16,7 +22,7 @@ logger = logging.getLogger(__name__)
 
 
 @router.post("/upload", response_model=UploadResponse)
-async def upload_file(request: Request, file: UploadFile = File(...)):
+async def upload_file(request: Request, background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     """上传PDF文件"""
     fname = (file.filename or "")
     if not fname.lower().endswith('.pdf'):
@@ -25,8 +31,9 @@ async def upload_file(request: Request, file: UploadFile = File(...)):
     file_id = str(uuid.uuid4())
     file_path = UPLOADS_DIR / f"{file_id}.pdf"
 
-    # 流式写入，避免一次性读入内存
+    # 流式写入，避免一次性读入内存；同时计算内容摘要
     file_size = 0
+    digest = hashlib.sha256()
     try:
         async with aiofiles.open(file_path, 'wb') as f:
             while True:
@@ -34,6 +41,7 @@ async def upload_file(request: Request, file: UploadFile = File(...)):
                 if not chunk:
                     break
                 file_size += len(chunk)
+                digest.update(chunk)
                 await f.write(chunk)
     except Exception as e:
         logger.error(f"保存上传文件失败: {e}")
@@ -50,22 +58,46 @@ async def upload_file(request: Request, file: UploadFile = File(...)):
             uploader_ip = request.client.host if request.client else ""
         user_agent = request.headers.get("user-agent", "")
 
-        from app.repositories.history_repository import log_upload
-        log_upload(
+        upload_record = dict(
             file_id=file_id,
             filename=file.filename,
             size=file_size,
             user_ip=uploader_ip,
             user_agent=user_agent,
             upload_time=datetime.now().isoformat(),
+            content_hash=digest.hexdigest(),
+            preflight_status=PREFLIGHT_PENDING if PREFLIGHT_ENABLED else None,
         )
+        # 进入审计日志缓冲队列批量写入；队列已满时直接写入（上传记录决定任务归属，不能丢弃）
+        if not audit_log.record_upload(**upload_record):
+            from app.repositories.history_repository import log_upload
+            await run_db_write(log_upload, **upload_record)
     except Exception as e:
         # 上传日志失败不影响主流程
         logger.debug(f"记录上传日志失败: {e}")
 
+    # 预检在响应返回后于线程池中执行，不阻塞上传请求
+    if PREFLIGHT_ENABLED:
+        background_tasks.add_task(run_preflight, file_id)
+
     return {
         "file_id": file_id,
         "filename": file.filename,
         "size": file_size,
         "upload_time": datetime.now().isoformat(),
-    }
\ No newline at end of file
+        "preflight_status": PREFLIGHT_PENDING if PREFLIGHT_ENABLED else None,
+    }
+
+
+@router.get("/upload/{file_id}/preflight", response_model=PreflightResponse)
+async def get_preflight(file_id: str, wait: float = 0):
+    """查询上传预检结果；wait>0 时最多等待该秒数直到预检完成。"""
+    if not PREFLIGHT_ENABLED:
+        raise HTTPException(status_code=404, detail="未启用上传预检")
+    if not (UPLOADS_DIR / f"{file_id}.pdf").exists():
+        raise HTTPException(status_code=404, detail="文件不存在")
+    try:
+        preflight = await asyncio.to_thread(ensure_preflight, file_id, max(0.0, min(float(wait or 0), 60.0)))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"查询预检结果失败: {str(e)}")
+    return {"file_id": file_id, **preflight}
\ No newline at end of file
@@ -28,6 +28,27 @@ class UploadResponse(BaseModel):
     filename: str
     size: int
     upload_time: str
+    # 上传预检状态：pending（后台分析中）；未启用预检时为 None
+    preflight_status: Optional[str] = None
+
+
+class PreflightResponse(BaseModel):
+    """上传预检结果"""
+    file_id: str
+    # pending / ok / rejected；rejected 时 error 为原因
+    status: Optional[str] = None
+    error: Optional[str] = None
+    checked_at: Optional[str] = None
+    page_count: Optional[int] = None
+    # 含文字层的页数；为 0 且有图片时多为扫描件
+    text_pages: Optional[int] = None
+    text_chars: Optional[int] = None
+    has_text_layer: Optional[bool] = None
+    image_count: Optional[int] = None
+    image_pixels: Optional[int] = None
+    encrypted: Optional[bool] = None
+    # 翻译文字层的 LLM token 粗略估算（输入 + 输出）
+    estimated_tokens: Optional[int] = None
 
 
 class TaskInfo(BaseModel):
@@ -61,6 +82,8 @@ class ListTasksResponse(BaseModel):
     total: int
     page: int
     page_size: int
+    # 下一页的游标（作为 cursor 参数传回）；没有更多记录时为 None
+    next_cursor: Optional[str] = None
 
 
 class TaskStatusResponse(BaseModel):
@@ -97,6 +120,7 @@ __all__ = [
     "TranslationRequest",
     "DeleteTasksRequest",
     "UploadResponse",
+    "PreflightResponse",
     "TaskInfo",
     "ListTasksResponse",
     "TaskStatusResponse",
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""审计日志缓冲写入：下载日志与上传记录先进入有界内存队列，由后台线程按条数或时间批量写入数据库。
+
+- 队列达到 AUDIT_LOG_BATCH_SIZE 条或最早一条已等待 AUDIT_LOG_FLUSH_SECONDS 秒时写入一批（一个事务，经数据库写线程执行）。
+- 持久性窗口：已接受但尚未写入的记录在进程崩溃时丢失，最多为约 AUDIT_LOG_FLUSH_SECONDS 秒内的记录；
+  正常关闭时 close() 会先写完队列。
+- 队列已满（AUDIT_LOG_QUEUE_SIZE）时下载日志直接丢弃并计入 dropped；上传记录关系到任务归属，由调用方改为直接写入。
+- 上传记录落库之前，依赖它的读取方（开始翻译、预检）通过 wait_upload() 等待该记录写入。
+"""
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.db import submit_db_write
+from app.repositories.history_repository import log_audit_batch
+from core.config import AUDIT_LOG_QUEUE_SIZE, AUDIT_LOG_BATCH_SIZE, AUDIT_LOG_FLUSH_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_DOWNLOAD = "download"
+_UPLOAD = "upload"
+
+
+class AuditLogSink:
+    """有界缓冲 + 后台批量写入。记录按序号递增，_written 为已处理（写入或写入失败）的最大序号。"""
+
+    def __init__(self, queue_size: int, batch_size: int, flush_seconds: float):
+        self.queue_size = max(1, int(queue_size))
+        self.batch_size = max(1, int(batch_size))
+        self.flush_seconds = float(flush_seconds)
+        self._cond = threading.Condition()
+        self._pending: List[Tuple[int, str, Dict]] = []
+        self._oldest = 0.0
+        self._seq = 0
+        self._written = 0
+        self._flush_to = 0
+        self._uploads: Dict[str, int] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.accepted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def _put(self, kind: str, row: Dict) -> bool:
+        with self._cond:
+            if self._closed or len(self._pending) >= self.queue_size:
+                return False
+            self._seq += 1
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.append((self._seq, kind, row))
+            if kind == _UPLOAD:
+                self._uploads[row["file_id"]] = self._seq
+            self.accepted += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="audit-log", daemon=True)
+                self._thread.start()
+            # 队列由空变为非空时唤醒后台线程开始计时，达到批量条数时唤醒立即写入
+            if len(self._pending) in (1, self.batch_size):
+                self._cond.notify_all()
+            return True
+
+    def record_download(self, **row) -> bool:
+        """缓冲一条下载日志（参数同 log_download）；队列已满时丢弃并计数，返回是否已接受。"""
+        if self._put(_DOWNLOAD, row):
+            return True
+        with self._cond:
+            self.dropped += 1
+        logger.debug(f"[audit] 队列已满，丢弃下载日志: task_id={row.get('task_id')}")
+        return False
+
+    def record_upload(self, **row) -> bool:
+        """缓冲一条上传记录（参数同 log_upload）；队列已满时返回 False，调用方应直接写入。"""
+        return self._put(_UPLOAD, row)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    if self._pending:
+                        due = self._oldest + self.flush_seconds - time.monotonic()
+                        if len(self._pending) >= self.batch_size or due <= 0 or self._flush_to > self._written or self._closed:
+                            break
+                        self._cond.wait(due)
+                    elif self._closed:
+                        return
+                    else:
+                        self._cond.wait()
+                batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+                self._oldest = time.monotonic() if self._pending else 0.0
+            self._write(batch)
+
+    def _write(self, batch: List[Tuple[int, str, Dict]]) -> None:
+        downloads = [row for _, kind, row in batch if kind == _DOWNLOAD]
+        uploads = [row for _, kind, row in batch if kind == _UPLOAD]
+        ok = False
+        try:
+            submit_db_write(log_audit_batch, downloads, uploads).result()
+            ok = True
+        except Exception as e:
+            logger.warning(f"[audit] 批量写入失败: downloads={len(downloads)}, uploads={len(uploads)}, reason={e}")
+        last = batch[-1][0]
+        with self._cond:
+            self.batches += 1
+            if ok:
+                self.written += len(batch)
+            else:
+                self.failed += len(batch)
+            self._written = last
+            for row in uploads:
+                if self._uploads.get(row["file_id"], 0) <= last:
+                    self._uploads.pop(row["file_id"], None)
+            self._cond.notify_all()
+
+    def _wait_for(self, seq: int, timeout: Optional[float]) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._flush_to = max(self._flush_to, seq)
+            self._cond.notify_all()
+            while self._written < seq:
+                if self._thread is None:
+                    return False
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def wait_upload(self, file_id: str, timeout: Optional[float] = 5.0) -> bool:
+        """该文件的上传记录仍在队列中时立即写入并等待（最多 timeout 秒），返回记录是否已落库。"""
+        with self._cond:
+            seq = self._uploads.get(file_id)
+        if seq is None:
+            return True
+        return self._wait_for(seq, timeout)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """立即写入当前队列中的全部记录并等待完成。"""
+        with self._cond:
+            seq = self._seq
+        return self._wait_for(seq, timeout)
+
+    def close(self, timeout: Optional[float] = 10.0) -> None:
+        """停止接受新记录，写完队列后结束后台线程（应在关闭数据库线程池之前调用）。"""
+        with self._cond:
+            self._closed = True
+            thread = self._thread
+            self._cond.notify_all()
+        if thread is not None:
+            thread.join(timeout)
+
+    def stats(self) -> Dict[str, object]:
+        with self._cond:
+            return {
+                "queue_size": self.queue_size,
+                "pending": len(self._pending),
+                "accepted": self.accepted,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "batches": self.batches,
+                "batch_size": self.batch_size,
+                "flush_seconds": self.flush_seconds,
+            }
+
+
+audit_log = AuditLogSink(AUDIT_LOG_QUEUE_SIZE, AUDIT_LOG_BATCH_SIZE, AUDIT_LOG_FLUSH_SECONDS)
+
+
+__all__ = [
+    "AuditLogSink",
+    "audit_log",
+]
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""已完成任务的下载元数据缓存：任务状态与上传者信息、下载文件名，以及各文件类型解析出的路径、大小与修改时间。
+
+已完成任务的输出基本不再变化，重复下载与按 Range 分段的下载不必每次都读库、解析 data JSON、查 uploads 表并在输出目录中查找文件。
+任务状态变化（含失效）或删除时经仓储层的回调立即失效；条目另有 DOWNLOAD_CACHE_TTL_SECONDS 的有效期，
+兜底在进程外被修改的情况（多进程部署时其他进程的删除、手工清理输出目录等）。
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from app.repositories.history_repository import add_task_change_listener
+from core.config import DOWNLOAD_CACHE_SIZE, DOWNLOAD_CACHE_TTL_SECONDS
+
+
+class DownloadMetaCache:
+    """task_id → 下载元数据的有界 LRU 缓存（带有效期）。
+
+    读库与写入缓存之间任务可能恰好被修改：put() 需要传入读库前取得的 version()，期间发生过失效则不写入。
+    """
+
+    def __init__(self, capacity: int = DOWNLOAD_CACHE_SIZE, ttl_seconds: float = DOWNLOAD_CACHE_TTL_SECONDS):
+        self.capacity = max(0, int(capacity))
+        self.ttl_seconds = float(ttl_seconds)
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def version(self) -> int:
+        with self._lock:
+            return self._version
+
+    def get(self, task_id: str) -> Optional[Dict]:
+        if self.capacity == 0:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(task_id)
+            if item is None or item[0] <= now:
+                if item is not None:
+                    del self._data[task_id]
+                self.misses += 1
+                return None
+            self._data.move_to_end(task_id)
+            self.hits += 1
+            return item[1]
+
+    def put(self, task_id: str, meta: Dict, version: int) -> None:
+        if self.capacity == 0:
+            return
+        with self._lock:
+            if version != self._version:
+                return
+            self._data[task_id] = (time.monotonic() + self.ttl_seconds, meta)
+            self._data.move_to_end(task_id)
+            while len(self._data) > self.capacity:
+                self._data.popitem(last=False)
+
+    def invalidate(self, task_id: str) -> None:
+        with self._lock:
+            self._version += 1
+            if self._data.pop(task_id, None) is not None:
+                self.invalidations += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._version += 1
+            self._data.clear()
+
+
+download_cache = DownloadMetaCache()
+add_task_change_listener(download_cache.invalidate)
+
+
+__all__ = [
+    "DownloadMetaCache",
+    "download_cache",
+]
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""上传预检服务：上传完成后在后台线程中分析文件并写入 uploads 表；开始翻译时据此拒绝不合格的文件。
+
+同一文件的预检在进程内只执行一次：并发的调用方（后台任务、预检查询接口、开始翻译）等待同一次分析的结果。
+"""
+import logging
+import threading
+from typing import Dict, Optional
+
+from core.config import UPLOADS_DIR, PREFLIGHT_ENABLED
+from core.pdf_preflight import PREFLIGHT_PENDING, PREFLIGHT_REJECTED, analyze_pdf
+from app.db import submit_db_write
+from app.repositories.history_repository import get_upload_info, save_preflight
+from app.services.audit_log import audit_log
+
+logger = logging.getLogger(__name__)
+
+# 正在进行的预检：file_id -> 完成事件
+_running: Dict[str, threading.Event] = {}
+_running_lock = threading.Lock()
+
+
+def run_preflight(file_id: str) -> Dict:
+    """分析上传文件并保存结果，返回 get_upload_info()["preflight"]；已有同一文件的预检在进行时等待其完成，已完成时直接返回。"""
+    with _running_lock:
+        done = _running.get(file_id)
+        owner = done is None
+        if owner:
+            done = _running[file_id] = threading.Event()
+    if not owner:
+        done.wait()
+        return (get_upload_info(file_id) or {}).get("preflight") or {}
+    try:
+        # 上传记录可能仍在审计日志队列中
+        audit_log.wait_upload(file_id)
+        # 开始翻译时可能已抢先完成预检，后台任务随后到达时无需重复分析
+        preflight = (get_upload_info(file_id) or {}).get("preflight") or {}
+        if preflight.get("status") not in (None, PREFLIGHT_PENDING):
+            return preflight
+        file_path = UPLOADS_DIR / f"{file_id}.pdf"
+        if not file_path.exists():
+            return {}
+        try:
+            result = analyze_pdf(file_path)
+        except Exception as e:
+            logger.warning(f"[preflight] 分析失败: file_id={file_id}, reason={e}")
+            result = {"status": PREFLIGHT_REJECTED, "error": f"预检失败: {e}"}
+        submit_db_write(save_preflight, file_id, result).result()
+        logger.info(
+            f"[preflight] file_id={file_id}, status={result.get('status')}, pages={result.get('page_count')}, "
+            f"images={result.get('image_count')}, text_pages={result.get('text_pages')}, "
+            f"tokens≈{result.get('estimated_tokens')}, ms={result.get('ms')}"
+            + (f", error={result.get('error')}" if result.get("error") else "")
+        )
+        return (get_upload_info(file_id) or {}).get("preflight") or {}
+    finally:
+        with _running_lock:
+            _running.pop(file_id, None)
+        done.set()
+
+
+def ensure_preflight(file_id: str, timeout: Optional[float] = None) -> Dict:
+    """返回文件的预检结果：已完成则直接读取；正在进行则最多等待 timeout 秒（超时返回 pending 状态）；
+    尚未执行（旧上传记录或预检任务丢失）则立即执行。未启用预检时返回空字典。
+    """
+    if not PREFLIGHT_ENABLED:
+        return {}
+    audit_log.wait_upload(file_id)
+    preflight = (get_upload_info(file_id) or {}).get("preflight") or {}
+    status = preflight.get("status")
+    if status and status != PREFLIGHT_PENDING:
+        return preflight
+    with _running_lock:
+        done = _running.get(file_id)
+    if done is None:
+        return run_preflight(file_id)
+    if done.wait(timeout):
+        return (get_upload_info(file_id) or {}).get("preflight") or {}
+    return {**preflight, "status": PREFLIGHT_PENDING}
+
+
+__all__ = [
+    "run_preflight",
+    "ensure_preflight",
+]
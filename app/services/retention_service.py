@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""数据保留：按配置的天数与每个上传者的保留条数清理旧任务（记录与输出目录）和旧下载日志。
+
+清理在维护循环中分批执行：每批先把待删除的行追加写入归档文件（gzip JSONL，按表与月份分文件）并落盘，
+再删除输出目录，最后在一个短事务中删除数据库记录。中途中断时已归档但未删除的行会在下一轮再次归档，归档中可能出现重复行。
+"""
+import asyncio
+import gzip
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from app.db import run_db, run_db_write
+from app.repositories.history_repository import (
+    select_retention_candidates,
+    purge_history,
+    select_expired_download_logs,
+    purge_download_logs,
+)
+from app.services.translation_service import active_translations, active_tasks
+from core.config import (
+    OUTPUTS_DIR,
+    RETENTION_DAYS,
+    RETENTION_MAX_TASKS_PER_OWNER,
+    DOWNLOAD_LOG_RETENTION_DAYS,
+    RETENTION_ARCHIVE_ENABLED,
+    RETENTION_ARCHIVE_DIR,
+    RETENTION_BATCH_SIZE,
+    RETENTION_MAX_BATCHES,
+)
+
+logger = logging.getLogger(__name__)
+
+# 最近一轮与累计的清理统计
+_stats_lock = threading.Lock()
+_last_run: Dict[str, object] = {}
+_totals: Dict[str, int] = {"runs": 0, "tasks": 0, "download_logs": 0, "output_dirs": 0, "freed_bytes": 0}
+
+
+def retention_enabled() -> bool:
+    return RETENTION_DAYS > 0 or RETENTION_MAX_TASKS_PER_OWNER > 0 or DOWNLOAD_LOG_RETENTION_DAYS > 0
+
+
+def _cutoff(days: int) -> Optional[str]:
+    """created_at 为 datetime.now().isoformat()，按字符串比较即可。"""
+    if days <= 0:
+        return None
+    return (datetime.now() - timedelta(days=days)).isoformat()
+
+
+def _archive(table: str, rows: List[Dict]) -> None:
+    """把一批行追加到 {table}-{YYYYMM}.jsonl.gz（每次追加一个 gzip 成员，gzip/zcat 可连续读出），写完后 fsync。"""
+    if not RETENTION_ARCHIVE_ENABLED or not rows:
+        return
+    RETENTION_ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    path = RETENTION_ARCHIVE_DIR / f"{table}-{datetime.now():%Y%m}.jsonl.gz"
+    archived_at = datetime.now().isoformat()
+    payload = "".join(
+        json.dumps({**row, "archived_at": archived_at}, ensure_ascii=False, default=str) + "\n" for row in rows
+    ).encode("utf-8")
+    with open(path, "ab") as f:
+        f.write(gzip.compress(payload))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _dir_size(path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _archive_tasks(rows: List[Dict]) -> Dict[str, int]:
+    """归档任务记录并删除其输出目录，返回删除的目录数与释放的字节数。"""
+    _archive("translation_history", rows)
+    removed, freed = 0, 0
+    for row in rows:
+        out_dir = OUTPUTS_DIR / row["task_id"]
+        if not out_dir.is_dir():
+            continue
+        size = _dir_size(out_dir)
+        shutil.rmtree(out_dir, ignore_errors=True)
+        if not out_dir.exists():
+            removed += 1
+            freed += size
+    return {"output_dirs": removed, "freed_bytes": freed}
+
+
+async def run_retention() -> Dict[str, object]:
+    """执行一轮保留策略：任务与下载日志各最多 RETENTION_MAX_BATCHES 批，每批 RETENTION_BATCH_SIZE 条。
+
+    每批的数据库删除经写线程执行，与正常的任务进度写入交替进行。返回本轮统计（未启用时返回空字典）。
+    """
+    if not retention_enabled():
+        return {}
+    started = time.perf_counter()
+    stats = {"tasks": 0, "expired": 0, "over_quota": 0, "download_logs": 0, "output_dirs": 0, "freed_bytes": 0, "batches": 0}
+
+    cutoff = _cutoff(RETENTION_DAYS)
+    if cutoff or RETENTION_MAX_TASKS_PER_OWNER > 0:
+        for _ in range(RETENTION_MAX_BATCHES):
+            rows = await run_db(select_retention_candidates, cutoff, RETENTION_MAX_TASKS_PER_OWNER, RETENTION_BATCH_SIZE)
+            # 数据库中的状态可能滞后于内存：仍在内存中活跃的任务跳过
+            batch = [r for r in rows if r["task_id"] not in active_tasks and r["task_id"] not in active_translations]
+            if not batch:
+                break
+            removed = await asyncio.to_thread(_archive_tasks, batch)
+            deleted = await run_db_write(purge_history, [r["task_id"] for r in batch])
+            stats["batches"] += 1
+            stats["tasks"] += deleted
+            stats["output_dirs"] += removed["output_dirs"]
+            stats["freed_bytes"] += removed["freed_bytes"]
+            for r in batch:
+                stats[r["retention_reason"]] += 1
+            if len(rows) < RETENTION_BATCH_SIZE:
+                break
+
+    log_cutoff = _cutoff(DOWNLOAD_LOG_RETENTION_DAYS)
+    if log_cutoff:
+        for _ in range(RETENTION_MAX_BATCHES):
+            rows = await run_db(select_expired_download_logs, log_cutoff, RETENTION_BATCH_SIZE)
+            if not rows:
+                break
+            await asyncio.to_thread(_archive, "download_logs", rows)
+            stats["download_logs"] += await run_db_write(purge_download_logs, [r["id"] for r in rows])
+            stats["batches"] += 1
+            if len(rows) < RETENTION_BATCH_SIZE:
+                break
+
+    stats["ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+    stats["finished_at"] = datetime.now().isoformat()
+    with _stats_lock:
+        _last_run.clear()
+        _last_run.update(stats)
+        _totals["runs"] += 1
+        for key in ("tasks", "download_logs", "output_dirs", "freed_bytes"):
+            _totals[key] += int(stats[key])
+    return stats
+
+
+def retention_stats() -> Dict[str, object]:
+    with _stats_lock:
+        return {
+            "enabled": retention_enabled(),
+            "last_run": dict(_last_run),
+            "totals": dict(_totals),
+        }
+
+
+__all__ = [
+    "retention_enabled",
+    "run_retention",
+    "retention_stats",
+]
@@ -5,19 +5,22 @@ import json
 import uuid
 import os
 from datetime import datetime
-from typing import Dict, List, Tuple, TypedDict, Union, Any, Literal, Optional
+from typing import TYPE_CHECKING, Dict, List, Tuple, TypedDict, Union, Any, Literal, Optional
 import secrets
 
-from babeldoc.docvision.base_doclayout import DocLayoutModel
-from babeldoc.format.pdf import high_level
-from babeldoc.format.pdf.translation_config import TranslationConfig, WatermarkOutputMode
-from babeldoc.glossary import Glossary
-from babeldoc.translator.translator import OpenAITranslator
-
-from core.config import OPENAI_API_KEY, OPENAI_MODEL, OPENAI_BASE_URL, UPLOADS_DIR, GLOSSARIES_DIR, OUTPUTS_DIR
+from core.model_warmup import get_shared_layout_model
+from core.config import OPENAI_API_KEY, OPENAI_MODEL, OPENAI_BASE_URL, UPLOADS_DIR, GLOSSARIES_DIR, OUTPUTS_DIR, PREFLIGHT_WAIT_SECONDS
+from core.pdf_preflight import PREFLIGHT_REJECTED
+from app.db import run_db, run_db_write, submit_db_write
 from app.repositories.history_repository import save_or_update_history, get_upload_info
+from app.services.audit_log import audit_log
 from starlette.websockets import WebSocket
 
+# BabelDOC 及其依赖（PyMuPDF、sklearn、onnxruntime...）导入耗时数秒，推迟到首个翻译任务构建配置时再导入，
+# 使 API 进程启动、列表与下载等请求不必等待整个模型栈加载
+if TYPE_CHECKING:
+    from babeldoc.format.pdf.translation_config import TranslationConfig
+
 # 运行态内存数据
 active_translations: Dict[str, Dict] = {}
 active_tasks: Dict[str, asyncio.Task] = {}
@@ -62,7 +65,7 @@ def _running_count() -> int:
     return len(active_tasks)
 
 
-def _start_task(task_id: str, config: TranslationConfig) -> None:
+def _start_task(task_id: str, config: "TranslationConfig") -> None:
     """内部方法：启动一个翻译任务并注册到 active_tasks。"""
     task = asyncio.create_task(run_translation(task_id, config))
     active_tasks[task_id] = task
@@ -82,7 +85,7 @@ def drain_queue() -> None:
                 "status": "running",
                 "stage": "排队转运行中",
             })
-            save_or_update_history(active_translations[task_id])
+            submit_db_write(save_or_update_history, dict(active_translations[task_id]))
         _start_task(task_id, config)
 
 
@@ -102,7 +105,7 @@ def remove_from_queue(task_id: str) -> bool:
     return removed
 
 
-def schedule_translation(task_id: str, config: TranslationConfig, created_at_iso: Optional[str] = None) -> str:
+def schedule_translation(task_id: str, config: "TranslationConfig", created_at_iso: Optional[str] = None) -> str:
     """根据并发上限决定任务是立即运行还是进入队列。
     返回最终状态："running" 或 "queued"。
     """
@@ -114,7 +117,7 @@ def schedule_translation(task_id: str, config: TranslationConfig, created_at_iso
                 "status": "running",
                 "stage": active_translations[task_id].get("stage") or "初始化",
             })
-            save_or_update_history(active_translations[task_id])
+            submit_db_write(save_or_update_history, dict(active_translations[task_id]))
         _start_task(task_id, config)
         return "running"
     else:
@@ -124,12 +127,20 @@ def schedule_translation(task_id: str, config: TranslationConfig, created_at_iso
                 "status": "queued",
                 "stage": "排队中",
             })
-            save_or_update_history(active_translations[task_id])
+            submit_db_write(save_or_update_history, dict(active_translations[task_id]))
         pending_queue.append((created_at_iso, task_id, config))
         return "queued"
 
 
-def _build_translation_config(task_id: str, request) -> TranslationConfig:
+def _build_translation_config(task_id: str, request) -> "TranslationConfig":
+    from babeldoc.format.pdf.translation_config import TranslationConfig, WatermarkOutputMode
+    from babeldoc.glossary import Glossary
+    from babeldoc.translator.translator import OpenAITranslator
+    from hook.babel_doc_hook import hook
+
+    # 图片翻译 hook 随 BabelDOC 一起按需安装（幂等）
+    hook()
+
     translator = OpenAITranslator(
         lang_in=request.lang_in,
         lang_out=request.lang_out,
@@ -138,7 +149,8 @@ def _build_translation_config(task_id: str, request) -> TranslationConfig:
         base_url=OPENAI_BASE_URL,
     )
 
-    doc_layout_model = DocLayoutModel.load_onnx()
+    # 布局模型在进程内共享（启动预热时已加载），避免每个任务重复加载与图优化
+    doc_layout_model = get_shared_layout_model()
 
     # 加载术语表
     glossaries = []
@@ -194,15 +206,30 @@ async def start_translation_service(request) -> Dict[str, str]:
         from fastapi import HTTPException
         raise HTTPException(status_code=404, detail="文件不存在")
 
+    # 上传预检：加密、无法解析或超出上限的文件在占用并发位之前直接拒绝（预检仍在进行时最多等待 PREFLIGHT_WAIT_SECONDS）
+    preflight = {}
+    try:
+        from app.services.preflight_service import ensure_preflight
+        preflight = await asyncio.to_thread(ensure_preflight, request.file_id, PREFLIGHT_WAIT_SECONDS)
+    except Exception:
+        preflight = {}
+    if preflight.get("status") == PREFLIGHT_REJECTED:
+        from fastapi import HTTPException
+        raise HTTPException(status_code=422, detail=f"文件预检未通过: {preflight.get('error') or '未知原因'}")
+
     config = _build_translation_config(task_id, request)
     request_config = request.model_dump()
 
     # 读取上传者 IP（若存在上传日志）
     owner_ip = None
+    content_hash = None
     try:
-        upload_info = get_upload_info(request.file_id)
+        # 刚上传的文件，其上传记录可能仍在审计日志队列中
+        await asyncio.to_thread(audit_log.wait_upload, request.file_id)
+        upload_info = await run_db(get_upload_info, request.file_id)
         if upload_info:
             owner_ip = upload_info.get("user_ip")
+            content_hash = upload_info.get("content_hash")
     except Exception:
         owner_ip = None
 
@@ -226,9 +253,12 @@ async def start_translation_service(request) -> Dict[str, str]:
         "config": request_config,
         "owner_token": owner_token,
         "owner_ip": owner_ip or "",
+        "content_hash": content_hash,
+        # 预检得到的任务规模（预检未完成或未启用时为空）
+        "preflight": {k: preflight.get(k) for k in ("page_count", "image_count", "image_pixels", "has_text_layer", "estimated_tokens")} if preflight.get("status") else None,
     }
     active_translations[task_id] = task_data
-    save_or_update_history(task_data)
+    await run_db_write(save_or_update_history, dict(task_data))
 
     final_status = schedule_translation(task_id, config, created_at)
     # 尝试从队列中继续填充并发位（即使刚入队也无害）
@@ -236,10 +266,18 @@ async def start_translation_service(request) -> Dict[str, str]:
     return {"task_id": task_id, "status": final_status, "owner_token": owner_token}
 
 
-async def run_translation(task_id: str, config: TranslationConfig) -> None:
+async def run_translation(task_id: str, config: "TranslationConfig") -> None:
     """运行翻译任务核心逻辑（事件驱动）"""
+    from babeldoc.format.pdf import high_level
+
     finished = False
     try:
+        # 实验性图片翻译：任务开始即在后台预处理图片，与 BabelDOC 的文本阶段并行（失败时由 hook 逐页处理）
+        try:
+            from hook.babel_doc_hook import start_image_prepass
+            start_image_prepass(config)
+        except Exception:
+            pass
         async for event in high_level.async_translate(config):
             # 更新任务状态
             if task_id in active_translations:
@@ -254,7 +292,7 @@ async def run_translation(task_id: str, config: TranslationConfig) -> None:
                             active_translations[task_id]["message"] = event.get("message")
                     except Exception:
                         pass
-                    save_or_update_history(active_translations[task_id])
+                    await run_db_write(save_or_update_history, dict(active_translations[task_id]))
                 elif event["type"] == "finish":
                     result = event["translate_result"]
                     mono_path = getattr(result, "mono_pdf_path", None)
@@ -268,10 +306,12 @@ async def run_translation(task_id: str, config: TranslationConfig) -> None:
                             # 仅保留 mono 产物追踪信息
                             "total_seconds": getattr(result, "total_seconds", 0),
                             "peak_memory_usage": getattr(result, "peak_memory_usage", 0),
+                            # 图片预筛选等图片处理统计（未启用图片翻译时为 None）
+                            "image_stats": getattr(config, "image_stats", None),
                         },
                         "end_time": datetime.now().isoformat(),
                     })
-                    save_or_update_history(active_translations[task_id])
+                    await run_db_write(save_or_update_history, dict(active_translations[task_id]))
                     finished = True
                 elif event["type"] == "error":
                     active_translations[task_id].update({
@@ -279,7 +319,7 @@ async def run_translation(task_id: str, config: TranslationConfig) -> None:
                         "error": event.get("error", "未知错误"),
                         "end_time": datetime.now().isoformat(),
                     })
-                    save_or_update_history(active_translations[task_id])
+                    await run_db_write(save_or_update_history, dict(active_translations[task_id]))
 
                 # 通知 WebSocket 客户端（若已连接）
                 if task_id in connected_clients:
@@ -316,10 +356,11 @@ async def run_translation(task_id: str, config: TranslationConfig) -> None:
                     "stage": "完成",
                     "result": {
                         "mono_pdf_path": mono_path,
+                        "image_stats": getattr(config, "image_stats", None),
                     },
                     "end_time": datetime.now().isoformat(),
                 })
-                save_or_update_history(active_translations[task_id])
+                await run_db_write(save_or_update_history, dict(active_translations[task_id]))
             except Exception:
                 # 兜底也失败则忽略，保持现有状态
                 pass
@@ -332,7 +373,7 @@ async def run_translation(task_id: str, config: TranslationConfig) -> None:
                 "message": "任务被取消",
                 "end_time": datetime.now().isoformat(),
             })
-            save_or_update_history(active_translations[task_id])
+            await run_db_write(save_or_update_history, dict(active_translations[task_id]))
         active_tasks.pop(task_id, None)
         return
     except Exception as e:
@@ -342,10 +383,16 @@ async def run_translation(task_id: str, config: TranslationConfig) -> None:
                 "error": str(e),
                 "end_time": datetime.now().isoformat(),
             })
-            save_or_update_history(active_translations[task_id])
+            await run_db_write(save_or_update_history, dict(active_translations[task_id]))
     finally:
         # 任务结束后清理任务引用
         active_tasks.pop(task_id, None)
+        # 释放图片流水线中未消费的预取结果（共享内存等）
+        try:
+            from core.image_pool import release_image_pipeline
+            release_image_pipeline(config)
+        except Exception:
+            pass
         # 释放并发位后尝试启动队列中的任务
         try:
             drain_queue()
@@ -0,0 +1,491 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""性能基准脚本。
+
+用法：
+    python bench.py image --width 4000 --height 3000 --boxes 2
+    python bench.py boxes --sizes 10 100 1000
+    python bench.py text --chars 2000
+    python bench.py encode --width 4000 --height 3000
+    python bench.py imports --top 15
+    python bench.py overlay --pages 20 --items 30
+    python bench.py db --tasks 2000 --writers 8 --seconds 5
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, List, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+
+def _timeit(fn: Callable[[], object], repeat: int) -> Tuple[float, float]:
+    """返回 (中位数耗时 ms, tracemalloc 峰值 MB)。首轮作为预热不计入。"""
+    fn()
+    times: List[float] = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000.0)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return statistics.median(times), peak / (1024.0 * 1024.0)
+
+
+def _synthetic_image(width: int, height: int, n_boxes: int) -> Tuple[Image.Image, List[Tuple[int, int, int, int]]]:
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    boxes = []
+    step = max(1, height // (n_boxes + 1))
+    for i in range(n_boxes):
+        x0, y0 = width // 10, step * (i + 1) - 20
+        x1, y1 = x0 + min(400, width // 3), y0 + 40
+        draw.rectangle((x0 + 10, y0 + 10, x1 - 10, y1 - 10), fill="black")
+        boxes.append((x0, y0, x1, y1))
+    return image, boxes
+
+
+def bench_image(args) -> None:
+    """图片清理路径：PIL 输入（复制一次） vs numpy 原地处理，以及掩码构建。"""
+    from core.image_remover import clean, create_mask
+    from core.image_translate import render_translations
+
+    image, boxes = _synthetic_image(args.width, args.height, args.boxes)
+    arr = np.array(image)
+    jobs = [{"region": b, "text": ""} for b in boxes]
+    print(f"image {args.width}x{args.height}, boxes={len(boxes)}, repeat={args.repeat}, method={args.method}")
+
+    rows = [
+        ("create_mask", lambda: create_mask(image.size, boxes)),
+        ("clean(PIL)", lambda: clean(image, boxes, method=args.method)),
+        ("clean(ndarray, in-place)", lambda: clean(arr, boxes, method=args.method)),
+        ("render(PIL)", lambda: render_translations(image, jobs, draw_text=False)),
+        ("render(ndarray, in-place)", lambda: render_translations(arr, jobs, draw_text=False)),
+    ]
+    if args.legacy:
+        import cv2
+
+        def _legacy():
+            # 旧实现：逐 box 生成 PIL 掩码，整图 numpy 往返 + 整图 TELEA
+            mask = Image.new("L", image.size, 0)
+            for x1, y1, x2, y2 in boxes:
+                mask.paste(Image.new("L", (x2 - x1, y2 - y1), 255), (x1, y1))
+            out = cv2.inpaint(np.array(image), np.array(mask), 3, cv2.INPAINT_TELEA)
+            return Image.fromarray(out).convert("RGB")
+
+        rows.append(("legacy full-image clean", _legacy))
+
+    for name, fn in rows:
+        ms, peak = _timeit(fn, args.repeat)
+        print(f"  {name:<28} {ms:10.2f} ms   peak(py-tracked) {peak:8.2f} MB")
+
+
+class _Box:
+    __slots__ = ("xyxy",)
+
+    def __init__(self, xyxy):
+        self.xyxy = xyxy
+
+
+def _legacy_remove_contained(boxes, tolerance: float = 2.0):
+    """旧实现：按面积排序后与每个已保留的 box 逐对比较。"""
+    def _xyxy(b):
+        try:
+            return tuple(b.xyxy)
+        except Exception:
+            return (0.0, 0.0, 0.0, 0.0)
+
+    def _area(b):
+        x0, y0, x1, y1 = _xyxy(b)
+        return max(0.0, float(x1 - x0) * float(y1 - y0))
+
+    kept = []
+    for b in sorted(list(boxes), key=_area, reverse=True):
+        ix0, iy0, ix1, iy1 = _xyxy(b)
+        contained = False
+        for k in kept:
+            ox0, oy0, ox1, oy1 = _xyxy(k)
+            if ix0 >= ox0 - tolerance and iy0 >= oy0 - tolerance and ix1 <= ox1 + tolerance and iy1 <= oy1 + tolerance:
+                contained = True
+                break
+        if not contained:
+            kept.append(b)
+    return kept
+
+
+def bench_boxes(args) -> None:
+    """布局框包含过滤：旧的逐对比较 vs 广播实现。"""
+    import random
+    from core.image_translate import _remove_fully_contained_boxes
+
+    rng = random.Random(0)
+    for n in args.sizes:
+        boxes = []
+        for _ in range(n):
+            if boxes and rng.random() < 0.3:
+                px0, py0, px1, py1 = boxes[rng.randrange(len(boxes))].xyxy
+                x0, y0 = rng.uniform(px0, (px0 + px1) / 2), rng.uniform(py0, (py0 + py1) / 2)
+                boxes.append(_Box((x0, y0, rng.uniform(x0, px1), rng.uniform(y0, py1))))
+            else:
+                x0, y0 = rng.uniform(0, 3000), rng.uniform(0, 3000)
+                boxes.append(_Box((x0, y0, x0 + rng.uniform(5, 300), y0 + rng.uniform(5, 300))))
+        assert [id(b) for b in _legacy_remove_contained(boxes)] == [id(b) for b in _remove_fully_contained_boxes(boxes)]
+        legacy_ms, _ = _timeit(lambda: _legacy_remove_contained(boxes), args.repeat)
+        new_ms, _ = _timeit(lambda: _remove_fully_contained_boxes(boxes), args.repeat)
+        print(f"  n={n:<6} legacy {legacy_ms:10.3f} ms   vectorized {new_ms:10.3f} ms   speedup x{legacy_ms / max(new_ms, 1e-9):.1f}")
+
+
+def _legacy_draw_text(draw, text, font, x, y, max_width, fill="#231816"):
+    """旧实现：逐字 getbbox 测宽换行，再逐字 draw.text。"""
+    lines, line, width = [], [], 0
+    for ch in text:
+        if ch == "\n":
+            lines.append(line)
+            line, width = [], 0
+            continue
+        bbox = font.getbbox(ch)
+        w = bbox[2] - bbox[0]
+        if width + w <= max_width:
+            line.append((ch, w))
+            width += w
+        else:
+            lines.append(line)
+            line, width = [(ch, w)], w
+    if line:
+        lines.append(line)
+    cy = y
+    for ln in lines:
+        cx = x
+        for ch, w in ln:
+            draw.text((cx, cy), ch, font=font, fill=fill)
+            cx += w
+        cy += font.size + 5
+
+
+def bench_text(args) -> None:
+    """译文绘制：逐字绘制 vs 缓存字形掩码拼接 vs 描边片段绘制（均含排版）。"""
+    from core.image_translate import get_font
+    from core.text_layout import NOTOSANS_FONT_PATH, DEFAULT_FONT_RELATIVE_PATH, draw_multiline_text, fit_text, glyph_cache
+    import os
+
+    font_path = DEFAULT_FONT_RELATIVE_PATH if os.path.exists(DEFAULT_FONT_RELATIVE_PATH) else NOTOSANS_FONT_PATH
+    unit = "翻译后的中文段落，包含 Latin words 与标点。"
+    text = (unit * (args.chars // len(unit) + 1))[: args.chars]
+    font = get_font(font_path, args.size)
+    canvas = Image.new("RGB", (args.width, args.height), "white")
+    draw = ImageDraw.Draw(canvas)
+    print(f"text chars={len(text)}, font={os.path.basename(font_path)}@{args.size}px, box={args.width}px")
+
+    legacy_ms, _ = _timeit(lambda: _legacy_draw_text(draw, text, font, 0, 0, args.width), args.repeat)
+    masks_ms, _ = _timeit(lambda: draw_multiline_text(draw, text, font, 0, 0, args.width), args.repeat)
+    stroke_ms, _ = _timeit(lambda: draw_multiline_text(draw, text, font, 0, 0, args.width,
+                                                       enable_stroke=True, stroke_width=1), args.repeat)
+    fit_ms, _ = _timeit(lambda: fit_text(text, args.width, args.height, font_path), args.repeat)
+    print(f"  per-glyph draw      {legacy_ms:10.2f} ms")
+    print(f"  cached glyph masks  {masks_ms:10.2f} ms   speedup x{legacy_ms / max(masks_ms, 1e-9):.1f}")
+    print(f"  run-based (stroke)  {stroke_ms:10.2f} ms")
+    print(f"  fit_text (sizing)   {fit_ms:10.2f} ms")
+    print(f"  glyph cache {glyph_cache.stats()}")
+
+
+def bench_encode(args) -> None:
+    """译后图片写回编码：整图 PNG（旧实现） vs 沿用原编码的整图 vs 变化区域补丁。"""
+    import io
+    from core.image_encoder import ImageSource, encode_image
+    from core.image_translate import render_translations
+
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:args.height, 0:args.width]
+    photo = np.stack([x / 8 % 255, y / 6 % 255, (x + y) / 10 % 255], axis=-1) + rng.normal(0, 12, (args.height, args.width, 3))
+    image = Image.fromarray(photo.clip(0, 255).astype(np.uint8))
+    draw = ImageDraw.Draw(image)
+    boxes = []
+    for i in range(args.boxes):
+        x0, y0 = args.width // 10, args.height * (i + 1) // (args.boxes + 1)
+        draw.rectangle((x0, y0, x0 + args.width // 3, y0 + 40), fill="white")
+        boxes.append((x0 - 5, y0 - 5, x0 + args.width // 3 + 5, y0 + 45))
+    buf = io.BytesIO()
+    image.save(buf, format="JPEG", quality=args.quality)
+    source = ImageSource("jpeg", buf.getvalue())
+    original = np.array(Image.open(io.BytesIO(source.data)).convert("RGB"))
+    result = original.copy()
+    render_translations(result, [{"region": b, "text": "translated"} for b in boxes])
+    print(f"image {args.width}x{args.height} JPEG q={args.quality} ({len(source.data) / 1024:.0f} KB), boxes={len(boxes)}")
+
+    def _legacy():
+        out = io.BytesIO()
+        Image.fromarray(result).save(out, format="PNG")
+        return out.getvalue()
+
+    legacy_ms, _ = _timeit(_legacy, args.repeat)
+    print(f"  {'legacy full PNG':<18} {legacy_ms:10.2f} ms   {len(_legacy()) / 1024:10.0f} KB")
+    for mode in ("full", "patch"):
+        ms, _ = _timeit(lambda: encode_image(result, source, original, mode), args.repeat)
+        encoded = encode_image(result, source, original, mode)
+        print(f"  {mode + '/' + encoded.format:<18} {ms:10.2f} ms   {encoded.bytes / 1024:10.0f} KB   patches={len(encoded.patches)}")
+
+
+def bench_overlay(args) -> None:
+    """覆写模式写入 PDF：逐条 insert_textbox(fontfile=...)（旧实现） vs 文档级字体登记 + 每页单个 TextWriter。"""
+    import fitz
+    from core.pdf_overlay import OverlayFontRegistry
+    from core.text_layout import NOTOSANS_FONT_PATH
+
+    font_path = args.font or NOTOSANS_FONT_PATH
+    rng = np.random.default_rng(0)
+    words = ["translated", "overlay", "text", "image", "caption", "figure", "value", "label"]
+    items = []
+    for _ in range(args.items):
+        x0, y0 = rng.uniform(20, 400), rng.uniform(20, 700)
+        text = " ".join(rng.choice(words, int(rng.integers(1, 12))))
+        items.append((fitz.Rect(x0, y0, x0 + rng.uniform(40, 180), y0 + rng.uniform(12, 60)), text, float(rng.uniform(8, 18))))
+
+    def _legacy():
+        doc = fitz.open()
+        for _ in range(args.pages):
+            pg = doc.new_page()
+            for rect, text, size in items:
+                if pg.insert_textbox(rect, text, fontsize=size, fontname="OverlaySansCN", fontfile=font_path, align=0) <= 0:
+                    try:
+                        tw = fitz.TextWriter(pg.rect)
+                        tw.fill_textbox(rect, text, font=fitz.Font(fontfile=font_path), fontsize=size)
+                        tw.write_text(pg)
+                    except ValueError:
+                        pass  # 旧实现随后再尝试 Shape.insert_textbox，同样放不下
+        return doc
+
+    def _current():
+        doc = fitz.open()
+        registry = OverlayFontRegistry(font_path)
+        for _ in range(args.pages):
+            writer = registry.writer(doc.new_page())
+            for rect, text, size in items:
+                writer.add(rect, text, size)
+            writer.flush()
+        return doc
+
+    print(f"pages={args.pages}, items/page={args.items}, font={font_path}")
+    for name, fn in (("legacy", _legacy), ("registry+writer", _current)):
+        ms, _ = _timeit(fn, args.repeat)
+        doc = fn()
+        doc.subset_fonts(fallback=False)
+        print(f"  {name:<16} {ms:10.2f} ms   {len(doc.tobytes(garbage=3)) / 1024:10.0f} KB (subset)")
+
+
+# 启动路径上不应出现的重依赖（首个翻译任务或启动预热时才导入）
+_HEAVY_MODULES = ("babeldoc", "fitz", "pymupdf", "rapidocr", "onnxruntime", "cv2", "sklearn", "numpy", "PIL")
+
+
+def bench_imports(args) -> None:
+    """API 进程启动耗时：在子进程中以 -X importtime 执行启动语句，按模块累计导入耗时排序输出。"""
+    code = (
+        f"import sys, time; t = time.perf_counter(); {args.stmt}; ms = (time.perf_counter() - t) * 1000.0; "
+        f"print(round(ms, 1)); print(','.join(m for m in {_HEAVY_MODULES!r} if m in sys.modules) or '-')"
+    )
+    walls: List[float] = []
+    timings: List[Tuple[int, int, str]] = []
+    heavy = "-"
+    for i in range(args.repeat):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(proc.stderr[-2000:])
+            raise SystemExit(proc.returncode)
+        out = proc.stdout.strip().splitlines()
+        walls.append(float(out[-2]))
+        heavy = out[-1]
+        if i == 0:
+            for line in proc.stderr.splitlines():
+                if not line.startswith("import time:") or "|" not in line:
+                    continue
+                try:
+                    self_us, cum_us, name = line[len("import time:"):].split("|")
+                    timings.append((int(cum_us), int(self_us), name.rstrip()))
+                except ValueError:
+                    continue  # 表头
+    print(f"stmt: {args.stmt}")
+    print(f"  wall  median {statistics.median(walls):10.1f} ms   min {min(walls):10.1f} ms   (n={len(walls)})")
+    print(f"  heavy modules loaded: {heavy}")
+    print(f"  {'cumulative':>12} {'self':>10}  module")
+    for cum_us, self_us, name in sorted(timings, reverse=True)[:args.top]:
+        print(f"  {cum_us / 1000.0:9.1f} ms {self_us / 1000.0:7.1f} ms  {name}")
+
+
+def bench_db(args) -> None:
+    """GET /api/tasks 在并发进度写入下的延迟：默认日志模式 + 事件循环内同步读写（旧实现） vs WAL/PRAGMA + 数据库线程池。
+
+    在临时数据库上运行：writers 个协程模拟 run_translation 逐条写入进度，readers 个协程循环请求任务列表（经真实路由）。
+    """
+    import asyncio
+    import os
+    import tempfile
+    import threading
+    import uuid
+    from datetime import datetime
+
+    import httpx
+    from fastapi import FastAPI
+    from sqlmodel import SQLModel, Session, create_engine
+
+    import app.db as db
+    import app.routers.tasks as tasks_router
+    from app.repositories import history_repository
+    from app.repositories.history_repository import save_or_update_history
+
+    async def _inline(fn, *a, **kw):
+        return fn(*a, **kw)
+
+    def _seed(engine) -> List[dict]:
+        SQLModel.metadata.create_all(engine)
+        now = datetime.now().isoformat()
+        rows = []
+        with Session(engine) as session:
+            for i in range(args.tasks):
+                task = {"task_id": str(uuid.uuid4()), "status": "completed", "filename": f"{uuid.uuid4()}.pdf",
+                        "progress": 100, "stage": "完成", "owner_ip": f"10.0.0.{i % 50}",
+                        "config": {"translate_images_experimental": True}, "start_time": now}
+                save_or_update_history(task, session)
+                rows.append(task)
+        return rows
+
+    def _run(engine, read, write) -> Tuple[List[float], int]:
+        # 服务端（路由 + 进度写入）运行在独立线程的事件循环中；客户端在主线程计时，
+        # 延迟包含请求等待服务端事件循环空闲的时间（旧实现中同步提交会阻塞整个事件循环）
+        api = FastAPI()
+        api.include_router(tasks_router.router, prefix="/api")
+        running = [{"task_id": str(uuid.uuid4()), "status": "running", "filename": "x.pdf", "progress": 0,
+                    "owner_ip": "10.0.0.1", "config": {}} for _ in range(args.writers)]
+        latencies: List[float] = []
+        writes = 0
+        stop = time.perf_counter() + args.seconds
+        server_loop = asyncio.new_event_loop()
+        server = threading.Thread(target=server_loop.run_forever, name="bench-server", daemon=True)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=api), base_url="http://bench")
+
+        async def _writer(task):
+            nonlocal writes
+            while time.perf_counter() < stop:
+                task["progress"] = (task["progress"] + 1) % 100
+                await write(save_or_update_history, dict(task))
+                writes += 1
+                await asyncio.sleep(args.interval / 1000.0)
+
+        async def _reader():
+            while time.perf_counter() < stop:
+                started = time.perf_counter()
+                request = client.get("/api/tasks", params={"page": 1, "page_size": 15, "only_mine": True})
+                resp = await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(request, server_loop))
+                resp.raise_for_status()
+                latencies.append((time.perf_counter() - started) * 1000.0)
+                await asyncio.sleep(args.poll / 1000.0)
+
+        async def _clients():
+            await asyncio.gather(*[_reader() for _ in range(args.readers)])
+
+        original = (history_repository.engine, tasks_router.run_db, tasks_router.run_db_write)
+        history_repository.engine = engine
+        tasks_router.run_db, tasks_router.run_db_write = read, write
+        server.start()
+        try:
+            writers = [asyncio.run_coroutine_threadsafe(_writer(t), server_loop) for t in running]
+            asyncio.run(_clients())
+            for f in writers:
+                f.result()
+            asyncio.run_coroutine_threadsafe(client.aclose(), server_loop).result()
+        finally:
+            server_loop.call_soon_threadsafe(server_loop.stop)
+            server.join()
+            server_loop.close()
+            history_repository.engine, tasks_router.run_db, tasks_router.run_db_write = original
+            db.shutdown_db_executors()
+        return latencies, writes
+
+    print(f"tasks={args.tasks}, writers={args.writers} (every {args.interval} ms), "
+          f"readers={args.readers} (every {args.poll} ms), seconds={args.seconds}")
+    # 临时数据库与正式数据库放在同一卷上，fsync 开销一致
+    with tempfile.TemporaryDirectory(dir=db.DB_FILE.parent) as tmp:
+        modes = (
+            ("legacy", lambda url: create_engine(url, echo=False, connect_args={"check_same_thread": False}), _inline, _inline),
+            ("wal+executor", db.create_db_engine, db.run_db, db.run_db_write),
+        )
+        for name, make_engine, read, write in modes:
+            url = f"sqlite:///{os.path.join(tmp, name + '.sqlite')}"
+            engine = make_engine(url)
+            _seed(engine)
+            latencies, writes = _run(engine, read, write)
+            engine.dispose()
+            latencies.sort()
+            pct = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+            print(f"  {name:<14} list p50 {pct(0.50):8.2f} ms   p99 {pct(0.99):8.2f} ms   max {latencies[-1]:8.2f} ms"
+                  f"   requests {len(latencies):6d}   writes {writes:6d}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="pdf_translate 性能基准")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_image = sub.add_parser("image", help="图片清理/掩码路径耗时与内存")
+    p_image.add_argument("--width", type=int, default=4000)
+    p_image.add_argument("--height", type=int, default=3000)
+    p_image.add_argument("--boxes", type=int, default=2)
+    p_image.add_argument("--repeat", type=int, default=5)
+    p_image.add_argument("--method", default="auto", help="clean() 使用的修复引擎（auto/solid/ns/pyramid/telea）")
+    p_image.add_argument("--legacy", action="store_true", help="同时测量旧的整图清理实现（较慢）")
+    p_image.set_defaults(func=bench_image)
+
+    p_boxes = sub.add_parser("boxes", help="布局框包含过滤（_remove_fully_contained_boxes）")
+    p_boxes.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    p_boxes.add_argument("--repeat", type=int, default=5)
+    p_boxes.set_defaults(func=bench_boxes)
+
+    p_text = sub.add_parser("text", help="译文排版与绘制")
+    p_text.add_argument("--chars", type=int, default=2000)
+    p_text.add_argument("--size", type=int, default=24)
+    p_text.add_argument("--width", type=int, default=1200)
+    p_text.add_argument("--height", type=int, default=2400)
+    p_text.add_argument("--repeat", type=int, default=5)
+    p_text.set_defaults(func=bench_text)
+
+    p_encode = sub.add_parser("encode", help="译后图片写回编码耗时与体积")
+    p_encode.add_argument("--width", type=int, default=4000)
+    p_encode.add_argument("--height", type=int, default=3000)
+    p_encode.add_argument("--boxes", type=int, default=4)
+    p_encode.add_argument("--quality", type=int, default=85)
+    p_encode.add_argument("--repeat", type=int, default=3)
+    p_encode.set_defaults(func=bench_encode)
+
+    p_imports = sub.add_parser("imports", help="API 进程启动（模块导入）耗时")
+    p_imports.add_argument("--stmt", default="import app; app.create_app()", help="在子进程中计时执行的启动语句")
+    p_imports.add_argument("--top", type=int, default=15, help="输出累计耗时最高的模块数")
+    p_imports.add_argument("--repeat", type=int, default=3)
+    p_imports.set_defaults(func=bench_imports)
+
+    p_overlay = sub.add_parser("overlay", help="覆写模式文字写入 PDF")
+    p_overlay.add_argument("--pages", type=int, default=20)
+    p_overlay.add_argument("--items", type=int, default=30)
+    p_overlay.add_argument("--font", default=None, help="字体文件（默认 NotoSans-Medium）")
+    p_overlay.add_argument("--repeat", type=int, default=3)
+    p_overlay.set_defaults(func=bench_overlay)
+
+    p_db = sub.add_parser("db", help="任务列表接口在并发进度写入下的延迟")
+    p_db.add_argument("--tasks", type=int, default=2000, help="预置的历史任务数")
+    p_db.add_argument("--writers", type=int, default=8, help="并发写入进度的任务数")
+    p_db.add_argument("--interval", type=float, default=5.0, help="每个任务两次进度写入的间隔（毫秒）")
+    p_db.add_argument("--readers", type=int, default=4, help="并发请求任务列表的客户端数")
+    p_db.add_argument("--poll", type=float, default=20.0, help="每个客户端两次请求的间隔（毫秒）")
+    p_db.add_argument("--seconds", type=float, default=5.0)
+    p_db.set_defaults(func=bench_db)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@
 import os
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Tuple
 
 from dotenv import load_dotenv
 
@@ -33,6 +33,33 @@ def _parse_int(val: Optional[str], default: int, min_val: Optional[int] = None,
     return n
 
 
+def _parse_float(val: Optional[str], default: float, min_val: Optional[float] = None, max_val: Optional[float] = None) -> float:
+    try:
+        n = float(str(val)) if val is not None else default
+    except Exception:
+        n = default
+    if min_val is not None:
+        n = max(min_val, n)
+    if max_val is not None:
+        n = min(max_val, n)
+    return n
+
+
+def _parse_int_list(val: Optional[str], default: Tuple[int, ...], min_val: int, max_val: int) -> Tuple[int, ...]:
+    """解析逗号分隔的整数列表；无法解析的项忽略，结果去重并排序，为空时使用默认值。"""
+    if val is None:
+        return default
+    items = set()
+    for part in str(val).split(","):
+        try:
+            n = int(part.strip())
+        except Exception:
+            continue
+        if min_val <= n <= max_val:
+            items.add(n)
+    return tuple(sorted(items)) or default
+
+
 def _load_env() -> None:
     """加载 .env（若存在）。"""
     env_path = path(".env")
@@ -54,11 +81,31 @@ class AppConfig:
     OUTPUTS_DIR: Path
     DB_PATH: Path
 
+    # SQLite 连接设置：日志模式、同步级别、mmap 大小、忙等待超时、连接池大小；数据库读写在专用线程池中执行（写入固定单线程，保持顺序）
+    DB_JOURNAL_MODE: str
+    DB_SYNCHRONOUS: str
+    DB_MMAP_SIZE_MB: int
+    DB_BUSY_TIMEOUT_MS: int
+    DB_POOL_SIZE: int
+    DB_READ_WORKERS: int
+
+    # 任务列表总数的缓存秒数（0 表示每次请求都计数）；新建或删除任务时立即失效
+    TASKS_TOTAL_CACHE_SECONDS: int
+
     # 维护配置
     MAINTENANCE_ENABLED: bool
     MAINTENANCE_INTERVAL_SECONDS: int
     MAINTENANCE_DELETE_ORPHANS: bool
 
+    # 数据保留：超过天数或超出每个上传者（owner_ip）保留条数的任务连同输出目录一并清理，下载日志按天数清理（0 表示不限）；清理前归档为 gzip JSONL，每轮维护分批执行
+    RETENTION_DAYS: int
+    RETENTION_MAX_TASKS_PER_OWNER: int
+    DOWNLOAD_LOG_RETENTION_DAYS: int
+    RETENTION_ARCHIVE_ENABLED: bool
+    RETENTION_ARCHIVE_DIR: Path
+    RETENTION_BATCH_SIZE: int
+    RETENTION_MAX_BATCHES: int
+
     # 下载与安全配置
     DOWNLOAD_TOKEN_SECRET: str
     DOWNLOAD_TOKEN_TTL_SECONDS: int
@@ -66,6 +113,75 @@ class AppConfig:
     MAX_CONCURRENT_DOWNLOADS: int
     DOWNLOAD_LOG_ENABLED: bool
 
+    # 已完成任务的下载元数据（文件路径、大小、修改时间、下载文件名、上传者信息）的进程内缓存：条目数上限（0 表示不缓存）与有效秒数；任务删除或状态变化时立即失效
+    DOWNLOAD_CACHE_SIZE: int
+    DOWNLOAD_CACHE_TTL_SECONDS: int
+
+    # 审计日志（下载日志与上传记录）先进入有界内存队列，由后台线程按条数或时间批量写入；队列满时下载日志丢弃并计数
+    AUDIT_LOG_QUEUE_SIZE: int
+    AUDIT_LOG_BATCH_SIZE: int
+    AUDIT_LOG_FLUSH_SECONDS: float
+
+    # 上传预检：上传后在后台分析页数、图片、文字层与加密情况并估算 LLM token；超出上限（0 表示不限）或无法处理的文件在开始翻译时直接拒绝
+    PREFLIGHT_ENABLED: bool
+    PREFLIGHT_MAX_PAGES: int
+    PREFLIGHT_MAX_IMAGES: int
+    PREFLIGHT_WAIT_SECONDS: float
+
+    # 图片预筛选（triage）配置：在 translate_image 之前快速跳过不可能包含文字的图片
+    IMAGE_TRIAGE_ENABLED: bool
+    IMAGE_TRIAGE_MIN_SIDE: int
+    IMAGE_TRIAGE_MIN_AREA: int
+    IMAGE_TRIAGE_MAX_ASPECT: float
+    IMAGE_TRIAGE_MIN_EDGE_DENSITY: float
+    IMAGE_TRIAGE_MIN_ENTROPY: float
+    IMAGE_TRIAGE_MAX_ENTROPY: float
+    IMAGE_TRIAGE_THUMB_SIDE: int
+    IMAGE_TRIAGE_MIN_TEXT_COMPONENTS: int
+
+    # 图片检测工作分辨率：布局检测与 OCR 在缩小后的图像上进行，坐标再映射回原图
+    IMAGE_DETECT_MAX_SIDE: int
+    IMAGE_OCR_MAX_SIDE: int
+    IMAGE_OCR_MIN_SCORE: float
+
+    # 图片处理进程池：-1 表示按 CPU 核数自动设置，0 表示在任务线程内串行处理
+    IMAGE_WORKERS: int
+
+    # 任务开始即在后台预处理图片（与 BabelDOC 文本阶段并行），hook 只取结果写回；
+    # IMAGE_PREPASS_INFLIGHT 为预处理同时在途的图片数上限（0 表示图片进程数的 2 倍）
+    IMAGE_PREPASS_ENABLED: bool
+    IMAGE_PREPASS_INFLIGHT: int
+
+    # 图片修复引擎：auto 按窗口周围背景的方差/纹理自动选择（solid/ns/pyramid/telea），也可固定为某一引擎
+    IMAGE_INPAINT_METHOD: str
+    IMAGE_INPAINT_SOLID_STD: float
+    IMAGE_INPAINT_SMOOTH_TEXTURE: float
+    IMAGE_INPAINT_PYRAMID_AREA: int
+
+    # 图片文字排版：字形 advance 缓存与栅格化字形掩码缓存的最大条目数（按 字体/字号/字符 计）
+    TEXT_ADVANCE_CACHE_SIZE: int
+    TEXT_GLYPH_CACHE_SIZE: int
+
+    # 图片文字字体：缓存的字体对象上限（按 字体文件/字号 计）与启动时预加载的字号
+    FONT_CACHE_SIZE: int
+    FONT_PRELOAD_SIZES: Tuple[int, ...]
+
+    # 图片翻译输出：编码方式（auto/full/patch）、PNG 压缩级别、补丁模式的最大变化面积占比
+    IMAGE_OUTPUT_MODE: str
+    IMAGE_PNG_COMPRESS_LEVEL: int
+    IMAGE_PATCH_MAX_RATIO: float
+
+    # OCR 引擎池大小（0 表示与 MAX_CONCURRENT_TRANSLATIONS 相同）与 ONNX Runtime 会话的线程数（intra 为 0 表示按 CPU 核数/并行调用方数 均分）、图优化级别（disable/basic/extended/all）
+    OCR_POOL_SIZE: int
+    ONNX_INTRA_OP_THREADS: int
+    ONNX_INTER_OP_THREADS: int
+    ONNX_GRAPH_OPTIMIZATION: str
+
+    # 启动预热与 ONNX 优化图磁盘缓存
+    WARMUP_ENABLED: bool
+    ONNX_CACHE_ENABLED: bool
+    ONNX_CACHE_DIR: Path
+
     @staticmethod
     def from_env() -> "AppConfig":
         _load_env()
@@ -78,14 +194,70 @@ class AppConfig:
             GLOSSARIES_DIR=Path(path("data/glossaries")),
             OUTPUTS_DIR=Path(path("data/outputs")),
             DB_PATH=Path(path("data/history.sqlite")),
+            DB_JOURNAL_MODE=(os.getenv("DB_JOURNAL_MODE", "wal") or "wal").strip().upper(),
+            DB_SYNCHRONOUS=(os.getenv("DB_SYNCHRONOUS", "normal") or "normal").strip().upper(),
+            DB_MMAP_SIZE_MB=_parse_int(os.getenv("DB_MMAP_SIZE_MB", "256"), 256, 0, 65536),
+            DB_BUSY_TIMEOUT_MS=_parse_int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"), 5000, 0, 600000),
+            DB_POOL_SIZE=_parse_int(os.getenv("DB_POOL_SIZE", "8"), 8, 1, 64),
+            DB_READ_WORKERS=_parse_int(os.getenv("DB_READ_WORKERS", "4"), 4, 1, 64),
+            TASKS_TOTAL_CACHE_SECONDS=_parse_int(os.getenv("TASKS_TOTAL_CACHE_SECONDS", "10"), 10, 0, 3600),
             MAINTENANCE_ENABLED=_parse_bool(os.getenv("MAINTENANCE_ENABLED", "true"), True),
             MAINTENANCE_INTERVAL_SECONDS=_parse_int(os.getenv("MAINTENANCE_INTERVAL_SECONDS", "3600"), 3600, 60, 86400),
             MAINTENANCE_DELETE_ORPHANS=_parse_bool(os.getenv("MAINTENANCE_DELETE_ORPHANS", "true"), True),
+            RETENTION_DAYS=_parse_int(os.getenv("RETENTION_DAYS", "0"), 0, 0),
+            RETENTION_MAX_TASKS_PER_OWNER=_parse_int(os.getenv("RETENTION_MAX_TASKS_PER_OWNER", "0"), 0, 0),
+            DOWNLOAD_LOG_RETENTION_DAYS=_parse_int(os.getenv("DOWNLOAD_LOG_RETENTION_DAYS", "0"), 0, 0),
+            RETENTION_ARCHIVE_ENABLED=_parse_bool(os.getenv("RETENTION_ARCHIVE_ENABLED"), True),
+            RETENTION_ARCHIVE_DIR=Path(os.getenv("RETENTION_ARCHIVE_DIR") or path("data/archive")),
+            RETENTION_BATCH_SIZE=_parse_int(os.getenv("RETENTION_BATCH_SIZE", "100"), 100, 1, 5000),
+            RETENTION_MAX_BATCHES=_parse_int(os.getenv("RETENTION_MAX_BATCHES", "10"), 10, 1, 1000),
             DOWNLOAD_TOKEN_SECRET=os.getenv("DOWNLOAD_TOKEN_SECRET", "CHANGE_ME_SECRET"),
             DOWNLOAD_TOKEN_TTL_SECONDS=_parse_int(os.getenv("DOWNLOAD_TOKEN_TTL_SECONDS", "600"), 600, 60, 24 * 3600),
             DOWNLOAD_REQUIRE_OWNER_TOKEN=_parse_bool(os.getenv("DOWNLOAD_REQUIRE_OWNER_TOKEN", "false"), False),
             MAX_CONCURRENT_DOWNLOADS=_parse_int(os.getenv("MAX_CONCURRENT_DOWNLOADS", "4"), 4, 1, 64),
             DOWNLOAD_LOG_ENABLED=_parse_bool(os.getenv("DOWNLOAD_LOG_ENABLED", "true"), True),
+            DOWNLOAD_CACHE_SIZE=_parse_int(os.getenv("DOWNLOAD_CACHE_SIZE", "1024"), 1024, 0, 1000000),
+            DOWNLOAD_CACHE_TTL_SECONDS=_parse_int(os.getenv("DOWNLOAD_CACHE_TTL_SECONDS", "300"), 300, 1, 86400),
+            AUDIT_LOG_QUEUE_SIZE=_parse_int(os.getenv("AUDIT_LOG_QUEUE_SIZE", "10000"), 10000, 1),
+            AUDIT_LOG_BATCH_SIZE=_parse_int(os.getenv("AUDIT_LOG_BATCH_SIZE", "200"), 200, 1, 10000),
+            AUDIT_LOG_FLUSH_SECONDS=_parse_float(os.getenv("AUDIT_LOG_FLUSH_SECONDS", "1"), 1.0, 0.05, 60.0),
+            PREFLIGHT_ENABLED=_parse_bool(os.getenv("PREFLIGHT_ENABLED"), True),
+            PREFLIGHT_MAX_PAGES=_parse_int(os.getenv("PREFLIGHT_MAX_PAGES", "0"), 0, 0),
+            PREFLIGHT_MAX_IMAGES=_parse_int(os.getenv("PREFLIGHT_MAX_IMAGES", "0"), 0, 0),
+            PREFLIGHT_WAIT_SECONDS=_parse_float(os.getenv("PREFLIGHT_WAIT_SECONDS", "30"), 30.0, 0.0, 600.0),
+            IMAGE_TRIAGE_ENABLED=_parse_bool(os.getenv("IMAGE_TRIAGE_ENABLED", "true"), True),
+            IMAGE_TRIAGE_MIN_SIDE=_parse_int(os.getenv("IMAGE_TRIAGE_MIN_SIDE", "24"), 24, 1, 4096),
+            IMAGE_TRIAGE_MIN_AREA=_parse_int(os.getenv("IMAGE_TRIAGE_MIN_AREA", "4096"), 4096, 1),
+            IMAGE_TRIAGE_MAX_ASPECT=_parse_float(os.getenv("IMAGE_TRIAGE_MAX_ASPECT", "25"), 25.0, 1.0),
+            IMAGE_TRIAGE_MIN_EDGE_DENSITY=_parse_float(os.getenv("IMAGE_TRIAGE_MIN_EDGE_DENSITY", "0.002"), 0.002, 0.0, 1.0),
+            IMAGE_TRIAGE_MIN_ENTROPY=_parse_float(os.getenv("IMAGE_TRIAGE_MIN_ENTROPY", "0.01"), 0.01, 0.0, 9.0),
+            IMAGE_TRIAGE_MAX_ENTROPY=_parse_float(os.getenv("IMAGE_TRIAGE_MAX_ENTROPY", "8.0"), 8.0, 0.0, 9.0),
+            IMAGE_TRIAGE_THUMB_SIDE=_parse_int(os.getenv("IMAGE_TRIAGE_THUMB_SIDE", "1024"), 1024, 64, 8192),
+            IMAGE_TRIAGE_MIN_TEXT_COMPONENTS=_parse_int(os.getenv("IMAGE_TRIAGE_MIN_TEXT_COMPONENTS", "1"), 1, 0),
+            IMAGE_DETECT_MAX_SIDE=_parse_int(os.getenv("IMAGE_DETECT_MAX_SIDE", "1024"), 1024, 0, 16384),
+            IMAGE_OCR_MAX_SIDE=_parse_int(os.getenv("IMAGE_OCR_MAX_SIDE", "1600"), 1600, 0, 16384),
+            IMAGE_OCR_MIN_SCORE=_parse_float(os.getenv("IMAGE_OCR_MIN_SCORE", "0.6"), 0.6, 0.0, 1.0),
+            IMAGE_WORKERS=_parse_int(os.getenv("IMAGE_WORKERS", "-1"), -1, -1, 256),
+            IMAGE_PREPASS_ENABLED=_parse_bool(os.getenv("IMAGE_PREPASS_ENABLED", "true"), True),
+            IMAGE_PREPASS_INFLIGHT=_parse_int(os.getenv("IMAGE_PREPASS_INFLIGHT", "0"), 0, 0, 256),
+            IMAGE_INPAINT_METHOD=(os.getenv("IMAGE_INPAINT_METHOD", "auto") or "auto").strip().lower(),
+            IMAGE_INPAINT_SOLID_STD=_parse_float(os.getenv("IMAGE_INPAINT_SOLID_STD", "3.0"), 3.0, 0.0, 255.0),
+            IMAGE_INPAINT_SMOOTH_TEXTURE=_parse_float(os.getenv("IMAGE_INPAINT_SMOOTH_TEXTURE", "4.0"), 4.0, 0.0, 255.0),
+            IMAGE_INPAINT_PYRAMID_AREA=_parse_int(os.getenv("IMAGE_INPAINT_PYRAMID_AREA", "40000"), 40000, 0),
+            TEXT_ADVANCE_CACHE_SIZE=_parse_int(os.getenv("TEXT_ADVANCE_CACHE_SIZE", "65536"), 65536, 1024),
+            TEXT_GLYPH_CACHE_SIZE=_parse_int(os.getenv("TEXT_GLYPH_CACHE_SIZE", "8192"), 8192, 256),
+            FONT_CACHE_SIZE=_parse_int(os.getenv("FONT_CACHE_SIZE", "256"), 256, 8),
+            FONT_PRELOAD_SIZES=_parse_int_list(os.getenv("FONT_PRELOAD_SIZES"), (12, 16, 20, 24, 30, 36), 1, 512),
+            IMAGE_OUTPUT_MODE=(os.getenv("IMAGE_OUTPUT_MODE", "auto") or "auto").strip().lower(),
+            IMAGE_PNG_COMPRESS_LEVEL=_parse_int(os.getenv("IMAGE_PNG_COMPRESS_LEVEL", "3"), 3, 0, 9),
+            IMAGE_PATCH_MAX_RATIO=_parse_float(os.getenv("IMAGE_PATCH_MAX_RATIO", "0.5"), 0.5, 0.0, 1.0),
+            OCR_POOL_SIZE=_parse_int(os.getenv("OCR_POOL_SIZE", "0"), 0, 0, 64),
+            ONNX_INTRA_OP_THREADS=_parse_int(os.getenv("ONNX_INTRA_OP_THREADS", "0"), 0, 0, 256),
+            ONNX_INTER_OP_THREADS=_parse_int(os.getenv("ONNX_INTER_OP_THREADS", "1"), 1, 1, 64),
+            ONNX_GRAPH_OPTIMIZATION=(os.getenv("ONNX_GRAPH_OPTIMIZATION", "all") or "all").strip().lower(),
+            WARMUP_ENABLED=_parse_bool(os.getenv("WARMUP_ENABLED"), True),
+            ONNX_CACHE_ENABLED=_parse_bool(os.getenv("ONNX_CACHE_ENABLED"), True),
+            ONNX_CACHE_DIR=Path(os.getenv("ONNX_CACHE_DIR") or path("data/onnx_cache")),
         )
 
     def ensure_dirs(self) -> None:
@@ -108,16 +280,74 @@ UPLOADS_DIR: Path = CONFIG.UPLOADS_DIR
 GLOSSARIES_DIR: Path = CONFIG.GLOSSARIES_DIR
 OUTPUTS_DIR: Path = CONFIG.OUTPUTS_DIR
 DB_PATH: Path = CONFIG.DB_PATH
+DB_JOURNAL_MODE: str = CONFIG.DB_JOURNAL_MODE
+DB_SYNCHRONOUS: str = CONFIG.DB_SYNCHRONOUS
+DB_MMAP_SIZE_MB: int = CONFIG.DB_MMAP_SIZE_MB
+DB_BUSY_TIMEOUT_MS: int = CONFIG.DB_BUSY_TIMEOUT_MS
+DB_POOL_SIZE: int = CONFIG.DB_POOL_SIZE
+DB_READ_WORKERS: int = CONFIG.DB_READ_WORKERS
+TASKS_TOTAL_CACHE_SECONDS: int = CONFIG.TASKS_TOTAL_CACHE_SECONDS
 
 MAINTENANCE_ENABLED: bool = CONFIG.MAINTENANCE_ENABLED
 MAINTENANCE_INTERVAL_SECONDS: int = CONFIG.MAINTENANCE_INTERVAL_SECONDS
 MAINTENANCE_DELETE_ORPHANS: bool = CONFIG.MAINTENANCE_DELETE_ORPHANS
+RETENTION_DAYS: int = CONFIG.RETENTION_DAYS
+RETENTION_MAX_TASKS_PER_OWNER: int = CONFIG.RETENTION_MAX_TASKS_PER_OWNER
+DOWNLOAD_LOG_RETENTION_DAYS: int = CONFIG.DOWNLOAD_LOG_RETENTION_DAYS
+RETENTION_ARCHIVE_ENABLED: bool = CONFIG.RETENTION_ARCHIVE_ENABLED
+RETENTION_ARCHIVE_DIR: Path = CONFIG.RETENTION_ARCHIVE_DIR
+RETENTION_BATCH_SIZE: int = CONFIG.RETENTION_BATCH_SIZE
+RETENTION_MAX_BATCHES: int = CONFIG.RETENTION_MAX_BATCHES
 
 DOWNLOAD_TOKEN_SECRET: str = CONFIG.DOWNLOAD_TOKEN_SECRET
 DOWNLOAD_TOKEN_TTL_SECONDS: int = CONFIG.DOWNLOAD_TOKEN_TTL_SECONDS
 DOWNLOAD_REQUIRE_OWNER_TOKEN: bool = CONFIG.DOWNLOAD_REQUIRE_OWNER_TOKEN
 MAX_CONCURRENT_DOWNLOADS: int = CONFIG.MAX_CONCURRENT_DOWNLOADS
 DOWNLOAD_LOG_ENABLED: bool = CONFIG.DOWNLOAD_LOG_ENABLED
+DOWNLOAD_CACHE_SIZE: int = CONFIG.DOWNLOAD_CACHE_SIZE
+DOWNLOAD_CACHE_TTL_SECONDS: int = CONFIG.DOWNLOAD_CACHE_TTL_SECONDS
+AUDIT_LOG_QUEUE_SIZE: int = CONFIG.AUDIT_LOG_QUEUE_SIZE
+AUDIT_LOG_BATCH_SIZE: int = CONFIG.AUDIT_LOG_BATCH_SIZE
+AUDIT_LOG_FLUSH_SECONDS: float = CONFIG.AUDIT_LOG_FLUSH_SECONDS
+PREFLIGHT_ENABLED: bool = CONFIG.PREFLIGHT_ENABLED
+PREFLIGHT_MAX_PAGES: int = CONFIG.PREFLIGHT_MAX_PAGES
+PREFLIGHT_MAX_IMAGES: int = CONFIG.PREFLIGHT_MAX_IMAGES
+PREFLIGHT_WAIT_SECONDS: float = CONFIG.PREFLIGHT_WAIT_SECONDS
+
+IMAGE_TRIAGE_ENABLED: bool = CONFIG.IMAGE_TRIAGE_ENABLED
+IMAGE_TRIAGE_MIN_SIDE: int = CONFIG.IMAGE_TRIAGE_MIN_SIDE
+IMAGE_TRIAGE_MIN_AREA: int = CONFIG.IMAGE_TRIAGE_MIN_AREA
+IMAGE_TRIAGE_MAX_ASPECT: float = CONFIG.IMAGE_TRIAGE_MAX_ASPECT
+IMAGE_TRIAGE_MIN_EDGE_DENSITY: float = CONFIG.IMAGE_TRIAGE_MIN_EDGE_DENSITY
+IMAGE_TRIAGE_MIN_ENTROPY: float = CONFIG.IMAGE_TRIAGE_MIN_ENTROPY
+IMAGE_TRIAGE_MAX_ENTROPY: float = CONFIG.IMAGE_TRIAGE_MAX_ENTROPY
+IMAGE_TRIAGE_THUMB_SIDE: int = CONFIG.IMAGE_TRIAGE_THUMB_SIDE
+IMAGE_TRIAGE_MIN_TEXT_COMPONENTS: int = CONFIG.IMAGE_TRIAGE_MIN_TEXT_COMPONENTS
+
+IMAGE_DETECT_MAX_SIDE: int = CONFIG.IMAGE_DETECT_MAX_SIDE
+IMAGE_OCR_MAX_SIDE: int = CONFIG.IMAGE_OCR_MAX_SIDE
+IMAGE_OCR_MIN_SCORE: float = CONFIG.IMAGE_OCR_MIN_SCORE
+IMAGE_WORKERS: int = CONFIG.IMAGE_WORKERS
+IMAGE_PREPASS_ENABLED: bool = CONFIG.IMAGE_PREPASS_ENABLED
+IMAGE_PREPASS_INFLIGHT: int = CONFIG.IMAGE_PREPASS_INFLIGHT
+IMAGE_INPAINT_METHOD: str = CONFIG.IMAGE_INPAINT_METHOD
+IMAGE_INPAINT_SOLID_STD: float = CONFIG.IMAGE_INPAINT_SOLID_STD
+IMAGE_INPAINT_SMOOTH_TEXTURE: float = CONFIG.IMAGE_INPAINT_SMOOTH_TEXTURE
+IMAGE_INPAINT_PYRAMID_AREA: int = CONFIG.IMAGE_INPAINT_PYRAMID_AREA
+TEXT_ADVANCE_CACHE_SIZE: int = CONFIG.TEXT_ADVANCE_CACHE_SIZE
+TEXT_GLYPH_CACHE_SIZE: int = CONFIG.TEXT_GLYPH_CACHE_SIZE
+FONT_CACHE_SIZE: int = CONFIG.FONT_CACHE_SIZE
+FONT_PRELOAD_SIZES: Tuple[int, ...] = CONFIG.FONT_PRELOAD_SIZES
+IMAGE_OUTPUT_MODE: str = CONFIG.IMAGE_OUTPUT_MODE
+IMAGE_PNG_COMPRESS_LEVEL: int = CONFIG.IMAGE_PNG_COMPRESS_LEVEL
+IMAGE_PATCH_MAX_RATIO: float = CONFIG.IMAGE_PATCH_MAX_RATIO
+OCR_POOL_SIZE: int = CONFIG.OCR_POOL_SIZE
+ONNX_INTRA_OP_THREADS: int = CONFIG.ONNX_INTRA_OP_THREADS
+ONNX_INTER_OP_THREADS: int = CONFIG.ONNX_INTER_OP_THREADS
+ONNX_GRAPH_OPTIMIZATION: str = CONFIG.ONNX_GRAPH_OPTIMIZATION
+WARMUP_ENABLED: bool = CONFIG.WARMUP_ENABLED
+ONNX_CACHE_ENABLED: bool = CONFIG.ONNX_CACHE_ENABLED
+ONNX_CACHE_DIR: Path = CONFIG.ONNX_CACHE_DIR
 
 
 __all__ = [
@@ -129,12 +359,68 @@ __all__ = [
     "GLOSSARIES_DIR",
     "OUTPUTS_DIR",
     "DB_PATH",
+    "DB_JOURNAL_MODE",
+    "DB_SYNCHRONOUS",
+    "DB_MMAP_SIZE_MB",
+    "DB_BUSY_TIMEOUT_MS",
+    "DB_POOL_SIZE",
+    "DB_READ_WORKERS",
+    "TASKS_TOTAL_CACHE_SECONDS",
     "MAINTENANCE_ENABLED",
     "MAINTENANCE_INTERVAL_SECONDS",
     "MAINTENANCE_DELETE_ORPHANS",
+    "RETENTION_DAYS",
+    "RETENTION_MAX_TASKS_PER_OWNER",
+    "DOWNLOAD_LOG_RETENTION_DAYS",
+    "RETENTION_ARCHIVE_ENABLED",
+    "RETENTION_ARCHIVE_DIR",
+    "RETENTION_BATCH_SIZE",
+    "RETENTION_MAX_BATCHES",
     "DOWNLOAD_TOKEN_SECRET",
     "DOWNLOAD_TOKEN_TTL_SECONDS",
     "DOWNLOAD_REQUIRE_OWNER_TOKEN",
     "MAX_CONCURRENT_DOWNLOADS",
     "DOWNLOAD_LOG_ENABLED",
+    "DOWNLOAD_CACHE_SIZE",
+    "DOWNLOAD_CACHE_TTL_SECONDS",
+    "AUDIT_LOG_QUEUE_SIZE",
+    "AUDIT_LOG_BATCH_SIZE",
+    "AUDIT_LOG_FLUSH_SECONDS",
+    "PREFLIGHT_ENABLED",
+    "PREFLIGHT_MAX_PAGES",
+    "PREFLIGHT_MAX_IMAGES",
+    "PREFLIGHT_WAIT_SECONDS",
+    "IMAGE_TRIAGE_ENABLED",
+    "IMAGE_TRIAGE_MIN_SIDE",
+    "IMAGE_TRIAGE_MIN_AREA",
+    "IMAGE_TRIAGE_MAX_ASPECT",
+    "IMAGE_TRIAGE_MIN_EDGE_DENSITY",
+    "IMAGE_TRIAGE_MIN_ENTROPY",
+    "IMAGE_TRIAGE_MAX_ENTROPY",
+    "IMAGE_TRIAGE_THUMB_SIDE",
+    "IMAGE_TRIAGE_MIN_TEXT_COMPONENTS",
+    "IMAGE_DETECT_MAX_SIDE",
+    "IMAGE_OCR_MAX_SIDE",
+    "IMAGE_OCR_MIN_SCORE",
+    "IMAGE_WORKERS",
+    "IMAGE_PREPASS_ENABLED",
+    "IMAGE_PREPASS_INFLIGHT",
+    "IMAGE_INPAINT_METHOD",
+    "IMAGE_INPAINT_SOLID_STD",
+    "IMAGE_INPAINT_SMOOTH_TEXTURE",
+    "IMAGE_INPAINT_PYRAMID_AREA",
+    "TEXT_ADVANCE_CACHE_SIZE",
+    "TEXT_GLYPH_CACHE_SIZE",
+    "FONT_CACHE_SIZE",
+    "FONT_PRELOAD_SIZES",
+    "IMAGE_OUTPUT_MODE",
+    "IMAGE_PNG_COMPRESS_LEVEL",
+    "IMAGE_PATCH_MAX_RATIO",
+    "OCR_POOL_SIZE",
+    "ONNX_INTRA_OP_THREADS",
+    "ONNX_INTER_OP_THREADS",
+    "ONNX_GRAPH_OPTIMIZATION",
+    "WARMUP_ENABLED",
+    "ONNX_CACHE_ENABLED",
+    "ONNX_CACHE_DIR",
 ]
\ No newline at end of file
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""图片译文绘制用的字体管理：有界 LRU、线程安全、启动校验与常用字号预加载。"""
+import logging
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from PIL import ImageFont
+
+from core.config import FONT_CACHE_SIZE, FONT_PRELOAD_SIZES
+from core.path_util import resource_path
+from core.text_layout import DEFAULT_FONT_RELATIVE_PATH, NOTOSANS_FONT_PATH
+
+logger = logging.getLogger(__name__)
+
+# TrueType/OpenType 文件头（sfnt 版本号或集合标记）
+_FONT_MAGIC = (b"\x00\x01\x00\x00", b"OTTO", b"true", b"ttcf")
+# Pillow 内置字体在缓存中的路径占位
+_BUILTIN = "<builtin>"
+
+
+def _abs_font_path(font_path: str) -> str:
+    return font_path if os.path.isabs(font_path) else resource_path(font_path)
+
+
+def validate_font_file(font_path: str) -> Optional[str]:
+    """校验字体文件：存在、非空、文件头为 TrueType/OpenType 且 FreeType 能打开。
+
+    通过返回 None，否则返回失败原因。
+    """
+    try:
+        with open(font_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < 12:
+                return "文件过小"
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if mm[:4] not in _FONT_MAGIC:
+                    return f"文件头不是 TrueType/OpenType: {mm[:4]!r}"
+        ImageFont.truetype(font_path, 12, encoding="utf-8")
+    except FileNotFoundError:
+        return "文件不存在"
+    except Exception as e:
+        return str(e) or e.__class__.__name__
+    return None
+
+
+class FontManager:
+    """(字体文件, 字号) → FreeTypeFont 的有界 LRU 缓存，进程内所有任务共享。
+
+    - 每个字体路径只校验一次：不可用的路径记住其回退目标，告警只打印一次。
+    - 按文件路径加载：FreeType 以内存映射方式读取字体文件，同一文件的各字号共享同一份页缓存；
+      （Pillow 对内存中的字体字节会按字号各复制一份，因此不走 bytes 加载。）
+    - 回退顺序与原实现一致：指定字体 → 默认字体 → Pillow 内置字体。
+    """
+
+    def __init__(self, capacity: int = FONT_CACHE_SIZE):
+        self.capacity = max(8, int(capacity))
+        self._fonts: "OrderedDict[Tuple[str, int], object]" = OrderedDict()
+        self._resolved: Dict[str, str] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_failures = 0
+
+    def resolve(self, font_path: str) -> str:
+        """将请求的字体路径解析为实际加载的文件（或内置字体占位），结果缓存。"""
+        with self._lock:
+            resolved = self._resolved.get(font_path)
+            if resolved is not None:
+                return resolved
+            candidate = _abs_font_path(font_path)
+            reason = validate_font_file(candidate)
+            if reason is None:
+                resolved = candidate
+            else:
+                self.load_failures += 1
+                if font_path != DEFAULT_FONT_RELATIVE_PATH:
+                    resolved = self.resolve(DEFAULT_FONT_RELATIVE_PATH)
+                    logger.warning(f"字体不可用: {candidate} ({reason})，回退到 {resolved}")
+                else:
+                    resolved = _BUILTIN
+                    logger.warning(f"默认字体不可用: {candidate} ({reason})，使用 Pillow 默认字体。")
+            self._resolved[font_path] = resolved
+            return resolved
+
+    def get(self, font_path: str = DEFAULT_FONT_RELATIVE_PATH, font_size: int = 30):
+        """获取指定字体与字号的字体对象（带缓存）。"""
+        try:
+            font_size = int(font_size)
+            if font_size <= 0:
+                font_size = 30  # 防止无效字号
+        except (ValueError, TypeError):
+            font_size = 30
+
+        resolved = self.resolve(font_path)
+        key = (resolved, font_size if resolved != _BUILTIN else 0)
+        with self._lock:
+            font = self._fonts.get(key)
+            if font is not None:
+                self._fonts.move_to_end(key)
+                self.hits += 1
+                return font
+            self.misses += 1
+        font = self._load(resolved, font_size)
+        with self._lock:
+            font = self._fonts.setdefault(key, font)
+            self._fonts.move_to_end(key)
+            while len(self._fonts) > self.capacity:
+                self._fonts.popitem(last=False)
+                self.evictions += 1
+        return font
+
+    def _load(self, resolved: str, font_size: int):
+        if resolved != _BUILTIN:
+            try:
+                return ImageFont.truetype(resolved, font_size, encoding="utf-8")
+            except Exception as e:
+                logger.error(f"加载字体 {resolved} (大小: {font_size}) 失败: {e}，使用 Pillow 默认字体。")
+                with self._lock:
+                    self.load_failures += 1
+        return ImageFont.load_default()
+
+    def preload(self, font_paths: Iterable[str] = (DEFAULT_FONT_RELATIVE_PATH, NOTOSANS_FONT_PATH),
+                sizes: Iterable[int] = FONT_PRELOAD_SIZES) -> int:
+        """校验字体文件并预加载常用字号，返回加载的字体对象数。"""
+        loaded = 0
+        for path in font_paths:
+            if self.resolve(path) == _BUILTIN:
+                continue
+            for size in sizes:
+                self.get(path, size)
+                loaded += 1
+        return loaded
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "size": len(self._fonts),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "load_failures": self.load_failures,
+                "files": {path: resolved for path, resolved in self._resolved.items()},
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._fonts.clear()
+            self._resolved.clear()
+
+
+font_manager = FontManager()
+
+
+def get_font(font_family_relative_path: str = DEFAULT_FONT_RELATIVE_PATH, font_size: int = 30):
+    """加载字体文件（带缓存）。
+
+    - 优先使用传入路径（支持绝对/相对路径）。
+    - 若加载失败，尝试使用默认字体；仍失败则回退到 Pillow 内置字体。
+    """
+    return font_manager.get(font_family_relative_path, font_size)
+
+
+__all__ = [
+    "validate_font_file",
+    "FontManager",
+    "font_manager",
+    "get_font",
+]
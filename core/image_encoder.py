@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""图片翻译结果的输出编码：尽量保持原图编码（JPEG 沿用原量化表），或只输出变化区域的小块补丁。"""
+import io
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image, JpegImagePlugin
+
+from core.config import IMAGE_OUTPUT_MODE, IMAGE_PNG_COMPRESS_LEVEL, IMAGE_PATCH_MAX_RATIO
+from core.image_triage import stats_lock
+
+logger = logging.getLogger(__name__)
+
+# 变化区域检测的块大小（像素）：按块判断是否变化，再对块网格做连通域
+_PATCH_BLOCK = 16
+# 补丁数量上限：超过时改为整图输出，避免页面中插入过多小图
+_PATCH_MAX_COUNT = 32
+
+_JPEG_EXTS = {"jpeg", "jpg"}
+
+
+@dataclass
+class ImageSource:
+    """PDF 中原图的编码信息（来自 Document.extract_image）。"""
+    ext: str
+    data: bytes
+
+
+@dataclass
+class EncodedImage:
+    """编码结果：mode 为 full（整图）或 patch（变化区域补丁）。
+
+    patches 中每项为 (图像像素坐标 (x0, y0, x1, y1), 编码后的字节)；整图模式只有一项且覆盖全图。
+    """
+    mode: str
+    format: str
+    patches: List[Tuple[Tuple[int, int, int, int], bytes]] = field(default_factory=list)
+    ms: float = 0.0
+    source_bytes: int = 0
+    # 整图 JPEG 输出时由原量化表估算的质量（仅用于统计）
+    quality: Optional[int] = None
+    # 原图为 JPEG 但整图输出改用 PNG 的原因（仅用于统计）
+    fallback: Optional[str] = None
+
+    @property
+    def bytes(self) -> int:
+        return sum(len(data) for _, data in self.patches)
+
+
+# IJG 标准亮度量化表（quality=50），用于由量化表反推 JPEG 质量
+_IJG_LUMINANCE = np.array([
+    16, 11, 10, 16, 24, 40, 51, 61, 12, 12, 14, 19, 26, 58, 60, 55,
+    14, 13, 16, 24, 40, 57, 69, 56, 14, 17, 22, 29, 51, 87, 80, 62,
+    18, 22, 37, 56, 68, 109, 103, 77, 24, 35, 55, 64, 81, 104, 113, 92,
+    49, 64, 78, 87, 103, 121, 120, 101, 72, 92, 95, 98, 112, 100, 103, 99,
+], dtype=np.float64)
+
+
+def estimate_jpeg_quality(quantization: Optional[Dict]) -> Optional[int]:
+    """由亮度量化表估算 IJG 质量（1~100）；表缺失时返回 None。
+
+    对两张表分别排序后按比例比较，与系数顺序无关；结果为近似值，仅用于统计展示。
+    """
+    if not quantization or 0 not in quantization:
+        return None
+    table = np.sort(np.asarray(quantization[0], dtype=np.float64))
+    scale = float(np.mean(table / np.sort(_IJG_LUMINANCE))) * 100.0
+    if scale <= 0:
+        return None
+    quality = (200.0 - scale) / 2.0 if scale <= 100.0 else 5000.0 / scale
+    return int(min(100, max(1, round(quality))))
+
+
+def _encode_png(image: Image.Image) -> bytes:
+    out = io.BytesIO()
+    image.save(out, format="PNG", compress_level=IMAGE_PNG_COMPRESS_LEVEL)
+    return out.getvalue()
+
+
+def _is_gray(image: Image.Image) -> bool:
+    if image.mode == "L":
+        return True
+    arr = np.asarray(image.convert("RGB"))
+    return bool((arr[..., 0] == arr[..., 1]).all() and (arr[..., 1] == arr[..., 2]).all())
+
+
+def _encode_jpeg_like(image: Image.Image, source: ImageSource) -> Tuple[Optional[bytes], Optional[int], Optional[str]]:
+    """沿用原 JPEG 的颜色模式、量化表与色度抽样重新编码，返回 (字节, 估算质量, 改用 PNG 的原因)。
+
+    支持 RGB/YCbCr、灰度（L）与 CMYK 原图；其余情况或编码失败时字节为 None，并给出原因。
+    """
+    try:
+        original = Image.open(io.BytesIO(source.data))
+        if original.format != "JPEG":
+            return None, None, "not_jpeg"
+        if not original.quantization:
+            return None, None, "no_qtables"
+        out = io.BytesIO()
+        if original.mode in ("RGB", "YCbCr"):
+            image.convert("RGB").save(
+                out,
+                format="JPEG",
+                qtables=original.quantization,
+                subsampling=JpegImagePlugin.get_sampling(original),
+            )
+        elif original.mode == "L":
+            # 译文按原图取色绘制，灰度原图的结果仍是灰度；出现彩色时不能无损写回灰度 JPEG
+            if not _is_gray(image):
+                return None, None, "colour_on_gray"
+            image.convert("L").save(out, format="JPEG", qtables=original.quantization)
+        elif original.mode == "CMYK":
+            # 与解码时 Pillow 的 CMYK → RGB 转换互逆
+            image.convert("CMYK").save(out, format="JPEG", qtables=original.quantization)
+        else:
+            return None, None, f"mode_{original.mode}"
+        return out.getvalue(), estimate_jpeg_quality(original.quantization), None
+    except Exception as e:
+        logger.debug(f"按原 JPEG 参数编码失败，改用 PNG: {e}")
+        return None, None, "encode_error"
+
+
+def changed_regions(original: np.ndarray, result: np.ndarray, block: int = _PATCH_BLOCK) -> List[Tuple[int, int, int, int]]:
+    """比较前后像素，返回变化区域的外接矩形（按 block 对齐并裁剪到图像范围内）。"""
+    diff = original != result
+    if diff.ndim == 3:
+        diff = diff.any(axis=2)
+    height, width = diff.shape
+    gh, gw = -(-height // block), -(-width // block)
+    padded = np.zeros((gh * block, gw * block), dtype=bool)
+    padded[:height, :width] = diff
+    grid = padded.reshape(gh, block, gw, block).any(axis=(1, 3)).astype(np.uint8)
+    if not grid.any():
+        return []
+    count, _, stats, _ = cv2.connectedComponentsWithStats(grid, connectivity=8)
+    regions = []
+    for x, y, w, h, _ in stats[1:count]:
+        regions.append((int(x * block), int(y * block), int(min(width, (x + w) * block)), int(min(height, (y + h) * block))))
+    return regions
+
+
+def encode_image(result: np.ndarray,
+                 source: Optional[ImageSource],
+                 original: Optional[np.ndarray] = None,
+                 mode: str = IMAGE_OUTPUT_MODE) -> EncodedImage:
+    """编码处理后的图像。
+
+    - patch：只编码变化区域（PNG），插入到原图之上；无变化时 patches 为空。
+    - full：整图输出；原图为 JPEG（RGB、灰度或 CMYK）时沿用其量化表（体积与原图相当），否则使用 PNG 并在 fallback 中记录原因。
+    - auto：变化区域面积占比不超过 IMAGE_PATCH_MAX_RATIO 时使用 patch，否则 full。
+    patch/auto 需要提供处理前的像素 original。
+    """
+    started = time.perf_counter()
+    source_bytes = len(source.data) if source is not None else 0
+    height, width = result.shape[:2]
+
+    if mode in ("patch", "auto") and original is not None and original.shape == result.shape:
+        regions = changed_regions(original, result)
+        area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in regions)
+        if mode == "patch" or (len(regions) <= _PATCH_MAX_COUNT and area <= IMAGE_PATCH_MAX_RATIO * width * height):
+            patches = [((x0, y0, x1, y1), _encode_png(Image.fromarray(result[y0:y1, x0:x1])))
+                       for x0, y0, x1, y1 in regions]
+            return EncodedImage("patch", "png", patches, (time.perf_counter() - started) * 1000.0, source_bytes)
+
+    image = Image.fromarray(result)
+    data, quality, fallback = None, None, None
+    fmt = "png"
+    if source is not None and source.ext.lower() in _JPEG_EXTS:
+        data, quality, fallback = _encode_jpeg_like(image, source)
+        if data is not None:
+            fmt = "jpeg"
+    if data is None:
+        data = _encode_png(image)
+    return EncodedImage("full", fmt, [((0, 0, width, height), data)],
+                        (time.perf_counter() - started) * 1000.0, source_bytes, quality, fallback)
+
+
+def record_encode(config, encoded: EncodedImage, page_number: int, xref: int) -> None:
+    """记录单张图片的编码耗时与输出体积，并按输出方式累计到任务级统计。"""
+    logger.info(
+        f"图片编码: page={page_number}, xref={xref}, mode={encoded.mode}, format={encoded.format}, "
+        f"patches={len(encoded.patches)}, quality={encoded.quality}, ms={encoded.ms:.1f}, bytes={encoded.bytes}, source_bytes={encoded.source_bytes}"
+        + (f", fallback={encoded.fallback}" if encoded.fallback else "")
+    )
+    stats = getattr(config, "image_stats", None)
+    if not isinstance(stats, dict):
+        return
+    with stats_lock(config):
+        entry = stats.setdefault("encode", {}).setdefault(
+            f"{encoded.mode}/{encoded.format}", {"images": 0, "ms": 0.0, "bytes": 0, "source_bytes": 0}
+        )
+        entry["images"] += 1
+        entry["ms"] = round(entry["ms"] + encoded.ms, 2)
+        entry["bytes"] += encoded.bytes
+        entry["source_bytes"] += encoded.source_bytes
+        if encoded.fallback:
+            fallbacks = entry.setdefault("fallbacks", {})
+            fallbacks[encoded.fallback] = fallbacks.get(encoded.fallback, 0) + 1
+
+
+__all__ = [
+    "ImageSource",
+    "EncodedImage",
+    "estimate_jpeg_quality",
+    "changed_regions",
+    "encode_image",
+    "record_encode",
+]
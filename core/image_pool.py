@@ -0,0 +1,649 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from types import SimpleNamespace
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from core.config import IMAGE_WORKERS, IMAGE_OUTPUT_MODE, IMAGE_PREPASS_ENABLED, IMAGE_PREPASS_INFLIGHT
+from core.image_encoder import ImageSource, EncodedImage, encode_image, record_encode
+from core.image_translate import (
+    analyze_image,
+    translate_regions,
+    render_translations,
+    overlay_items_for,
+    image_job_options,
+)
+from core.image_triage import triage_image, record_triage, stats_lock
+
+logger = logging.getLogger(__name__)
+
+
+# === 共享内存图像 ===
+
+class SharedImage:
+    """父进程侧：将解码后的图像放入共享内存块，工作进程按名称挂载，避免整图序列化。
+
+    渲染阶段工作进程会把结果原地写回同一块内存（尺寸与通道数不变）。
+    """
+
+    def __init__(self, arr: np.ndarray):
+        self.shape = tuple(arr.shape)
+        self.dtype = arr.dtype.str
+        self.shm = SharedMemory(create=True, size=max(1, arr.nbytes))
+        view = np.ndarray(self.shape, dtype=arr.dtype, buffer=self.shm.buf)
+        view[...] = arr
+        del view
+
+    def handle(self) -> Tuple[str, Tuple[int, ...], str]:
+        return self.shm.name, self.shape, self.dtype
+
+    def to_image(self) -> Image.Image:
+        view = np.ndarray(self.shape, dtype=np.dtype(self.dtype), buffer=self.shm.buf)
+        try:
+            # fromarray 会复制像素，返回的图像不引用共享内存
+            return Image.fromarray(view)
+        finally:
+            del view
+
+    def release(self) -> None:
+        try:
+            self.shm.close()
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.debug(f"释放共享内存失败: {e}")
+
+
+# === 工作进程侧 ===
+
+_worker_layout_model = None
+
+
+def _init_worker(workers: int = 1) -> None:
+    """工作进程初始化：每个进程加载一份布局模型；OCR 引擎在首次使用时惰性创建。
+
+    每个进程同一时刻只处理一个任务，因此 OCR 引擎池大小为 1，ONNX 线程按进程数均分 CPU。
+    """
+    global _worker_layout_model
+    try:
+        import cv2
+        # 并行度由进程数提供，避免每个进程内 OpenCV 再开满线程
+        cv2.setNumThreads(1)
+    except Exception:
+        pass
+    from core.ocr_pool import configure_ocr_pool
+    configure_ocr_pool(1, parallel=workers)
+    from core.model_warmup import get_shared_layout_model
+    _worker_layout_model = get_shared_layout_model()
+
+
+def _attach(handle: Tuple[str, Tuple[int, ...], str]) -> Tuple[SharedMemory, np.ndarray]:
+    name, shape, dtype = handle
+    shm = SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _analyze_shared(handle, options: Dict) -> List[Dict]:
+    """工作进程：布局检测 + OCR。"""
+    shm, view = _attach(handle)
+    try:
+        config = SimpleNamespace(doc_layout_model=_worker_layout_model, **options)
+        return analyze_image(view, config)
+    finally:
+        del view
+        shm.close()
+
+
+def _render_encode(arr: np.ndarray, draw_jobs: List[Dict], draw_text: bool,
+                   source: Optional[ImageSource], output_mode: str) -> Tuple[List[Dict], EncodedImage]:
+    """原地清理 + 绘制并编码输出；返回 (逐窗口的修复记录, 编码结果)。
+
+    非整图输出时先保留一份处理前的像素，用于找出变化区域。
+    """
+    original = arr.copy() if output_mode != "full" else None
+    report: List[Dict] = []
+    render_translations(arr, draw_jobs, draw_text=draw_text, inpaint_report=report)
+    return report, encode_image(arr, source, original, output_mode)
+
+
+def _render_shared(handle, draw_jobs: List[Dict], draw_text: bool,
+                   source: Optional[ImageSource], output_mode: str) -> Tuple[List[Dict], EncodedImage]:
+    """工作进程：清理 + 绘制（原地写回共享内存）并编码，编码也在工作进程中并行完成。"""
+    shm, view = _attach(handle)
+    try:
+        return _render_encode(view, draw_jobs, draw_text, source, output_mode)
+    finally:
+        del view
+        shm.close()
+
+
+# === 父进程侧：进程池 ===
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _worker_count() -> int:
+    if IMAGE_WORKERS < 0:
+        return max(1, os.cpu_count() or 1)
+    return IMAGE_WORKERS
+
+
+def get_image_pool() -> Optional[ProcessPoolExecutor]:
+    """获取全局图片处理进程池（所有任务共享）；IMAGE_WORKERS=0 时返回 None（串行处理）。"""
+    global _pool
+    workers = _worker_count()
+    if workers <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # 使用 spawn：父进程已加载 ONNX Runtime 等多线程库，fork 存在死锁风险
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(workers,),
+            )
+            logger.info(f"图片处理进程池已启动: workers={workers}")
+        return _pool
+
+
+def shutdown_image_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+class _LazyResult:
+    """串行模式下的“Future”：首次取结果时才在当前线程计算，与原有逐图处理的时序一致。"""
+
+    def __init__(self, fn, *args, **kwargs):
+        self._call = (fn, args, kwargs)
+        self._done = False
+        self._value = None
+        self._error: Optional[BaseException] = None
+
+    def result(self):
+        if not self._done:
+            fn, args, kwargs = self._call
+            try:
+                self._value = fn(*args, **kwargs)
+            except BaseException as e:
+                self._error = e
+            self._done = True
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+def _record_inpaint(config, report: List[Dict]) -> None:
+    """将逐窗口的修复记录累计到任务级统计：各引擎的窗口数与总耗时。"""
+    stats = getattr(config, "image_stats", None)
+    if not isinstance(stats, dict) or not report:
+        return
+    with stats_lock(config):
+        engines = stats.setdefault("inpaint_engines", {})
+        for item in report:
+            entry = engines.setdefault(item.get("engine", "unknown"), {"windows": 0, "ms": 0.0})
+            entry["windows"] += 1
+            entry["ms"] = round(entry["ms"] + float(item.get("ms", 0.0)), 2)
+    logger.debug(f"图片修复记录: {report}")
+
+
+class ImageJob:
+    """单张图片的处理状态。"""
+
+    def __init__(self, page_number: int, xref: int, bbox, size: Tuple[int, int]):
+        self.page_number = page_number
+        self.xref = xref
+        self.bbox = bbox
+        self.size = size
+        # 串行模式下持有的 RGB 数组（进程池模式下像素只存在于共享内存中）
+        self.array: Optional[np.ndarray] = None
+        self.shared: Optional[SharedImage] = None
+        # 原图编码信息（输出时沿用原编码参数）
+        self.source: Optional[ImageSource] = None
+        self.analysis = None
+        self.render = None
+        self.draw_jobs: List[Dict] = []
+        # 命中任务级预处理时指向其结果（此时不再单独处理）
+        self.prepared: Optional["PreparedImage"] = None
+
+
+class PreparedImage:
+    """预处理中的一张图片（按图片字节摘要去重）：处理完成后 done 置位，hook 直接取编码结果写回。"""
+
+    def __init__(self, digest: str, page_number: int, xref: int):
+        self.digest = digest
+        self.job = ImageJob(page_number, xref, None, (0, 0))
+        self.keep = True
+        self.report: List[Dict] = []
+        self.encoded: Optional[EncodedImage] = None
+        self.recorded = False
+        self.done = threading.Event()
+
+
+def _image_digest(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+def _record_prepass(config, key: str, value) -> None:
+    with stats_lock(config):
+        stats = getattr(config, "image_stats", None)
+        if stats is None:
+            stats = {}
+            try:
+                setattr(config, "image_stats", stats)
+            except Exception:
+                return
+        if not isinstance(stats, dict):
+            return
+        entry = stats.setdefault("prepass", {"images": 0, "hits": 0, "misses": 0, "ms": 0.0})
+        if key == "ms":
+            entry["ms"] = round(float(value), 1)
+        else:
+            entry[key] = entry.get(key, 0) + value
+
+
+class ImagePipeline:
+    """按任务维护的图片处理流水线。
+
+    - 布局检测/OCR 与清理/绘制在进程池中执行，图像经共享内存传递；
+    - 翻译在调用线程中执行（翻译器带限流与 prompt hook 状态，不跨进程）；
+    - hook 处理第 N 页时会预取第 N+1 页，使其布局/OCR 与第 N 页的翻译、写回并行；
+    - 启用预处理时，任务开始即在后台线程中处理全文档图片（与 BabelDOC 的版面解析、段落翻译并行），
+      hook 按图片字节摘要取回结果，只负责写回；预处理未覆盖到的图片仍按上述方式处理。
+    """
+
+    def __init__(self, translation_config):
+        self.config = translation_config
+        self.pool = get_image_pool()
+        self.options = image_job_options(translation_config)
+        self.overlay = bool(getattr(translation_config, "enable_image_text_overlay", False))
+        self.output_mode = IMAGE_OUTPUT_MODE
+        self.pages: Dict[int, List[ImageJob]] = {}
+        self._next_page: Optional[Dict[int, int]] = None
+        self._overlay_fonts = None
+        # 预处理登记：摘要 → 预处理结果；hook 先登记的摘要记为 None（由 hook 自行处理，预处理跳过）
+        self._prepared: Dict[str, Optional[PreparedImage]] = {}
+        self._prepared_lock = threading.Lock()
+        # 预处理侧登记过的全部图片：预处理线程退出时逐一收尾，hook 不会无限等待
+        self._claimed: List[PreparedImage] = []
+        self._prepass: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def next_page_number(self, pages, page_number: int) -> Optional[int]:
+        """按 BabelDOC 的页面处理顺序返回下一页页码（无则返回 None）。"""
+        if self._next_page is None:
+            order = [getattr(p, "page_number", None) for p in (pages or [])]
+            order = [n for n in order if n is not None]
+            self._next_page = {a: b for a, b in zip(order, order[1:])}
+        return self._next_page.get(page_number)
+
+    def _submit(self, fn, *args):
+        if self.pool is not None:
+            try:
+                return self.pool.submit(fn, *args)
+            except Exception as e:
+                logger.warning(f"图片进程池提交失败，回退为串行处理: {e}")
+                self.pool = None
+        return None
+
+    def submit_page(self, pdf, page_number: int) -> List[ImageJob]:
+        """提取并预筛选指定页的图片，提交布局/OCR 任务（幂等）。"""
+        if page_number in self.pages:
+            return self.pages[page_number]
+        jobs: List[ImageJob] = []
+        self.pages[page_number] = jobs
+        try:
+            pg = pdf[page_number]
+            img_list = pg.get_images(full=True)
+        except Exception as e:
+            logger.error(f"读取页面图片失败: page={page_number}, reason={e}")
+            return jobs
+
+        for img in img_list:
+            xref = img[0]
+            try:
+                # 提取图片
+                base_image = pdf.extract_image(xref)
+                bbox = pg.get_image_bbox(img)  # 获取图片所在位置矩形
+            except Exception as e:
+                logger.error(f"提取图片失败: page={page_number}, xref={xref}, reason={e}")
+                continue
+
+            # 已由任务级预处理登记的图片：只需等待其结果（尺寸在预处理解码后填入）
+            prepared = self._lookup(base_image["image"]) if self._prepass is not None else None
+            if prepared is not None:
+                if prepared.done.is_set() and not prepared.keep:
+                    continue
+                job = ImageJob(page_number, xref, bbox, prepared.job.size)
+                job.prepared = prepared
+                jobs.append(job)
+                continue
+
+            try:
+                image = Image.open(io.BytesIO(base_image["image"])).convert("RGB")
+            except Exception as e:
+                logger.error(f"解码图片失败: page={page_number}, xref={xref}, reason={e}")
+                continue
+
+            # 预筛选：跳过尺寸过小、纯色、装饰线、照片等不可能包含可翻译文字的图片
+            triage = triage_image(image, getattr(self.config, "image_triage_thresholds", None))
+            record_triage(self.config, triage)
+            if not triage.keep:
+                logger.info(f"[triage] 跳过图片: page={page_number}, xref={xref}, reason={triage.reason}, metrics={triage.metrics}")
+                continue
+
+            job = ImageJob(page_number, xref, bbox, image.size)
+            job.source = ImageSource(str(base_image.get("ext") or ""), base_image["image"])
+            self._start_analysis(job, image)
+            # 解码得到的 PIL 图像到此不再需要
+            del image
+            jobs.append(job)
+        return jobs
+
+    def _start_analysis(self, job: ImageJob, image: Image.Image) -> None:
+        """提交布局/OCR：进程池模式下图像放入共享内存，否则在调用 result() 的线程中串行计算。"""
+        if self.pool is not None:
+            try:
+                job.shared = SharedImage(np.asarray(image))
+                job.analysis = self._submit(_analyze_shared, job.shared.handle(), self.options)
+            except Exception as e:
+                logger.warning(f"共享内存分配失败，回退为串行处理: {e}")
+                if job.shared is not None:
+                    job.shared.release()
+                    job.shared = None
+                job.analysis = None
+        if job.analysis is None:
+            # 串行模式：整条流水线只持有这一份可写数组，清理与绘制均原地进行
+            job.array = np.array(image)
+            job.analysis = _LazyResult(analyze_image, job.array, self.config)
+
+    def _start_render(self, job: ImageJob, config) -> None:
+        """等待布局/OCR 结果，用 config.translator 翻译，并提交清理与绘制任务。"""
+        try:
+            regions = job.analysis.result()
+        except Exception as e:
+            logger.error(f"图片布局/OCR 失败，保持原图: page={job.page_number}, xref={job.xref}, reason={e}")
+            regions = []
+        job.draw_jobs = translate_regions(regions, config)
+        if not job.draw_jobs:
+            return
+        draw_text = not self.overlay
+        if job.shared is not None:
+            job.render = self._submit(_render_shared, job.shared.handle(), job.draw_jobs, draw_text,
+                                      job.source, self.output_mode)
+        if job.render is None:
+            if job.array is None:
+                job.array = np.array(job.shared.to_image())
+            job.render = _LazyResult(_render_encode, job.array, job.draw_jobs, draw_text,
+                                     job.source, self.output_mode)
+
+    def translate_page(self, page_number: int) -> None:
+        """等待该页布局/OCR 结果，在当前线程翻译，并提交清理与绘制任务；命中预处理的图片只等待其完成。"""
+        for job in self.pages.get(page_number, []):
+            if job.prepared is not None:
+                job.prepared.done.wait()
+                job.size = job.prepared.job.size
+                job.draw_jobs = job.prepared.job.draw_jobs
+                continue
+            self._start_render(job, self.config)
+
+    def encoded_result(self, job: ImageJob) -> Optional[EncodedImage]:
+        """返回处理后图像的编码结果；无需更新（无译文变化或处理失败）时返回 None。"""
+        if job.prepared is not None:
+            entry = job.prepared
+            entry.done.wait()
+            if entry.encoded is None:
+                return None
+            if not entry.recorded:
+                entry.recorded = True
+                _record_inpaint(self.config, entry.report)
+            record_encode(self.config, entry.encoded, job.page_number, job.xref)
+            return entry.encoded
+        if job.render is None:
+            return None
+        try:
+            report, encoded = job.render.result()
+        except Exception as e:
+            logger.error(f"图片清理/绘制失败，保持原图: page={job.page_number}, xref={job.xref}, reason={e}")
+            return None
+        _record_inpaint(self.config, report)
+        record_encode(self.config, encoded, job.page_number, job.xref)
+        return encoded
+
+    def overlay_items(self, job: ImageJob) -> List[Dict]:
+        return overlay_items_for(job.draw_jobs)
+
+    def overlay_writer(self, pg):
+        """返回本页的覆写文字写入器；覆写字体在本文档首次使用时登记一次。"""
+        if self._overlay_fonts is None:
+            from core.pdf_overlay import OverlayFontRegistry
+            self._overlay_fonts = OverlayFontRegistry()
+        return self._overlay_fonts.writer(pg)
+
+    # --- 任务级预处理 ---
+
+    def start_prepass(self, pdf_path: str, translator) -> bool:
+        """在后台线程中预处理整个文档的图片（幂等）。
+
+        translator 为图片翻译专用的翻译器（调用方已为其绑定图片 prompt），与 BabelDOC 文本翻译所用实例互不影响。
+        """
+        if not IMAGE_PREPASS_ENABLED or self._prepass is not None:
+            return False
+        self._prepass = threading.Thread(
+            target=self._run_prepass,
+            args=(pdf_path, SimpleNamespace(translator=translator)),
+            name="image-prepass",
+            daemon=True,
+        )
+        self._prepass.start()
+        return True
+
+    def _lookup(self, data: bytes) -> Optional[PreparedImage]:
+        """hook 侧：按图片字节摘要查找预处理结果；未登记的摘要登记为由 hook 处理，预处理随后跳过。"""
+        digest = _image_digest(data)
+        with self._prepared_lock:
+            entry = self._prepared.setdefault(digest, None)
+        _record_prepass(self.config, "hits" if entry is not None else "misses", 1)
+        return entry
+
+    def _claim(self, data: bytes, page_number: int, xref: int) -> Optional[PreparedImage]:
+        """预处理侧：登记一张图片；已被登记（重复图片或 hook 已在处理）时返回 None。"""
+        digest = _image_digest(data)
+        with self._prepared_lock:
+            if digest in self._prepared:
+                return None
+            entry = self._prepared[digest] = PreparedImage(digest, page_number, xref)
+            self._claimed.append(entry)
+        _record_prepass(self.config, "images", 1)
+        return entry
+
+    def _should_translate(self, page_number: int) -> bool:
+        check = getattr(self.config, "should_translate_page", None)
+        try:
+            return bool(check(page_number + 1)) if callable(check) else True
+        except Exception:
+            return True
+
+    def _collect(self, pdf_path: str) -> Deque[Tuple[PreparedImage, Dict]]:
+        """用独立的 Document 读出全文档图片并登记（只读取原始字节，不解码），读完即关闭文档。"""
+        import fitz
+
+        sources: Deque[Tuple[PreparedImage, Dict]] = deque()
+        doc = fitz.open(pdf_path)
+        try:
+            for page_number in range(doc.page_count):
+                if self._stop.is_set():
+                    break
+                if not self._should_translate(page_number):
+                    continue
+                try:
+                    img_list = doc[page_number].get_images(full=True)
+                except Exception as e:
+                    logger.debug(f"图片预处理：读取页面图片失败，交由 hook 处理: page={page_number}, reason={e}")
+                    continue
+                for img in img_list:
+                    try:
+                        base_image = doc.extract_image(img[0])
+                    except Exception as e:
+                        logger.debug(f"图片预处理：提取图片失败，交由 hook 处理: page={page_number}, xref={img[0]}, reason={e}")
+                        continue
+                    entry = self._claim(base_image["image"], page_number, img[0])
+                    if entry is not None:
+                        sources.append((entry, base_image))
+        finally:
+            doc.close()
+        return sources
+
+    def _prepare(self, entry: PreparedImage, base_image: Dict) -> bool:
+        """解码、预筛选并提交布局/OCR；无需处理时直接收尾并返回 False。"""
+        job = entry.job
+        try:
+            image = Image.open(io.BytesIO(base_image["image"])).convert("RGB")
+        except Exception as e:
+            logger.error(f"解码图片失败: page={job.page_number}, xref={job.xref}, reason={e}")
+            entry.keep = False
+            self._finish(entry)
+            return False
+        triage = triage_image(image, getattr(self.config, "image_triage_thresholds", None))
+        record_triage(self.config, triage)
+        if not triage.keep:
+            logger.info(f"[triage] 跳过图片: page={job.page_number}, xref={job.xref}, reason={triage.reason}, metrics={triage.metrics}")
+            entry.keep = False
+            self._finish(entry)
+            return False
+        job.size = image.size
+        job.source = ImageSource(str(base_image.get("ext") or ""), base_image["image"])
+        self._start_analysis(job, image)
+        return True
+
+    def _finish(self, entry: PreparedImage) -> None:
+        """收尾一张预处理图片：取编码结果（如有），释放共享内存并置位 done。"""
+        job = entry.job
+        try:
+            if job.render is not None and not (self._stop.is_set() and isinstance(job.render, _LazyResult)):
+                entry.report, entry.encoded = job.render.result()
+            elif job.render is None and job.analysis is not None and not isinstance(job.analysis, _LazyResult):
+                job.analysis.cancel()
+        except Exception as e:
+            logger.error(f"图片清理/绘制失败，保持原图: page={job.page_number}, xref={job.xref}, reason={e}")
+            entry.encoded = None
+        finally:
+            job.array = None
+            job.analysis = job.render = None
+            if job.shared is not None:
+                job.shared.release()
+                job.shared = None
+            entry.done.set()
+
+    def _run_prepass(self, pdf_path: str, translate_config) -> None:
+        """预处理线程：布局/OCR 在进程池中并行，翻译在本线程依次进行，同时在途的图片数有上限（限制共享内存占用）。"""
+        started = time.perf_counter()
+        limit = IMAGE_PREPASS_INFLIGHT if IMAGE_PREPASS_INFLIGHT > 0 else max(2, 2 * _worker_count())
+        analyzing: Deque[PreparedImage] = deque()
+        rendering: Deque[PreparedImage] = deque()
+
+        def _advance() -> None:
+            entry = analyzing.popleft()
+            self._start_render(entry.job, translate_config)
+            if entry.job.render is None:
+                self._finish(entry)
+            else:
+                rendering.append(entry)
+
+        try:
+            try:
+                sources = self._collect(pdf_path)
+            except Exception as e:
+                logger.warning(f"图片预处理：读取文档失败，改由 hook 逐页处理: {e}")
+                return
+            while sources and not self._stop.is_set():
+                entry, base_image = sources.popleft()
+                if self._prepare(entry, base_image):
+                    analyzing.append(entry)
+                while len(analyzing) > limit:
+                    _advance()
+                while len(rendering) > limit:
+                    self._finish(rendering.popleft())
+            while analyzing and not self._stop.is_set():
+                _advance()
+            while rendering:
+                self._finish(rendering.popleft())
+        except Exception as e:
+            logger.error(f"图片预处理失败，剩余图片保持原图: {e}")
+        finally:
+            # 已登记但未完成的图片一律收尾（无结果即保持原图），含读取文档或预筛选中途失败时已登记的图片
+            with self._prepared_lock:
+                claimed = list(self._claimed)
+            for entry in claimed:
+                if not entry.done.is_set():
+                    self._finish(entry)
+            _record_prepass(self.config, "ms", (time.perf_counter() - started) * 1000.0)
+            logger.info(f"图片预处理完成: {getattr(self.config, 'image_stats', {}).get('prepass')}")
+
+    def release_page(self, page_number: int) -> None:
+        for job in self.pages.pop(page_number, []):
+            job.array = None
+            if job.shared is not None:
+                job.shared.release()
+                job.shared = None
+
+    def close(self) -> None:
+        # 通知预处理线程停止；其在途图片的共享内存由该线程收尾时释放
+        self._stop.set()
+        for page_number in list(self.pages.keys()):
+            self.release_page(page_number)
+
+
+def get_image_pipeline(translation_config) -> ImagePipeline:
+    """获取（或创建）挂在 translation_config 上的任务级图片流水线。"""
+    pipeline = getattr(translation_config, "_image_pipeline", None)
+    if pipeline is None:
+        pipeline = ImagePipeline(translation_config)
+        try:
+            setattr(translation_config, "_image_pipeline", pipeline)
+        except Exception:
+            pass
+    return pipeline
+
+
+def release_image_pipeline(translation_config) -> None:
+    """任务结束时释放未消费的预取结果（共享内存等）。"""
+    pipeline = getattr(translation_config, "_image_pipeline", None)
+    if pipeline is None:
+        return
+    try:
+        pipeline.close()
+    finally:
+        try:
+            setattr(translation_config, "_image_pipeline", None)
+        except Exception:
+            pass
+
+
+__all__ = [
+    "SharedImage",
+    "PreparedImage",
+    "ImagePipeline",
+    "get_image_pool",
+    "shutdown_image_pool",
+    "get_image_pipeline",
+    "release_image_pipeline",
+]
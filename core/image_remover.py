@@ -1,12 +1,16 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
 import logging
-from typing import Optional, List, Tuple
+import threading
+import time
+from typing import Callable, Dict, Optional, List, Tuple, Union
 
 import cv2
 import numpy as np
 from PIL import Image
 
+from core.config import IMAGE_INPAINT_SOLID_STD, IMAGE_INPAINT_SMOOTH_TEXTURE, IMAGE_INPAINT_PYRAMID_AREA
+
 # @Project : pdf_translate 
 # @File    : image_remover
 # @Author  : yuxiang.jiang
@@ -15,61 +19,285 @@ from PIL import Image
 logger = logging.getLogger(__name__)
 
 
-def create_mask(size: Tuple[int, int], boxes: List[Tuple[int, int, int, int]]) -> Image.Image:
+def create_mask(size: Tuple[int, int], boxes: List[Tuple[int, int, int, int]]) -> np.ndarray:
     """
-    创建一个与传入图片同样大小的掩码图片（L 模式：单通道，0=黑色，255=白色）。
+    创建一个与传入图片同样大小的掩码（单通道 uint8：0=保留，255=需要修复/填充）。
 
     Args:
         size: 原始图片尺寸 (width, height)
         boxes: 需要清理的矩形区域列表 [(x1, y1, x2, y2), ...]
 
     Returns:
-        Pillow 掩码图片，白色区域表示需要修复/填充的区域。
+        numpy 掩码数组，形状为 (height, width)。
     """
-    mask = Image.new("L", size, 0)
+    width, height = size
+    mask = np.zeros((height, width), dtype=np.uint8)
     for box in boxes:
-        x1, y1, x2, y2 = box
+        x1, y1, x2, y2 = (int(v) for v in box)
         # 防御性检查，避免负值或反向坐标造成异常
-        w = max(0, x2 - x1)
-        h = max(0, y2 - y1)
-        if w > 0 and h > 0:
-            mask.paste(Image.new("L", (w, h), 255), (max(0, x1), max(0, y1)))
+        x1, y1 = max(0, x1), max(0, y1)
+        if x2 > x1 and y2 > y1:
+            mask[y1:y2, x1:x2] = 255
         else:
             logger.debug(f"忽略无效 box: {(x1, y1, x2, y2)}")
 
     return mask
 
 
+# 修复窗口在 box 外扩的像素数：需覆盖 TELEA 半径并留出足够的背景上下文
+_WINDOW_PAD = 16
+# TELEA 邻域半径
+_INPAINT_RADIUS = 3
+
+# 线程内复用的掩码/输出缓冲（按需增长），避免每次调用都分配整图大小的数组
+_buffers = threading.local()
+
+
+def _scratch(name: str, size: int) -> np.ndarray:
+    """获取线程内复用的一维 uint8 缓冲，长度至少为 size。"""
+    buf = getattr(_buffers, name, None)
+    if buf is None or buf.size < size:
+        buf = np.empty(max(size, 1), dtype=np.uint8)
+        setattr(_buffers, name, buf)
+    return buf
+
+
+def _merge_windows(size: Tuple[int, int], boxes: List[Tuple[int, int, int, int]], pad: int = _WINDOW_PAD) -> List[Tuple[Tuple[int, int, int, int], List[Tuple[int, int, int, int]]]]:
+    """将 boxes 外扩 pad 像素后合并重叠窗口。
+
+    Returns:
+        [(窗口 (x0, y0, x1, y1), 窗口内的有效 boxes), ...]，坐标均已裁剪到图像范围内。
+    """
+    width, height = size
+    groups: List[Tuple[List[int], List[Tuple[int, int, int, int]]]] = []
+    for box in boxes:
+        x1, y1, x2, y2 = (int(v) for v in box)
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(width, x2), min(height, y2)
+        if x2 <= x1 or y2 <= y1:
+            logger.debug(f"忽略无效 box: {tuple(box)}")
+            continue
+        groups.append(([max(0, x1 - pad), max(0, y1 - pad), min(width, x2 + pad), min(height, y2 + pad)], [(x1, y1, x2, y2)]))
+
+    # 反复合并相交窗口，直到稳定（box 数量通常很少）
+    merged = True
+    while merged:
+        merged = False
+        out: List[Tuple[List[int], List[Tuple[int, int, int, int]]]] = []
+        for win, members in groups:
+            for other_win, other_members in out:
+                if win[0] < other_win[2] and other_win[0] < win[2] and win[1] < other_win[3] and other_win[1] < win[3]:
+                    other_win[0] = min(other_win[0], win[0])
+                    other_win[1] = min(other_win[1], win[1])
+                    other_win[2] = max(other_win[2], win[2])
+                    other_win[3] = max(other_win[3], win[3])
+                    other_members.extend(members)
+                    merged = True
+                    break
+            else:
+                out.append((win, members))
+        groups = out
+    return [(tuple(win), members) for win, members in groups]
+
+
+# === 修复引擎注册表 ===
+# 引擎签名：fn(src, mask) -> ndarray，src 为连续内存的 HxW 或 HxWx3 uint8 数组，mask 中 255 表示需要修复
+InpaintEngine = Callable[[np.ndarray, np.ndarray], np.ndarray]
+_ENGINES: Dict[str, InpaintEngine] = {}
+
+
+def register_inpaint_engine(name: str, fn: InpaintEngine) -> None:
+    """注册（或覆盖）一个修复引擎，可在 clean(method=name) 中使用。"""
+    _ENGINES[name.strip().lower()] = fn
 
-def clean(image: Image.Image, boxes: list[tuple[int, int, int, int]], method: Optional[str] = None) -> Image.Image:
+
+def get_inpaint_engines() -> List[str]:
+    return sorted(_ENGINES.keys())
+
+
+def _ring(mask: np.ndarray) -> np.ndarray:
+    """掩码外侧一圈背景像素（膨胀掩码 - 原掩码）的布尔索引。"""
+    dilated = cv2.dilate(mask, np.ones((5, 5), np.uint8), iterations=1)
+    return (dilated > 0) & (mask == 0)
+
+
+def ring_stats(src: np.ndarray, mask: np.ndarray) -> Tuple[float, float]:
+    """统计掩码周围背景：(标准差, 高频残差标准差)。
+
+    标准差反映背景是否近乎纯色（多通道取各通道最大值）；高频残差（灰度减去高斯模糊）
+    反映局部纹理，平滑渐变的背景标准差可能很大，但残差接近 0。
     """
-    根据提供的 boxes 生成掩码并对图像进行修复/填充。
+    ring = _ring(mask)
+    pixels = src[ring]
+    if pixels.size == 0:
+        return 0.0, 0.0
+    pixels = pixels.reshape(pixels.shape[0], -1).astype(np.float32)
+    std = float(pixels.std(axis=0).max())
+    gray = src if src.ndim == 2 else cv2.cvtColor(src, cv2.COLOR_RGB2GRAY)
+    gray = gray.astype(np.float32)
+    residual = gray - cv2.GaussianBlur(gray, (0, 0), 2.0)
+    return std, float(residual[ring].std())
+
+
+def solid_clean(image: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """纯色背景：以周围背景的中位数颜色直接填充（几乎零开销）。"""
+    result = image.copy()
+    pixels = image[_ring(mask)]
+    if pixels.size == 0:
+        fill = 255
+    else:
+        fill = np.median(pixels.reshape(pixels.shape[0], -1), axis=0).astype(image.dtype)
+        if image.ndim == 2:
+            fill = fill[0]
+    result[mask > 0] = fill
+    return result
+
+
+def ns_clean(image: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """使用 OpenCV 的 Navier-Stokes 算法进行图像修复（平滑渐变背景）。"""
+    return cv2.inpaint(image, mask, _INPAINT_RADIUS, cv2.INPAINT_NS)
+
+
+def pyramid_clean(image: np.ndarray, mask: np.ndarray, factor: int = 4) -> np.ndarray:
+    """大面积掩码：缩小后 TELEA 修复再放大，仅将放大结果写回掩码区域。"""
+    h, w = image.shape[:2]
+    sw, sh = max(1, w // factor), max(1, h // factor)
+    if sw < 8 or sh < 8:
+        return telea_clean(image, mask)
+    small = cv2.resize(image, (sw, sh), interpolation=cv2.INTER_AREA)
+    small_mask = cv2.resize(mask, (sw, sh), interpolation=cv2.INTER_NEAREST)
+    # 缩小后边缘可能丢失，适当膨胀保证覆盖原掩码
+    small_mask = cv2.dilate(small_mask, np.ones((3, 3), np.uint8), iterations=1)
+    repaired = cv2.inpaint(small, small_mask, _INPAINT_RADIUS, cv2.INPAINT_TELEA)
+    upscaled = cv2.resize(repaired, (w, h), interpolation=cv2.INTER_LINEAR)
+    result = image.copy()
+    result[mask > 0] = upscaled[mask > 0]
+    return result
+
+
+def select_inpaint_engine(src: np.ndarray, mask: np.ndarray) -> Tuple[str, float]:
+    """按局部背景复杂度与掩码面积为单个窗口选择修复引擎，返回 (引擎名, 背景纹理强度)。
+
+    - 背景近乎纯色 → solid
+    - 掩码面积较大 → pyramid
+    - 背景平滑（渐变、无纹理） → ns
+    - 其余（纹理背景） → telea
+    """
+    std, texture = ring_stats(src, mask)
+    if std <= IMAGE_INPAINT_SOLID_STD:
+        return "solid", texture
+    if IMAGE_INPAINT_PYRAMID_AREA > 0 and int(np.count_nonzero(mask)) >= IMAGE_INPAINT_PYRAMID_AREA:
+        return "pyramid", texture
+    if texture <= IMAGE_INPAINT_SMOOTH_TEXTURE:
+        return "ns", texture
+    return "telea", texture
+
+
+def _clean_window(region: np.ndarray, members: List[Tuple[int, int, int, int]], method: Optional[str]) -> Tuple[str, float]:
+    """对单个窗口构建局部掩码并修复，结果原地写回 region。
 
     Args:
-        image: 原始 Pillow 图像
-        boxes: 需要清理的矩形区域
-        method: 清理方法，"telea" 使用 OpenCV inpaint(TELEA)，其他使用简易填充
+        region: 窗口像素（可写的 numpy 数组，HxW 或 HxWxC）
+        members: 窗口内需要清理的 boxes（窗口局部坐标）
 
     Returns:
-        清理后的 Pillow 图像（RGB）。
+        (实际使用的引擎名, 背景纹理强度；未计算时为 -1)
     """
-    # 根据boxes创建掩码图片
-    mask_image = create_mask(image.size, boxes)
-    np_source = np.array(image)
-    np_mask = np.array(mask_image)
+    h, w = region.shape[:2]
+    mask = _scratch("mask", w * h)[: w * h].reshape(h, w)
+    mask.fill(0)
+    for bx1, by1, bx2, by2 in members:
+        mask[by1:by2, bx1:bx2] = 255
 
-    if method == "telea":
-        cleaned = telea_clean(np_source, np_mask)
+    if region.ndim == 3 and region.shape[2] == 4:
+        # RGBA：颜色通道与 alpha 分别修复（alpha 沿用颜色通道选出的引擎）
+        engine, texture = _resolve_engine(np.ascontiguousarray(region[..., :3]), mask, method)
+        region[..., :3] = _ENGINES[engine](np.ascontiguousarray(region[..., :3]), mask)
+        region[..., 3] = _ENGINES[engine](np.ascontiguousarray(region[..., 3]), mask)
     else:
-        cleaned = simple_fill_clean(np_source, np_mask)
+        src = np.ascontiguousarray(region)
+        engine, texture = _resolve_engine(src, mask, method)
+        region[...] = _ENGINES[engine](src, mask)
+    return engine, texture
+
+
+def _resolve_engine(src: np.ndarray, mask: np.ndarray, method: Optional[str]) -> Tuple[str, float]:
+    if method is None:
+        return "simple", -1.0
+    name = method.strip().lower()
+    if name == "auto":
+        return select_inpaint_engine(src, mask)
+    if name not in _ENGINES:
+        logger.warning(f"未知的修复引擎 {method}，改用 telea")
+        return "telea", -1.0
+    return name, -1.0
+
+
+def clean(image: Union[Image.Image, np.ndarray], boxes: list[tuple[int, int, int, int]], method: Optional[str] = None,
+          report: Optional[List[Dict]] = None) -> Union[Image.Image, np.ndarray]:
+    """
+    根据提供的 boxes 对图像进行修复/填充。
+
+    仅在每组 box 外扩后的局部窗口内修复（重叠窗口会合并），耗时与清理面积相关而与整图尺寸无关。
+
+    Args:
+        image: 原始图像。numpy 数组（HxW / HxWx3 / HxWx4，uint8）会被原地修改并原样返回；
+            Pillow 图像（L / RGB / RGBA 保持原模式，其余模式转换为 RGB）返回新的图像，原图不变。
+        boxes: 需要清理的矩形区域
+        method: 清理方法：已注册的引擎名（solid / ns / pyramid / telea），"auto" 按窗口自动选择，
+            None 使用简易填充
+        report: 可选；传入列表时逐窗口追加 {"window", "engine", "texture", "ms"} 记录，便于比较速度与质量
+
+    Returns:
+        清理后的图像（类型与输入一致）。
+    """
+    if isinstance(image, np.ndarray):
+        height, width = image.shape[:2]
+        for (x0, y0, x1, y1), members in _merge_windows((width, height), boxes):
+            try:
+                started = time.perf_counter()
+                outcome = _clean_window(image[y0:y1, x0:x1], _local_boxes(members, x0, y0), method)
+                _record(report, (x0, y0, x1, y1), started, outcome)
+            except Exception as e:
+                logger.error(f"局部修复失败，保持该区域原样: window={(x0, y0, x1, y1)}, reason={e}")
+        return image
+
+    if image.mode not in ("L", "RGB", "RGBA"):
+        image = image.convert("RGB")
+    result = image.copy()
+
+    for (x0, y0, x1, y1), members in _merge_windows(image.size, boxes):
+        try:
+            # 窗口像素放入线程内复用的缓冲中处理，再贴回结果图
+            crop = np.asarray(image.crop((x0, y0, x1, y1)))
+            region = _scratch("window", crop.size)[: crop.size].reshape(crop.shape)
+            region[...] = crop
+            started = time.perf_counter()
+            outcome = _clean_window(region, _local_boxes(members, x0, y0), method)
+            _record(report, (x0, y0, x1, y1), started, outcome)
+            result.paste(Image.fromarray(region), (x0, y0))
+        except Exception as e:
+            logger.error(f"局部修复失败，保持该区域原样: window={(x0, y0, x1, y1)}, reason={e}")
+
+    return result
+
+
+def _record(report: Optional[List[Dict]], window: Tuple[int, int, int, int], started: float, outcome: Tuple[str, float]) -> None:
+    engine, texture = outcome
+    ms = (time.perf_counter() - started) * 1000.0
+    logger.debug(f"局部修复: window={window}, engine={engine}, texture={texture:.2f}, {ms:.1f}ms")
+    if report is not None:
+        report.append({"window": window, "engine": engine, "texture": round(texture, 2), "ms": round(ms, 2)})
+
+
+def _local_boxes(members: List[Tuple[int, int, int, int]], x0: int, y0: int) -> List[Tuple[int, int, int, int]]:
+    return [(bx1 - x0, by1 - y0, bx2 - x0, by2 - y0) for bx1, by1, bx2, by2 in members]
 
-    # 统一转换为 Pillow RGB 图像
-    return Image.fromarray(cleaned.astype('uint8')).convert('RGB')
 
 def telea_clean(image: np.ndarray, mask_image: np.ndarray) -> np.ndarray:
     """使用 OpenCV 的 TELEA 算法进行图像修复。"""
     try:
-        result = cv2.inpaint(image, mask_image, 3, cv2.INPAINT_TELEA)
+        result = cv2.inpaint(image, mask_image, _INPAINT_RADIUS, cv2.INPAINT_TELEA)
         logger.debug("TELEA算法修复完成")
         return result
     except Exception as e:
@@ -120,4 +348,11 @@ def simple_fill_clean(image: np.ndarray, mask: np.ndarray) -> np.ndarray:
             result[mask_coords] = 255
 
     logger.debug("简单填充算法完成")
-    return result
\ No newline at end of file
+    return result
+
+
+register_inpaint_engine("simple", simple_fill_clean)
+register_inpaint_engine("solid", solid_clean)
+register_inpaint_engine("ns", ns_clean)
+register_inpaint_engine("pyramid", pyramid_clean)
+register_inpaint_engine("telea", telea_clean)
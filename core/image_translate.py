@@ -1,30 +1,60 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
 import logging
-import math
-import os
 import re
 import statistics
 from typing import List, Tuple, Optional, Iterable, Dict
 
+import cv2
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
-from rapidocr import RapidOCR, OCRVersion
 
+from core.config import IMAGE_DETECT_MAX_SIDE, IMAGE_OCR_MAX_SIDE, IMAGE_OCR_MIN_SCORE, IMAGE_INPAINT_METHOD
 from core.image_remover import clean
-from core.path_util import resource_path
+from core.ocr_pool import get_ocr_pool
+from core.font_manager import get_font
+from core.text_layout import (
+    DEFAULT_FONT_RELATIVE_PATH,
+    fit_text,
+    draw_layout,
+    draw_multiline_text,
+    estimate_vertical_font_size,
+)
 from datetime import datetime
 
-NOTOSANS_FONT_PATH = resource_path('fonts/NotoSans-Medium.ttf')
-
-DEFAULT_FONT_RELATIVE_PATH = resource_path('fonts/SourceHanSansCN-Regular.ttf')
-# --- 需要使用特殊字体渲染的字符 ---
-SPECIAL_CHARS = {'‼', '⁉'}
 
 logger = logging.getLogger(__name__)
 
-# OCR 引擎惰性初始化，避免模块导入时就占用较多资源
-_ocr_engine: Optional[RapidOCR] = None
+# 包含关系矩阵按列分块计算，限制大量 box 时的内存占用（块内矩阵大小为 n x 块宽）
+_CONTAINMENT_BLOCK = 1024
+# box 数量较少时 numpy 的调用开销大于逐对比较，直接使用纯 Python 实现
+_CONTAINMENT_VECTOR_MIN = 32
+
+
+def _get_xyxy(b):
+    try:
+        return tuple(b.xyxy)
+    except Exception:
+        try:
+            return (float(b[0]), float(b[1]), float(b[2]), float(b[3]))
+        except Exception:
+            return (0.0, 0.0, 0.0, 0.0)
+
+
+def _remove_contained_small(boxes: List, xyxy: List[Tuple], tolerance: float) -> List:
+    """少量 box 的逐对比较实现（坐标已预先提取），结果与向量化实现一致。"""
+    area = [max(0.0, float(x1 - x0) * float(y1 - y0)) for x0, y0, x1, y1 in xyxy]
+    kept: List[int] = []
+    for j in sorted(range(len(boxes)), key=area.__getitem__, reverse=True):
+        ix0, iy0, ix1, iy1 = xyxy[j]
+        for k in kept:
+            ox0, oy0, ox1, oy1 = xyxy[k]
+            if ix0 >= ox0 - tolerance and iy0 >= oy0 - tolerance and ix1 <= ox1 + tolerance and iy1 <= oy1 + tolerance:
+                break
+        else:
+            kept.append(j)
+    return [boxes[k] for k in kept]
+
 
 def _remove_fully_contained_boxes(boxes: Iterable, tolerance: float = 2.0) -> List:
     """
@@ -34,55 +64,155 @@ def _remove_fully_contained_boxes(boxes: Iterable, tolerance: float = 2.0) -> Li
     - 仅当一个 box 的四边都在另一个 box 的边界之内（允许 tolerance 像素的误差）时，认为被完全包含。
     - 被包含的较小 box 会被舍弃；保留外层较大的 box。
     - 不区分类别，按几何关系处理。
+
+    实现：按面积从大到小（稳定）排序后，用广播比较一次性得到“前面的 box 包含后面的 box”矩阵；
+    没有任何包含者的 box 直接保留，其余按顺序检查其包含者中是否有被保留的。
+    """
+    boxes = list(boxes)
+    n = len(boxes)
+    if n <= 1:
+        return boxes
+    xyxy = [_get_xyxy(b) for b in boxes]
+    if n < _CONTAINMENT_VECTOR_MIN:
+        return _remove_contained_small(boxes, xyxy, tolerance)
+
+    coords = np.array(xyxy)
+    if coords.dtype == object:
+        coords = coords.astype(np.float64)
+    area = np.maximum(0.0, (coords[:, 2] - coords[:, 0]).astype(np.float64) * (coords[:, 3] - coords[:, 1]).astype(np.float64))
+    order = np.argsort(-area, kind="stable")
+    c = coords[order]
+    x0, y0, x1, y1 = c[:, 0], c[:, 1], c[:, 2], c[:, 3]
+
+    # 外框边界放宽 tolerance 后与内框比较
+    ox0, oy0 = x0 - tolerance, y0 - tolerance
+    ox1, oy1 = x1 + tolerance, y1 + tolerance
+
+    kept = np.ones(n, dtype=bool)
+    for start in range(0, n, _CONTAINMENT_BLOCK):
+        stop = min(n, start + _CONTAINMENT_BLOCK)
+        cols = slice(start, stop)
+        # contains[i, j - start]：第 i 个 box 包含第 j 个 box
+        contains = ox0[:stop, None] <= x0[None, cols]
+        contains &= oy0[:stop, None] <= y0[None, cols]
+        contains &= ox1[:stop, None] >= x1[None, cols]
+        contains &= oy1[:stop, None] >= y1[None, cols]
+        # 排除自身；面积不大于自身的“包含者”（i > j）在下面的顺序检查中会被忽略
+        contains[np.arange(start, stop), np.arange(stop - start)] = False
+        for col in np.flatnonzero(contains.any(axis=0)).tolist():
+            j = start + col
+            kept[j] = not bool((contains[:j, col] & kept[:j]).any())
+
+    return [boxes[i] for i in order[kept].tolist()]
+
+
+class _LayoutBox:
+    """布局检测框（坐标已映射回原图），与 YoloBox 一样提供 xyxy/cls/conf 属性。"""
+    __slots__ = ("xyxy", "cls", "conf")
+
+    def __init__(self, xyxy, cls, conf=None):
+        self.xyxy = xyxy
+        self.cls = cls
+        self.conf = conf
+
+
+def _to_array(image, writable: bool = False) -> np.ndarray:
+    """将 PIL 图像转换为 RGB/L numpy 数组；已是数组时原样返回（不复制）。
+
+    writable=True 时保证返回可原地修改的独立副本（PIL 图像需复制一次）。
     """
+    if isinstance(image, np.ndarray):
+        return image
+    if image.mode not in ("L", "RGB"):
+        image = image.convert("RGB")
+    return np.array(image) if writable else np.asarray(image)
 
-    def _get_xyxy(b):
-        try:
-            return tuple(b.xyxy)
-        except Exception:
-            try:
-                return (float(b[0]), float(b[1]), float(b[2]), float(b[3]))
-            except Exception:
-                return (0.0, 0.0, 0.0, 0.0)
-
-    def _area(b) -> float:
-        x0, y0, x1, y1 = _get_xyxy(b)
-        return max(0.0, float(x1 - x0) * float(y1 - y0))
-
-    def _contains(outer, inner) -> bool:
-        ix0, iy0, ix1, iy1 = _get_xyxy(inner)
-        ox0, oy0, ox1, oy1 = _get_xyxy(outer)
-        return (
-            ix0 >= ox0 - tolerance and
-            iy0 >= oy0 - tolerance and
-            ix1 <= ox1 + tolerance and
-            iy1 <= oy1 + tolerance
-        )
-
-    # 按面积从大到小排序，逐个检查是否被先前保留的更大 box 完全包含
-    sorted_boxes = sorted(list(boxes), key=_area, reverse=True)
-    kept: List = []
-    for b in sorted_boxes:
-        contained = False
-        for k in kept:
-            if _contains(k, b):
-                contained = True
-                break
-        if not contained:
-            kept.append(b)
-    return kept
-
-def get_ocr_engine() -> RapidOCR:
-    global _ocr_engine
-    if _ocr_engine is None:
-        _ocr_engine = RapidOCR(params={
-            "Det.ocr_version": OCRVersion.PPOCRV5,
-            "Cls.ocr_version": OCRVersion.PPOCRV4,
-            "Rec.ocr_version": OCRVersion.PPOCRV5,
-        })
-    return _ocr_engine
 
-_font_cache = {}
+def _resize_array(arr: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
+    """按 (width, height) 缩放数组；缩小时使用 INTER_AREA 以抑制混叠。"""
+    h, w = arr.shape[:2]
+    interp = cv2.INTER_AREA if size[0] < w or size[1] < h else cv2.INTER_LINEAR
+    return cv2.resize(arr, size, interpolation=interp)
+
+
+def _detect_layout(image, config) -> List:
+    """在工作分辨率上运行布局检测，并将检测框映射回原图坐标。
+
+    - 长边超过 IMAGE_DETECT_MAX_SIDE 时先缩小再检测（模型内部本就会缩放到固定输入尺寸，
+      提前缩小可省去整幅高分辨率图像的拷贝与缩放开销）。
+    - 过滤掉 abandon/公式 等无需翻译的类别。
+    """
+    arr = _to_array(image)
+    h, w = arr.shape[:2]
+    scale = 1.0
+    work = arr
+    if IMAGE_DETECT_MAX_SIDE > 0 and max(w, h) > IMAGE_DETECT_MAX_SIDE:
+        scale = IMAGE_DETECT_MAX_SIDE / float(max(w, h))
+        work = _resize_array(arr, (max(1, round(w * scale)), max(1, round(h * scale))))
+
+    result = config.doc_layout_model.predict(work)[0]
+    # {0: 'title', 1: 'plain text', 2: 'abandon', 3: 'figure', 4: 'figure_caption', 5: 'table', 6: 'table_caption', 7: 'table_footnote', 8: 'isolate_formula', 9: 'formula_caption'}
+    boxes = [item for item in result.boxes if item.cls not in [2, 8, 9]]
+    if scale == 1.0:
+        return boxes
+
+    work_h, work_w = work.shape[:2]
+    sx = w / float(work_w)
+    sy = h / float(work_h)
+    mapped = []
+    for b in boxes:
+        x0, y0, x1, y1 = b.xyxy
+        mapped.append(_LayoutBox(
+            (
+                min(float(w), max(0.0, float(x0) * sx)),
+                min(float(h), max(0.0, float(y0) * sy)),
+                min(float(w), max(0.0, float(x1) * sx)),
+                min(float(h), max(0.0, float(y1) * sy)),
+            ),
+            b.cls,
+            getattr(b, "conf", None),
+        ))
+    logger.debug(f"布局检测工作分辨率: {work_w}x{work_h} (原图 {w}x{h}, 检测框 {len(mapped)})")
+    return mapped
+
+
+def _ocr_mean_score(ocr_result) -> float:
+    try:
+        scores = getattr(ocr_result, "scores", None)
+        if not scores:
+            return 0.0
+        return float(np.mean([float(s) for s in scores]))
+    except Exception:
+        return 0.0
+
+
+def _ocr_region(region_image):
+    """对区域做 OCR（输入为 RGB numpy 数组或 PIL 图像）。
+
+    大区域先缩小到 IMAGE_OCR_MAX_SIDE 再识别；若识别为空或平均置信度低于 IMAGE_OCR_MIN_SCORE，
+    说明缩小损失了识别精度，再在原分辨率裁剪图上重新识别。
+    """
+    arr = _to_array(region_image)
+    # RapidOCR 将 numpy 输入视为 BGR；此处的颜色转换同时得到一份连续内存的裁剪图
+    if arr.ndim == 3:
+        arr = cv2.cvtColor(arr, cv2.COLOR_RGB2BGR)
+    else:
+        arr = np.ascontiguousarray(arr)
+    h, w = arr.shape[:2]
+    # 从引擎池借用一个引擎：RapidOCR 实例不可被多个线程同时调用
+    with get_ocr_pool().engine() as ocr_engine:
+        if IMAGE_OCR_MAX_SIDE <= 0 or max(w, h) <= IMAGE_OCR_MAX_SIDE:
+            return ocr_engine(arr)
+
+        scale = IMAGE_OCR_MAX_SIDE / float(max(w, h))
+        small = _resize_array(arr, (max(1, round(w * scale)), max(1, round(h * scale))))
+        ocr_result = ocr_engine(small)
+        score = _ocr_mean_score(ocr_result)
+        if score >= IMAGE_OCR_MIN_SCORE:
+            return ocr_result
+        logger.debug(f"缩小后 OCR 置信度不足({score:.2f})，改用原分辨率重新识别: size={w}x{h}")
+        return ocr_engine(arr)
+
 
 # @Project : pdf_process
 # @File    : replace.py
@@ -101,86 +231,118 @@ def create_white_image_same_size_rgba(image: Image.Image) -> Image.Image:
 
     return white_image
 
-def translate_image(image: Image.Image,  config) -> Image.Image:
-    """将图片中的文本识别并翻译为中文，回填到原图对应文本框区域。
+# 图片分析阶段需要从 translation_config 透传的（可序列化）属性，供工作进程重建轻量配置
+_ANALYZE_CONFIG_ATTRS = ("lang_in", "smart_line_breaks", "debug", "smart_line_breaks_tuning", "simple_line_join")
 
-    依赖：
-    - config.doc_layout_model：文档布局检测模型，需提供 .predict(np_image)[0] 接口与 .boxes 属性，其中 box.xyxy 与 box.cls。
-    - config.translator：翻译器，需提供 .translate(text: str) -> str 方法。
-    """
 
-    # 转np
-    np_image = np.array(image)
+def image_job_options(config) -> Dict:
+    """提取图片分析阶段所需的配置项（可跨进程传递，不含模型与翻译器）。"""
+    options: Dict = {}
+    for name in _ANALYZE_CONFIG_ATTRS:
+        try:
+            if hasattr(config, name):
+                options[name] = getattr(config, name)
+        except Exception:
+            pass
+    return options
+
+
+def _extract_options(config) -> Dict:
+    """将 config 上的 OCR 文本后处理开关转换为 _extract_texts 的参数。"""
+    try:
+        lang_in = getattr(config, "lang_in", None)
+    except Exception:
+        lang_in = None
+    try:
+        smart_breaks = bool(getattr(config, "smart_line_breaks", True))
+    except Exception:
+        smart_breaks = True
+    try:
+        debug_mode = bool(getattr(config, "debug", False))
+    except Exception:
+        debug_mode = False
+    try:
+        tuning = getattr(config, "smart_line_breaks_tuning", None)
+    except Exception:
+        tuning = None
+    # 简单模式：同行以空格拼接，不同行以 \n 拼接
+    try:
+        simple_mode = bool(getattr(config, "simple_line_join", True))
+    except Exception:
+        simple_mode = True
+    return {
+        "lang_in": lang_in,
+        "smart_breaks": smart_breaks,
+        "debug": debug_mode,
+        "tuning": tuning,
+        "simple_mode": simple_mode,
+    }
+
+
+def analyze_image(image, config) -> List[Dict]:
+    """图片处理第一阶段：布局检测 + OCR。
+
+    输入可为 PIL 图像或 RGB numpy 数组；内部统一使用数组，区域裁剪均为视图（不复制像素）。
+    返回需要翻译的区域及其原文：[{"region": (x0,y0,x1,y1), "text": str}]。
+    对于表格区域（cls==5），进行递归处理，子区域的坐标将被平移映射回父图像坐标。
+    该阶段不访问翻译器，可在工作进程中执行（config 仅需提供 doc_layout_model 与 OCR 相关开关）。
+    """
+    image = _to_array(image)
     try:
-        result = config.doc_layout_model.predict(np_image)[0]
+        boxes = _detect_layout(image, config)
     except Exception as e:
         ts = datetime.now().isoformat()
         logger.error(f"[{ts}] 文档布局检测模型异常，已返回原图: {e}")
-        return image.copy()
-    # {0: 'title', 1: 'plain text', 2: 'abandon', 3: 'figure', 4: 'figure_caption', 5: 'table', 6: 'table_caption', 7: 'table_footnote', 8: 'isolate_formula', 9: 'formula_caption'}
-    boxes = [item for item in result.boxes if item.cls not in [2, 8, 9]]
+        return []
     # 若两个 box 存在“完全包含”关系，舍弃掉小的那个 box
     boxes = _remove_fully_contained_boxes(boxes, tolerance=2.0)
+    extract_options = _extract_options(config)
 
-    # 仅对需要更新的区域进行清理与重绘，满足“失败或无变化不处理”的要求
-    regions_to_clean: List[Tuple[int, int, int, int]] = []
-    draw_jobs: List[Tuple[Tuple[int, int, int, int], str]] = []
-
+    jobs: List[Dict] = []
     for box in boxes:
         x0, y0, x1, y1 = box.xyxy
-        region: Tuple[int, int, int, int] = (
-            int(x0),
-            int(y0),
-            int(x1),
-            int(y1),
-        )
+        region: Tuple[int, int, int, int] = (int(x0), int(y0), int(x1), int(y1))
 
         if (box.cls == 5):
-            # 表格直接重新处理
-            region_image = image.crop(region)
-            final_image = translate_image(region_image, config)
-            image.paste(final_image, region)
+            # 表格：递归处理，并将子区域坐标平移回父图像
+            try:
+                sub_jobs = analyze_image(image[region[1]:region[3], region[0]:region[2]], config)
+            except Exception as e:
+                ts = datetime.now().isoformat()
+                logger.error(f"[{ts}] 表格子区域处理失败，保持原样: region={region}, reason={e}")
+                continue
+            dx, dy = region[0], region[1]
+            for it in sub_jobs:
+                rx0, ry0, rx1, ry1 = it["region"]
+                jobs.append({"region": (rx0 + dx, ry0 + dy, rx1 + dx, ry1 + dy), "text": it["text"]})
             continue
 
         # 裁剪区域并做 OCR
         try:
-            region_image = image.crop(region)
-
-            ocr_engine = get_ocr_engine()
-            ocr_result = ocr_engine(region_image)
+            region_image = image[region[1]:region[3], region[0]:region[2]]
+            ocr_result = _ocr_region(region_image)
             # 根据语言与启用选项，智能进行换行/连接判断
-            try:
-                lang_in = getattr(config, "lang_in", None)
-            except Exception:
-                lang_in = None
-            try:
-                smart_breaks = bool(getattr(config, "smart_line_breaks", True))
-            except Exception:
-                smart_breaks = True
-            debug_mode = False
-            try:
-                debug_mode = bool(getattr(config, "debug", False))
-            except Exception:
-                debug_mode = False
-            tuning = None
-            try:
-                tuning = getattr(config, "smart_line_breaks_tuning", None)
-            except Exception:
-                tuning = None
-            # 简单模式：同行以空格拼接，不同行以 \n 拼接
-            simple_mode = True
-            try:
-                simple_mode = bool(getattr(config, "simple_line_join", True))
-            except Exception:
-                simple_mode = True
-            src_text = _extract_texts(ocr_result, lang_in=lang_in, smart_breaks=smart_breaks, debug=debug_mode, tuning=tuning, simple_mode=simple_mode)
+            src_text = _extract_texts(ocr_result, **extract_options)
         except Exception as e:
             # OCR 异常同样视为该区域不可处理，保持原样
             ts = datetime.now().isoformat()
             logger.error(f"[{ts}] 区域OCR失败，保持原图: region={region}, reason={e}")
             continue
+        jobs.append({"region": region, "text": src_text})
+    return jobs
+
+
+def translate_regions(jobs: List[Dict], config) -> List[Dict]:
+    """图片处理第二阶段：调用翻译器翻译各区域原文。
+
+    仅返回“翻译成功且发生变化”的区域：[{"region": (x0,y0,x1,y1), "text": 译文}]，
+    满足“失败或无变化不处理”的要求。该阶段始终在主进程执行（翻译器含限流与 prompt hook 状态）。
+    """
+    draw_jobs: List[Dict] = []
+    for job in jobs:
+        region = job["region"]
+        src_text = job.get("text") or ""
 
-        # 调用翻译
         translate_ok = True
         translated_text: Optional[str] = None
         error_reason: Optional[str] = None
@@ -215,201 +377,100 @@ def translate_image(image: Image.Image,  config) -> Image.Image:
             continue
 
         # 正常且发生变化的翻译：纳入清理与重绘
-        regions_to_clean.append(region)
-        draw_jobs.append((region, translated_text or ""))
-
-    # 如果无区域需要处理，直接返回原图拷贝，避免不必要处理，提升性能
-    if not regions_to_clean:
-        return image.copy()
+        draw_jobs.append({"region": region, "text": translated_text or ""})
+    return draw_jobs
 
-    # 执行清理，仅对需要处理的区域进行 inpaint
-    fn_image = clean(image, regions_to_clean, method="telea")
-
-    # 将翻译后的文本写回仅需更新的区域
-    draw = ImageDraw.Draw(fn_image)
-    for region, translate in draw_jobs:
-        x1, y1, x2, y2 = region
-        bubble_width = x2 - x1
-        bubble_height = y2 - y1
-        if translate:
-            calculated_size = calculate_auto_font_size(
-                translate, bubble_width, bubble_height, 'horizontal', DEFAULT_FONT_RELATIVE_PATH
-            )
-            font = get_font(DEFAULT_FONT_RELATIVE_PATH, calculated_size)
-            draw_multiline_text_horizontal(draw, translate, font, x1, y1, bubble_width)
 
-    return fn_image
-
-def prepare_text_overlay(image: Image.Image, config) -> Tuple[Image.Image, List[Dict]]:
-    """生成“文字覆写”所需的数据：
-    - 返回抹除文字后的干净背景图（作为 PDF 背景使用）
-    - 返回需要覆写的文字项列表：[{"region": (x0,y0,x1,y1), "text": str, "font_size": int}]
+def render_translations(image, draw_jobs: List[Dict], draw_text: bool = True, inpaint_report: Optional[List[Dict]] = None):
+    """图片处理第三阶段：清理（inpaint）需要更新的区域，并按需将译文绘制回图像。
 
-    说明：
-    - 只对需要更新的区域进行 inpaint 与覆写。
-    - 逻辑基本与 translate_image 一致，只是最终不在图像上绘制文本，而是返回绘制任务供 PDF 层处理。
-    - 对于表格区域（cls==5），进行递归处理，子区域的坐标将被平移映射回父图像坐标。
+    - 输入为 numpy 数组时原地处理并返回同一数组（供共享内存等零拷贝场景使用）；
+    - 输入为 PIL 图像时复制一次为数组处理，返回新的 PIL 图像，原图不变。
+    draw_text=False 时仅返回清理后的干净背景（供“文字覆写”模式在 PDF 层绘制文字）。
+    修复引擎由 IMAGE_INPAINT_METHOD 决定；传入 inpaint_report 列表时记录每个窗口所用引擎与耗时。
     """
-    np_image = np.array(image)
-    try:
-        result = config.doc_layout_model.predict(np_image)[0]
-    except Exception as e:
-        ts = datetime.now().isoformat()
-        logger.error(f"[{ts}] 文档布局检测模型异常（overlay），已返回原图: {e}")
-        return image.copy(), []
-
-    boxes = [item for item in result.boxes if item.cls not in [2, 8, 9]]
-    boxes = _remove_fully_contained_boxes(boxes, tolerance=2.0)
-
-    regions_to_clean: List[Tuple[int, int, int, int]] = []
-    overlay_items: List[Dict] = []
-
-    for box in boxes:
-        x0, y0, x1, y1 = box.xyxy
-        region: Tuple[int, int, int, int] = (int(x0), int(y0), int(x1), int(y1))
+    is_array = isinstance(image, np.ndarray)
+    # 如果无区域需要处理，直接返回原图拷贝，避免不必要处理，提升性能
+    if not draw_jobs:
+        return image if is_array else image.copy()
 
-        if (box.cls == 5):
-            # 表格：递归处理并聚合结果
-            try:
-                sub_img = image.crop(region)
-                cleaned_sub, sub_items = prepare_text_overlay(sub_img, config)
-                # 将子图的清理结果贴回
-                image.paste(cleaned_sub, region)
-                # 平移子项坐标
-                dx, dy = region[0], region[1]
-                for it in sub_items:
-                    rx0, ry0, rx1, ry1 = it.get("region", (0, 0, 0, 0))
-                    overlay_items.append({
-                        "region": (rx0 + dx, ry0 + dy, rx1 + dx, ry1 + dy),
-                        "text": it.get("text", ""),
-                        "font_size": it.get("font_size", 12),
-                    })
-            except Exception as e:
-                ts = datetime.now().isoformat()
-                logger.error(f"[{ts}] 表格子区域 overlay 处理失败，保持原样: region={region}, reason={e}")
-            # 注意：表格区域已在子处理内完成清理，这里无需继续 OCR
-            continue
+    arr = _to_array(image, writable=True)
 
-        # OCR 识别并提取文本
-        try:
-            region_image = image.crop(region)
-            ocr_engine = get_ocr_engine()
-            ocr_result = ocr_engine(region_image)
-            try:
-                lang_in = getattr(config, "lang_in", None)
-            except Exception:
-                lang_in = None
-            try:
-                smart_breaks = bool(getattr(config, "smart_line_breaks", True))
-            except Exception:
-                smart_breaks = True
-            debug_mode = False
-            try:
-                debug_mode = bool(getattr(config, "debug", False))
-            except Exception:
-                debug_mode = False
-            tuning = None
-            try:
-                tuning = getattr(config, "smart_line_breaks_tuning", None)
-            except Exception:
-                tuning = None
-            simple_mode = True
-            try:
-                simple_mode = bool(getattr(config, "simple_line_join", True))
-            except Exception:
-                simple_mode = True
-            src_text = _extract_texts(ocr_result, lang_in=lang_in, smart_breaks=smart_breaks, debug=debug_mode, tuning=tuning, simple_mode=simple_mode)
-        except Exception as e:
-            ts = datetime.now().isoformat()
-            logger.error(f"[{ts}] 区域OCR失败（overlay），保持原图: region={region}, reason={e}")
-            continue
+    # 执行清理，仅对需要处理的区域进行 inpaint
+    clean(arr, [job["region"] for job in draw_jobs], method=IMAGE_INPAINT_METHOD, report=inpaint_report)
+
+    if draw_text:
+        # 将翻译后的文本写回仅需更新的区域：只把区域附近的像素转为 PIL 绘制后写回
+        img_h, img_w = arr.shape[:2]
+        for job in draw_jobs:
+            x1, y1, x2, y2 = (int(v) for v in job["region"])
+            translate = job["text"]
+            bubble_width = x2 - x1
+            bubble_height = y2 - y1
+            if not translate or bubble_width <= 0 or bubble_height <= 0:
+                continue
+            # 字号与断行一次算出，绘制直接复用排版结果
+            layout = fit_text(translate, bubble_width, bubble_height, DEFAULT_FONT_RELATIVE_PATH)
+            font = get_font(DEFAULT_FONT_RELATIVE_PATH, layout.font_size)
+            # 绘制画布向右/下留出余量，容纳最小字号时可能溢出区域的文字
+            cx0, cy0 = max(0, x1), max(0, y1)
+            cx1 = min(img_w, x2 + bubble_width // 2)
+            cy1 = min(img_h, y2 + bubble_height)
+            if cx1 <= cx0 or cy1 <= cy0:
+                continue
+            canvas = Image.fromarray(arr[cy0:cy1, cx0:cx1])
+            draw_layout(ImageDraw.Draw(canvas), layout, font, x1 - cx0, y1 - cy0)
+            arr[cy0:cy1, cx0:cx1] = np.asarray(canvas)
 
-        # 翻译
-        translated_text: Optional[str] = None
-        try:
-            candidate = config.translator.translate(src_text) if src_text else ""
-            translated_text = candidate if isinstance(candidate, str) else None
-        except Exception as e:
-            translated_text = None
-            ts = datetime.now().isoformat()
-            logger.error(f"[{ts}] 区域翻译失败（overlay），保持原样: region={region}, reason={e}")
-            continue
+    return arr if is_array else Image.fromarray(arr)
 
-        if translated_text is None or translated_text == src_text:
-            # 无变化或失败：跳过
-            continue
 
-        # 纳入清理与覆写项
-        regions_to_clean.append(region)
-        x1, y1, x2, y2 = region
+def overlay_items_for(draw_jobs: List[Dict]) -> List[Dict]:
+    """将译文区域转换为“文字覆写”项：[{"region": (x0,y0,x1,y1), "text": str, "font_size": int}]。"""
+    items: List[Dict] = []
+    for job in draw_jobs:
+        x1, y1, x2, y2 = job["region"]
         w = max(1, x2 - x1)
         h = max(1, y2 - y1)
-        fs = calculate_auto_font_size(translated_text, w, h, 'horizontal', DEFAULT_FONT_RELATIVE_PATH)
-        overlay_items.append({
-            "region": region,
-            "text": translated_text or "",
+        fs = calculate_auto_font_size(job["text"], w, h, 'horizontal', DEFAULT_FONT_RELATIVE_PATH)
+        items.append({
+            "region": job["region"],
+            "text": job["text"] or "",
             "font_size": fs,
         })
+    return items
 
-    # 若没有需要清理的区域，直接返回拷贝
-    if not regions_to_clean:
-        return image.copy(), []
 
-    # 仅对需要处理的区域进行 inpaint
-    cleaned = clean(image, regions_to_clean, method="telea")
-    return cleaned, overlay_items
+def translate_image(image: Image.Image,  config) -> Image.Image:
+    """将图片中的文本识别并翻译为中文，回填到原图对应文本框区域。
 
-def get_font(font_family_relative_path: str = DEFAULT_FONT_RELATIVE_PATH, font_size: int = 30):
-    """加载字体文件（带缓存）。
+    依赖：
+    - config.doc_layout_model：文档布局检测模型，需提供 .predict(np_image)[0] 接口与 .boxes 属性，其中 box.xyxy 与 box.cls。
+    - config.translator：翻译器，需提供 .translate(text: str) -> str 方法。
 
-    - 优先使用传入路径（支持绝对/相对路径）。
-    - 若加载失败，尝试使用默认字体；仍失败则回退到 Pillow 内置字体。
+    流程拆分为 analyze_image（布局+OCR）→ translate_regions（翻译）→ render_translations（清理+重绘），
+    各阶段可单独调度（见 core.image_pool）。
     """
-    # 确保 font_size 是整数
-    try:
-        font_size = int(font_size)
-        if font_size <= 0:
-            font_size = 30  # 防止无效字号
-    except (ValueError, TypeError):
-        font_size = 30
-
-    cache_key = (font_family_relative_path, font_size)
-    if cache_key in _font_cache:
-        return _font_cache[cache_key]
+    jobs = analyze_image(image, config)
+    draw_jobs = translate_regions(jobs, config)
+    return render_translations(image, draw_jobs, draw_text=True)
 
-    font = None
-    try:
-        font_path_abs = (
-            font_family_relative_path
-            if os.path.isabs(font_family_relative_path)
-            else resource_path(font_family_relative_path)
-        )
-        if os.path.exists(font_path_abs):
-            font = ImageFont.truetype(font_path_abs, font_size, encoding="utf-8")
-            logger.debug(f"成功加载字体: {font_path_abs} (大小: {font_size})")
-        else:
-            logger.warning(f"字体文件未找到: {font_path_abs} (路径: {font_family_relative_path})")
-            raise FileNotFoundError()
 
-    except Exception as e:
-        logger.error(f"加载字体 {font_family_relative_path} (大小: {font_size}) 失败: {e}，尝试默认字体。")
-        try:
-            default_font_path_abs = DEFAULT_FONT_RELATIVE_PATH if os.path.isabs(DEFAULT_FONT_RELATIVE_PATH) else resource_path(DEFAULT_FONT_RELATIVE_PATH)
-            if os.path.exists(default_font_path_abs):
-                font = ImageFont.truetype(default_font_path_abs, font_size, encoding="utf-8")
-                logger.debug(f"成功加载默认字体: {default_font_path_abs} (大小: {font_size})")
-            else:
-                logger.error(f"默认字体文件也未找到: {default_font_path_abs}")
-                font = ImageFont.load_default()
-                logger.warning("使用 Pillow 默认字体。")
-        except Exception as e_default:
-            logger.error(f"加载默认字体时出错: {e_default}", exc_info=True)
-            font = ImageFont.load_default()
-            logger.warning("使用 Pillow 默认字体。")
-
-    _font_cache[cache_key] = font
-    return font
+def prepare_text_overlay(image: Image.Image, config) -> Tuple[Image.Image, List[Dict]]:
+    """生成“文字覆写”所需的数据：
+    - 返回抹除文字后的干净背景图（作为 PDF 背景使用）
+    - 返回需要覆写的文字项列表：[{"region": (x0,y0,x1,y1), "text": str, "font_size": int}]
 
+    说明：
+    - 只对需要更新的区域进行 inpaint 与覆写。
+    - 逻辑与 translate_image 一致，只是最终不在图像上绘制文本，而是返回绘制任务供 PDF 层处理。
+    """
+    jobs = analyze_image(image, config)
+    draw_jobs = translate_regions(jobs, config)
+    if not draw_jobs:
+        return image.copy(), []
+    cleaned = render_translations(image, draw_jobs, draw_text=False)
+    return cleaned, overlay_items_for(draw_jobs)
 
 def calculate_auto_font_size(text: str,
                              bubble_width: int,
@@ -419,58 +480,27 @@ def calculate_auto_font_size(text: str,
                              min_size: int = 12,
                              max_size: int = 60,
                              padding_ratio: float = 1.0) -> int:
-    """使用二分法计算最佳字体大小。"""
+    """计算能放入气泡/区域的最大字号。
+
+    横排使用 core.text_layout 基于真实字宽（按字体缓存的字宽表）的断行结果判断是否放得下；
+    竖排仍按每字 1em 估算。
+    """
     if not text or not text.strip() or bubble_width <= 0 or bubble_height <= 0:
         return 30
 
     W = bubble_width * padding_ratio
     H = bubble_height * padding_ratio
-    N = len(text)
-    c_w = 1.0
-    l_h = 1.05
-
-    if text_direction == 'vertical':
-        W, H = H, W
 
-    low = min_size
-    high = max_size
-    best_size = min_size
-
-    while low <= high:
-        mid = (low + high) // 2
-        if mid == 0: break
-
-        try:
-            font = get_font(font_family_relative_path, mid)
-            if font is None:
-                high = mid - 1
-                continue
-
-            avg_char_width = mid * c_w
-            avg_char_height = mid
-
-            if text_direction == 'horizontal':
-                chars_per_line = max(1, int(W / avg_char_width)) if avg_char_width > 0 else N  # 避免除零
-                lines_needed = math.ceil(N / chars_per_line) if chars_per_line > 0 else N
-                total_height_needed = lines_needed * mid * l_h
-                fits = total_height_needed <= H
-            else:  # vertical
-                chars_per_column = max(1, int(H / avg_char_height)) if avg_char_height > 0 else N
-                columns_needed = math.ceil(N / chars_per_column) if chars_per_column > 0 else N
-                total_width_needed = columns_needed * mid * l_h
-                fits = total_width_needed <= W
-
-            if fits:
-                best_size = mid
-                low = mid + 1
-            else:
-                high = mid - 1
-
-        except Exception as e:
-            logger.error(f"计算字号 {mid} 时出错: {e}", exc_info=True)
-            high = mid - 1
+    try:
+        if text_direction == 'horizontal':
+            result = fit_text(text, W, H, font_family_relative_path, min_size, max_size).font_size
+        else:
+            result = estimate_vertical_font_size(text, W, H, min_size, max_size)
+    except Exception as e:
+        logger.error(f"计算字号时出错: {e}", exc_info=True)
+        result = min_size
 
-    result = max(min_size, best_size)
+    result = max(min_size, result)
     logger.debug(f"自动计算的最佳字体大小: {result}px (范围: {min_size}-{max_size})")
     return result
 
@@ -486,125 +516,9 @@ def draw_multiline_text_horizontal(draw: ImageDraw.ImageDraw,
                                     enable_stroke: bool = False,
                                     stroke_color: str = "#FFFFFF",
                                     stroke_width: int = 0) -> None:
-    if not text:
-        return
-
-    # 预加载NotoSans字体，用于特殊字符
-    special_font: Optional[ImageFont.ImageFont] = None
-    font_size = font.size  # 当前字体大小
-
-    # 进行换行布局计算（记录每个字符的宽度与字体），避免重复测量
-    # 支持源字符串中的显式换行符 \n 作为硬换行
-    lines_meta: list[dict] = []
-    current_line_chars: list[tuple[str, ImageFont.ImageFont, int]] = []
-    current_line_width = 0
-
-    def _get_char_font(c: str) -> ImageFont.ImageFont:
-        nonlocal special_font
-        if c in SPECIAL_CHARS:
-            if special_font is None:
-                try:
-                    special_font = get_font(NOTOSANS_FONT_PATH, font_size)
-                except Exception as e:
-                    logger.error(f"加载NotoSans字体失败: {e}，回退到普通字体")
-                    special_font = font
-            return special_font or font
-        return font
-
-    for ch in text.replace("\r", ""):
-        if ch == "\n":
-            # 硬换行：立即断行，无论当前宽度
-            lines_meta.append({"chars": current_line_chars, "width": current_line_width})
-            current_line_chars = []
-            current_line_width = 0
-            continue
-
-        cf = _get_char_font(ch)
-        bbox = cf.getbbox(ch)
-        char_width = bbox[2] - bbox[0]
-        if current_line_width + char_width <= max_width:
-            current_line_chars.append((ch, cf, char_width))
-            current_line_width += char_width
-        else:
-            lines_meta.append({"chars": current_line_chars, "width": current_line_width})
-            current_line_chars = [(ch, cf, char_width)]
-            current_line_width = char_width
-
-    if current_line_chars:
-        lines_meta.append({"chars": current_line_chars, "width": current_line_width})
-
-    if not lines_meta:
-        return
-
-    line_height = font.size + 5
-    total_text_height = len(lines_meta) * line_height
-    max_line_width = max((lm["width"] for lm in lines_meta), default=0)
-    if max_line_width <= 0 or total_text_height <= 0:
-        return
-
-    # 如果需要旋转：对整块文字进行一次性渲染与旋转（更高效）
-    if rotation_angle != 0:
-        original_image = getattr(draw, '_image', None)
-        if original_image is None:
-            # 无法获取原始图像，回退到直接绘制（不旋转）
-            logger.warning("无法获取原始图像对象，旋转渲染回退为直接绘制")
-            current_y = y
-            for lm in lines_meta:
-                current_x = x
-                for ch, cf, _w in lm["chars"]:
-                    params = {"font": cf, "fill": fill}
-                    if enable_stroke and stroke_width > 0:
-                        params["stroke_width"] = int(stroke_width)
-                        params["stroke_fill"] = stroke_color
-                    draw.text((current_x, current_y), ch, **params)
-                    current_x += _w
-                current_y += line_height
-            return
-
-        # 创建最小透明画布渲染整块文字
-        block_w = int(max_line_width)
-        block_h = int(total_text_height)
-        temp_block_img = Image.new('RGBA', (block_w, block_h), (0, 0, 0, 0))
-        temp_block_draw = ImageDraw.Draw(temp_block_img)
-
-        by = 0
-        for lm in lines_meta:
-            bx = 0
-            for ch, cf, _w in lm["chars"]:
-                params = {"font": cf, "fill": fill}
-                if enable_stroke and stroke_width > 0:
-                    params["stroke_width"] = int(stroke_width)
-                    params["stroke_fill"] = stroke_color
-                temp_block_draw.text((bx, by), ch, **params)
-                bx += _w
-            by += line_height
-
-        # 旋转整块并粘贴到原图，确保中心对齐
-        rotated_block_img = temp_block_img.rotate(
-            rotation_angle,
-            resample=Image.Resampling.BICUBIC,
-            expand=True
-        )
-
-        center_x_rot = x + max_width / 2
-        center_y_rot = y + total_text_height / 2
-        paste_x = int(center_x_rot - rotated_block_img.width / 2)
-        paste_y = int(center_y_rot - rotated_block_img.height / 2)
-        original_image.paste(rotated_block_img, (paste_x, paste_y), rotated_block_img)
-        return
-
-    # 无旋转：直接按行绘制到原图
-    current_y = y
-    for lm in lines_meta:
-        current_x = x
-        for ch, cf, _w in lm["chars"]:
-            params = {"font": cf, "fill": fill}
-            if enable_stroke and stroke_width > 0:
-                params["stroke_width"] = int(stroke_width)
-                params["stroke_fill"] = stroke_color
-            draw.text((current_x, current_y), ch, **params)
-            current_x += _w
-        current_y += line_height
+    """横排多行绘制，委托给 core.text_layout（按片段绘制 + 共享 advance 缓存）。"""
+    draw_multiline_text(draw, text, font, x, y, max_width, fill, rotation_angle,
+                        enable_stroke, stroke_color, stroke_width)
 
 
 def _extract_texts_basic(ocr_result) -> str:
@@ -804,7 +718,12 @@ def _bbox_from_any(b: object) -> Optional[Tuple[int, int, int, int]]:
 
 
 def _group_items_into_lines(items: List[Dict]) -> List[List[Dict]]:
-    """按垂直方向将 OCR 片段分组成行。"""
+    """按垂直方向将 OCR 片段分组成行。
+
+    片段按 (中心 y, x0) 升序扫描：已有行的平均中心 y 不会大于当前片段的中心 y，
+    当前片段与某行的差值一旦超过阈值，后续片段也不可能再并入该行。因此只需与最近一行比较，
+    行均值用累加和维护（bbox 为整数，中心 y 为半整数，求和无舍入误差）。
+    """
     if not items:
         return []
     # 计算每个片段的高度与中心 y
@@ -819,33 +738,35 @@ def _group_items_into_lines(items: List[Dict]) -> List[List[Dict]]:
         it["_x1"] = x1
         it["_y1"] = y1
 
-    # 以中心 y 排序
-    items_sorted = sorted(items, key=lambda d: (d["_cy"], d["_x0"]))
-    heights = [it["_height"] for it in items_sorted]
-    h_med = statistics.median(heights) if heights else 16
+    # 以中心 y 排序（稳定排序，次关键字为 x0）
+    n = len(items)
+    cys = np.fromiter((it["_cy"] for it in items), dtype=np.float64, count=n)
+    x0s = np.fromiter((it["_x0"] for it in items), dtype=np.float64, count=n)
+    order = np.lexsort((x0s, cys))
+    h_med = statistics.median(it["_height"] for it in items)
     threshold = max(4, h_med * 0.6)  # 允许中心 y 差异在 0.6 * 行高内视为同一行
 
     lines: List[List[Dict]] = []
-    for it in items_sorted:
-        placed = False
-        for ln in lines:
-            # 与该行的平均中心 y 比较
-            avg_cy = statistics.fmean([x["_cy"] for x in ln])
-            if abs(it["_cy"] - avg_cy) <= threshold:
-                ln.append(it)
-                placed = True
-                break
-        if not placed:
+    line_sum = 0.0
+    for idx in order.tolist():
+        it = items[idx]
+        cy = it["_cy"]
+        # 与最近一行的平均中心 y 比较
+        if lines and abs(cy - line_sum / len(lines[-1])) <= threshold:
+            lines[-1].append(it)
+            line_sum += cy
+        else:
             lines.append([it])
+            line_sum = cy
 
     # 每行按 x0 排序，并计算行的包围盒
     for ln in lines:
         ln.sort(key=lambda d: d["_x0"])
-        x0s = [d["_x0"] for d in ln]
-        y0s = [d["_y0"] for d in ln]
-        x1s = [d["_x1"] for d in ln]
-        y1s = [d["_y1"] for d in ln]
-        ln_bbox = (min(x0s), min(y0s), max(x1s), max(y1s))
+        x0s_ln = [d["_x0"] for d in ln]
+        y0s_ln = [d["_y0"] for d in ln]
+        x1s_ln = [d["_x1"] for d in ln]
+        y1s_ln = [d["_y1"] for d in ln]
+        ln_bbox = (min(x0s_ln), min(y0s_ln), max(x1s_ln), max(y1s_ln))
         for d in ln:
             d["_line_bbox"] = ln_bbox
 
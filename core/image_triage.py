@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from core.config import (
+    IMAGE_TRIAGE_ENABLED,
+    IMAGE_TRIAGE_MIN_SIDE,
+    IMAGE_TRIAGE_MIN_AREA,
+    IMAGE_TRIAGE_MAX_ASPECT,
+    IMAGE_TRIAGE_MIN_EDGE_DENSITY,
+    IMAGE_TRIAGE_MIN_ENTROPY,
+    IMAGE_TRIAGE_MAX_ENTROPY,
+    IMAGE_TRIAGE_THUMB_SIDE,
+    IMAGE_TRIAGE_MIN_TEXT_COMPONENTS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class TriageThresholds:
+    """图片预筛选阈值（默认取自 core.config，可按任务覆盖）。"""
+    enabled: bool = IMAGE_TRIAGE_ENABLED
+    min_side: int = IMAGE_TRIAGE_MIN_SIDE
+    min_area: int = IMAGE_TRIAGE_MIN_AREA
+    max_aspect: float = IMAGE_TRIAGE_MAX_ASPECT
+    min_edge_density: float = IMAGE_TRIAGE_MIN_EDGE_DENSITY
+    min_entropy: float = IMAGE_TRIAGE_MIN_ENTROPY
+    max_entropy: float = IMAGE_TRIAGE_MAX_ENTROPY
+    thumb_side: int = IMAGE_TRIAGE_THUMB_SIDE
+    min_text_components: int = IMAGE_TRIAGE_MIN_TEXT_COMPONENTS
+
+
+@dataclass
+class TriageResult:
+    keep: bool
+    reason: str = "ok"
+    metrics: Dict[str, float] = field(default_factory=dict)
+
+
+def _thumbnail_gray(image: Image.Image, thumb_side: int) -> np.ndarray:
+    """生成长边不超过 thumb_side 的灰度缩略图（numpy，uint8）。"""
+    w, h = image.size
+    scale = min(1.0, float(thumb_side) / float(max(w, h) or 1))
+    gray = image.convert("L")
+    if scale < 1.0:
+        gray = gray.resize((max(1, int(w * scale)), max(1, int(h * scale))), Image.Resampling.BILINEAR)
+    return np.asarray(gray)
+
+
+def _colour_entropy(image: Image.Image, thumb_side: int) -> Tuple[float, int]:
+    """颜色熵（bits）与非空桶数：RGB 各通道量化到 3 bit（共 512 个桶）后的香农熵，取值 [0, 9]。"""
+    w, h = image.size
+    scale = min(1.0, float(thumb_side) / float(max(w, h) or 1))
+    rgb = image.convert("RGB")
+    if scale < 1.0:
+        rgb = rgb.resize((max(1, int(w * scale)), max(1, int(h * scale))), Image.Resampling.NEAREST)
+    arr = np.asarray(rgb) >> 5
+    codes = (arr[..., 0].astype(np.int32) << 6) | (arr[..., 1].astype(np.int32) << 3) | arr[..., 2].astype(np.int32)
+    hist = np.bincount(codes.ravel(), minlength=512).astype(np.float64)
+    p = hist[hist > 0] / hist.sum()
+    return max(0.0, float(-(p * np.log2(p)).sum())), int(p.size)
+
+
+def _count_text_components(gray: np.ndarray) -> int:
+    """在缩略图上做轻量级文字存在性检测，返回“类文字”连通域数量（按字形计数）。
+
+    形态学梯度 + Otsu 二值化（梯度阈值不低于 32，平滑渐变不会被放大成边缘）后直接统计连通域，
+    不做水平闭运算：一行 CJK 文字或单个单词也能得到多个字形。强边缘占比过高时视为噪声/纹理，
+    否则按尺寸、填充率与长宽比过滤。
+    """
+    h, w = gray.shape[:2]
+    if h < 4 or w < 4:
+        return 0
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+    grad = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, kernel)
+    otsu, _ = cv2.threshold(grad, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    _, bw = cv2.threshold(grad, max(otsu, 32), 255, cv2.THRESH_BINARY)
+    # 一半左右的像素都是强边缘：噪声/纹理，其中的碎片不是字形
+    if np.count_nonzero(bw) > 0.4 * bw.size:
+        return 0
+    n, _labels, stats, _ = cv2.connectedComponentsWithStats(bw, connectivity=8)
+
+    count = 0
+    for i in range(1, n):
+        cw = stats[i, cv2.CC_STAT_WIDTH]
+        ch = stats[i, cv2.CC_STAT_HEIGHT]
+        area = stats[i, cv2.CC_STAT_AREA]
+        # 过小（噪点）或长宽都超过一半（边框、大块图形/照片区域）都不像字形
+        if ch < 3 or cw < 3 or (ch > 0.5 * h and cw > 0.5 * w):
+            continue
+        fill = float(area) / float(cw * ch)
+        # 粗体大字的梯度是空心轮廓，填充率可低至 0.05；长宽比排除细长的线条
+        if 0.05 <= fill <= 0.95 and 0.1 * ch <= cw <= 10 * ch:
+            count += 1
+    return count
+
+
+def triage_image(image: Image.Image, thresholds: Optional[TriageThresholds] = None) -> TriageResult:
+    """快速判断图片是否值得进入 布局检测/OCR/inpaint 的完整流程。
+
+    依次检查：像素尺寸、长宽比、颜色熵、边缘密度、缩略图上的文字存在性。
+    纯色（量化后只有一种颜色）、照片/噪声与无类文字连通域直接跳过；颜色熵或边缘密度偏低只有在
+    同时检测不到类文字连通域时才跳过（大片空白上的少量文字）。检测本身异常时保守地保留图片。
+    """
+    t = thresholds or TriageThresholds()
+    if not t.enabled:
+        return TriageResult(keep=True, reason="disabled")
+
+    w, h = image.size
+    metrics: Dict[str, float] = {"width": float(w), "height": float(h)}
+    if min(w, h) < t.min_side or w * h < t.min_area:
+        return TriageResult(keep=False, reason="too_small", metrics=metrics)
+
+    aspect = float(max(w, h)) / float(max(1, min(w, h)))
+    metrics["aspect"] = aspect
+    if aspect > t.max_aspect:
+        return TriageResult(keep=False, reason="extreme_aspect", metrics=metrics)
+
+    try:
+        entropy, buckets = _colour_entropy(image, t.thumb_side)
+        metrics["entropy"] = entropy
+        if buckets <= 1:
+            return TriageResult(keep=False, reason="uniform_colour", metrics=metrics)
+        if entropy > t.max_entropy:
+            return TriageResult(keep=False, reason="photo_like", metrics=metrics)
+
+        gray = _thumbnail_gray(image, t.thumb_side)
+        edges = cv2.Canny(gray, 50, 150)
+        edge_count = np.count_nonzero(edges)
+        edge_density = float(edge_count) / float(edges.size or 1)
+        metrics["edge_density"] = edge_density
+
+        components = _count_text_components(gray) if edge_count else 0
+        metrics["text_components"] = float(components)
+        if entropy < t.min_entropy and components == 0:
+            return TriageResult(keep=False, reason="uniform_colour", metrics=metrics)
+        if edge_density < t.min_edge_density and components == 0:
+            return TriageResult(keep=False, reason="low_edge_density", metrics=metrics)
+        if components < t.min_text_components:
+            return TriageResult(keep=False, reason="no_text_candidates", metrics=metrics)
+    except Exception as e:
+        logger.debug(f"图片预筛选异常，保守保留: {e}")
+        return TriageResult(keep=True, reason="triage_error", metrics=metrics)
+
+    return TriageResult(keep=True, reason="ok", metrics=metrics)
+
+
+_stats_locks_lock = threading.Lock()
+
+
+def stats_lock(config) -> threading.Lock:
+    """返回任务级统计（translation_config.image_stats）的锁：同一任务的预处理线程与 hook 线程会同时累计统计。"""
+    lock = getattr(config, "_image_stats_lock", None)
+    if lock is not None:
+        return lock
+    with _stats_locks_lock:
+        lock = getattr(config, "_image_stats_lock", None)
+        if lock is None:
+            lock = threading.Lock()
+            try:
+                setattr(config, "_image_stats_lock", lock)
+            except Exception:
+                pass
+        return lock
+
+
+def record_triage(config, result: TriageResult) -> Dict:
+    """将单张图片的预筛选结果累计到任务级统计（挂在 translation_config.image_stats 上）。"""
+    with stats_lock(config):
+        stats = getattr(config, "image_stats", None)
+        if not isinstance(stats, dict):
+            stats = {"triage_kept": 0, "triage_skipped": 0, "skip_reasons": {}}
+            try:
+                setattr(config, "image_stats", stats)
+            except Exception:
+                pass
+        if result.keep:
+            stats["triage_kept"] = int(stats.get("triage_kept", 0)) + 1
+        else:
+            stats["triage_skipped"] = int(stats.get("triage_skipped", 0)) + 1
+            reasons = stats.setdefault("skip_reasons", {})
+            reasons[result.reason] = int(reasons.get(result.reason, 0)) + 1
+        return stats
+
+
+__all__ = [
+    "TriageThresholds",
+    "TriageResult",
+    "triage_image",
+    "stats_lock",
+    "record_triage",
+]
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""启动预热：导入 BabelDOC 翻译栈，加载共享的布局模型、OCR 引擎与字体并各做一次空推理，使首个任务的耗时接近稳态。
+
+预热在后台线程中执行，服务可立即接受请求；/api/ready 据 warmup_state() 向负载均衡报告就绪状态。
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Tuple
+
+from core.config import WARMUP_ENABLED, IMAGE_WORKERS
+
+logger = logging.getLogger(__name__)
+
+
+# === 进程内共享的布局模型 ===
+
+_layout_model = None
+_layout_lock = threading.Lock()
+
+
+def _load_layout_model():
+    """加载 BabelDOC 布局模型：会话按 OCR 引擎池的并行度设置线程数，并使用优化图缓存。
+
+    OnnxModel 在构造时自行创建 InferenceSession，这里在构造期间临时替换其模块内的 onnxruntime 引用。
+    """
+    import onnxruntime as ort
+    from babeldoc.docvision import doclayout
+    from babeldoc.docvision.base_doclayout import DocLayoutModel
+    from core.ocr_pool import get_ocr_pool, tune_session_options
+    from core.onnx_cache import create_session
+
+    parallel = get_ocr_pool().parallel
+
+    def _session(model, sess_options=None, providers=None, **kwargs):
+        options = tune_session_options(sess_options or ort.SessionOptions(), parallel)
+        return create_session(model, options, providers, name="doclayout", **kwargs)
+
+    original = doclayout.onnxruntime
+    doclayout.onnxruntime = SimpleNamespace(
+        InferenceSession=_session,
+        get_available_providers=original.get_available_providers,
+    )
+    try:
+        return DocLayoutModel.load_onnx()
+    finally:
+        doclayout.onnxruntime = original
+
+
+def get_shared_layout_model():
+    """返回进程内共享的布局模型（首次调用时加载）；InferenceSession.run 可被多个线程同时调用。"""
+    global _layout_model
+    with _layout_lock:
+        if _layout_model is None:
+            _layout_model = _load_layout_model()
+        return _layout_model
+
+
+# === 预热 ===
+
+_state_lock = threading.Lock()
+_state: Dict[str, object] = {
+    "status": "pending" if WARMUP_ENABLED else "disabled",
+    "started_at": None,
+    "finished_at": None,
+    "steps": {},
+}
+
+
+def _sample_text_image():
+    """一张带文字的小图（BGR ndarray），使 OCR 的检测与识别模型都被执行到。"""
+    import numpy as np
+    from PIL import Image, ImageDraw, ImageFont
+    image = Image.new("RGB", (320, 64), "white")
+    ImageDraw.Draw(image).text((10, 16), "Warmup 123", fill="black", font=ImageFont.load_default(28))
+    return np.ascontiguousarray(np.asarray(image)[:, :, ::-1])
+
+
+def _warm_babeldoc() -> None:
+    """导入 BabelDOC 翻译栈并安装图片翻译 hook，首个任务不必在事件循环中同步等待导入。"""
+    from babeldoc.format.pdf import high_level  # noqa: F401
+    from hook.babel_doc_hook import hook
+    hook()
+
+
+def _warm_fonts() -> None:
+    from core.font_manager import font_manager
+    font_manager.preload()
+
+
+def _warm_layout() -> None:
+    import numpy as np
+    model = get_shared_layout_model()
+    model.predict(np.full((256, 256, 3), 255, dtype=np.uint8))
+
+
+def _warm_ocr() -> None:
+    from core.ocr_pool import get_ocr_pool
+    with get_ocr_pool().engine() as engine:
+        engine(_sample_text_image())
+
+
+def _warm_serial_ocr() -> None:
+    """仅在串行模式（无图片工作进程）下预热 API 进程内的 OCR 引擎；进程池模式下 OCR 只在工作进程中运行，由 image_workers 步骤预热。"""
+    from core.image_pool import _worker_count
+    if _worker_count() != 0:
+        return
+    _warm_ocr()
+
+
+def _warm_worker() -> int:
+    """在图片工作进程内执行：进程初始化已加载布局模型，这里再创建 OCR 引擎并空跑一次。"""
+    _warm_ocr()
+    import os
+    return os.getpid()
+
+
+def _warm_image_pool() -> None:
+    """仅在显式配置了正数 IMAGE_WORKERS 时预热；默认（-1 按 CPU 核数）的进程池在首个图片任务时才按需拉起。"""
+    if IMAGE_WORKERS <= 0:
+        return
+    from core.image_pool import get_image_pool, _worker_count
+    pool = get_image_pool()
+    if pool is None:
+        return
+    # 尽力而为：提交与进程数相同的预热任务，进程池按需拉起工作进程
+    futures = [pool.submit(_warm_worker) for _ in range(_worker_count())]
+    pids = {f.result() for f in futures}
+    logger.info(f"图片工作进程预热完成: processes={len(pids)}")
+
+
+_STEPS: List[Tuple[str, Callable[[], None]]] = [
+    ("babeldoc", _warm_babeldoc),
+    ("fonts", _warm_fonts),
+    ("layout_model", _warm_layout),
+    ("ocr", _warm_serial_ocr),
+    ("image_workers", _warm_image_pool),
+]
+
+
+def _set_step(name: str, **values) -> None:
+    with _state_lock:
+        _state["steps"].setdefault(name, {}).update(values)
+
+
+def run_warmup() -> None:
+    """依次执行各预热步骤；单步失败只记录错误，不影响其余步骤（首个任务会按需重试加载）。"""
+    with _state_lock:
+        if _state["status"] in ("running", "ready", "degraded"):
+            return
+        _state["status"] = "running"
+        _state["started_at"] = datetime.now().isoformat()
+    failed = False
+    for name, step in _STEPS:
+        started = time.perf_counter()
+        _set_step(name, status="running")
+        try:
+            step()
+            _set_step(name, status="ok", ms=round((time.perf_counter() - started) * 1000.0, 1))
+        except Exception as e:
+            failed = True
+            _set_step(name, status="failed", ms=round((time.perf_counter() - started) * 1000.0, 1), error=str(e))
+            logger.warning(f"预热步骤失败: {name}, reason={e}")
+    with _state_lock:
+        _state["status"] = "degraded" if failed else "ready"
+        _state["finished_at"] = datetime.now().isoformat()
+    logger.info(f"启动预热完成: status={_state['status']}, steps={_state['steps']}")
+
+
+_thread: Optional[threading.Thread] = None
+
+
+def start_warmup() -> None:
+    """在后台线程中启动预热（幂等）；WARMUP_ENABLED=false 时不执行。"""
+    global _thread
+    if not WARMUP_ENABLED:
+        return
+    with _state_lock:
+        if _thread is not None:
+            return
+        _thread = threading.Thread(target=run_warmup, name="model-warmup", daemon=True)
+    _thread.start()
+
+
+def is_ready() -> bool:
+    with _state_lock:
+        return _state["status"] in ("ready", "degraded", "disabled")
+
+
+def warmup_state() -> Dict[str, object]:
+    with _state_lock:
+        return {
+            "status": _state["status"],
+            "started_at": _state["started_at"],
+            "finished_at": _state["finished_at"],
+            "steps": {k: dict(v) for k, v in _state["steps"].items()},
+        }
+
+
+__all__ = [
+    "get_shared_layout_model",
+    "run_warmup",
+    "start_warmup",
+    "is_ready",
+    "warmup_state",
+]
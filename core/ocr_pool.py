@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""RapidOCR 引擎池：按需创建、有界借还，并统一设置 ONNX Runtime 的线程数与图优化级别。
+
+RapidOCR 实例不是线程安全的（__call__ 会改写实例上的 use_det/text_score 等属性），
+各 ONNX 会话默认又会按 CPU 核数开满线程；多个任务共享一个全局实例时既有竞态，又会严重超订 CPU。
+"""
+import logging
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from core.config import OCR_POOL_SIZE, ONNX_INTRA_OP_THREADS, ONNX_INTER_OP_THREADS, ONNX_GRAPH_OPTIMIZATION
+
+logger = logging.getLogger(__name__)
+
+_GRAPH_LEVELS = {
+    "disable": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+
+# 与 translation_service.MAX_CONCURRENT 的默认值一致：进程内同时运行 OCR 的任务数上限
+_DEFAULT_POOL_SIZE = int(os.getenv("MAX_CONCURRENT_TRANSLATIONS", "5") or "5")
+
+
+def intra_op_threads(parallel: int) -> int:
+    """单个 ONNX 会话的 intra-op 线程数：显式配置优先，否则按 CPU 核数 / 并行调用方数 均分。"""
+    if ONNX_INTRA_OP_THREADS > 0:
+        return ONNX_INTRA_OP_THREADS
+    return max(1, (os.cpu_count() or 1) // max(1, int(parallel)))
+
+
+def tune_session_options(sess_options, parallel: int):
+    """按配置设置 SessionOptions 的线程数与图优化级别（原地修改并返回）。"""
+    import onnxruntime as ort
+
+    sess_options.intra_op_num_threads = intra_op_threads(parallel)
+    sess_options.inter_op_num_threads = ONNX_INTER_OP_THREADS
+    level = _GRAPH_LEVELS.get(ONNX_GRAPH_OPTIMIZATION, "ORT_ENABLE_ALL")
+    sess_options.graph_optimization_level = getattr(ort.GraphOptimizationLevel, level)
+    return sess_options
+
+
+# RapidOCR 在构造时自行创建 SessionOptions 与 InferenceSession；构造期间临时替换其会话工厂以注入上述设置（并使用优化图缓存）
+_build_lock = threading.Lock()
+
+
+def create_ocr_engine(parallel: int = 1):
+    """创建一个 RapidOCR 实例，其 ONNX 会话按 parallel 个并行调用方分配线程。"""
+    import onnxruntime as ort
+    from rapidocr import RapidOCR, OCRVersion
+    from rapidocr.inference_engine.onnxruntime import main as ort_main
+    from core.onnx_cache import create_session
+
+    def _session(model_path, sess_options=None, providers=None, **kwargs):
+        options = tune_session_options(sess_options or ort.SessionOptions(), parallel)
+        return create_session(model_path, options, providers, name=os.path.splitext(os.path.basename(model_path))[0], **kwargs)
+
+    with _build_lock:
+        original = ort_main.InferenceSession
+        ort_main.InferenceSession = _session
+        try:
+            return RapidOCR(params={
+                "Det.ocr_version": OCRVersion.PPOCRV5,
+                "Cls.ocr_version": OCRVersion.PPOCRV4,
+                "Rec.ocr_version": OCRVersion.PPOCRV5,
+            })
+        finally:
+            ort_main.InferenceSession = original
+
+
+class OcrEnginePool:
+    """有界借还池：最多创建 size 个引擎（首次借用时惰性创建），借满时等待归还。"""
+
+    def __init__(self, size: int, parallel: Optional[int] = None):
+        self.size = max(1, int(size))
+        self.parallel = max(1, int(parallel or self.size))
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self.checkouts = 0
+        self.waits = 0
+
+    @contextmanager
+    def engine(self) -> Iterator[object]:
+        """借出一个引擎，退出上下文时归还。"""
+        engine = None
+        try:
+            engine = self._idle.get_nowait()
+        except queue.Empty:
+            create = False
+            with self._lock:
+                if self._created < self.size:
+                    self._created += 1
+                    create = True
+                else:
+                    self.waits += 1
+            if create:
+                try:
+                    engine = create_ocr_engine(self.parallel)
+                    logger.info(f"OCR 引擎已创建: {self._created}/{self.size}, intra_op_threads={intra_op_threads(self.parallel)}")
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                engine = self._idle.get()
+        with self._lock:
+            self.checkouts += 1
+        try:
+            yield engine
+        finally:
+            self._idle.put(engine)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": self.size,
+                "created": self._created,
+                "idle": self._idle.qsize(),
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "intra_op_threads": intra_op_threads(self.parallel),
+                "inter_op_threads": ONNX_INTER_OP_THREADS,
+            }
+
+
+_pool: Optional[OcrEnginePool] = None
+_pool_lock = threading.Lock()
+
+
+def configure_ocr_pool(size: int, parallel: Optional[int] = None) -> OcrEnginePool:
+    """（重新）设置本进程的 OCR 引擎池；图片工作进程初始化时以 size=1、parallel=进程数 调用。"""
+    global _pool
+    with _pool_lock:
+        _pool = OcrEnginePool(size, parallel)
+        return _pool
+
+
+def get_ocr_pool() -> OcrEnginePool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = OcrEnginePool(OCR_POOL_SIZE if OCR_POOL_SIZE > 0 else _DEFAULT_POOL_SIZE)
+        return _pool
+
+
+__all__ = [
+    "intra_op_threads",
+    "tune_session_options",
+    "create_ocr_engine",
+    "OcrEnginePool",
+    "configure_ocr_pool",
+    "get_ocr_pool",
+]
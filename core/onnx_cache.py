@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""ONNX Runtime 优化图的磁盘缓存。
+
+首次加载模型时让 ONNX Runtime 把图优化后的模型写入缓存目录，之后启动直接加载优化后的模型并关闭图优化，
+省去每次启动的图优化耗时。缓存键包含模型内容摘要、优化级别、onnxruntime 版本，以及执行提供程序、
+CPU 架构与 onnxruntime 设备（优化后的图可能含有针对提供程序或指令集的融合算子，换机器或换提供程序时不能复用），
+任何一项变化都会重新生成。
+"""
+import hashlib
+import logging
+import os
+import platform
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+from core.config import ONNX_CACHE_ENABLED, ONNX_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, int] = {"hits": 0, "misses": 0, "errors": 0}
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def _model_digest(model: Union[str, bytes]) -> str:
+    """模型摘要：内存中的模型按内容计算，文件按 路径 + 大小 + 修改时间 计算（避免每次启动读整个文件）。"""
+    h = hashlib.sha1()
+    if isinstance(model, (bytes, bytearray)):
+        h.update(model)
+    else:
+        st = os.stat(model)
+        h.update(f"{os.path.abspath(model)}|{st.st_size}|{st.st_mtime_ns}".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def _target_digest(providers) -> str:
+    """运行环境摘要：执行提供程序（未指定时为当前可用的全部提供程序）、CPU 架构与 onnxruntime 设备。"""
+    import onnxruntime as ort
+    if providers is None:
+        providers = ort.get_available_providers()
+    names = [p if isinstance(p, str) else repr(tuple(p)) for p in providers]
+    h = hashlib.sha1("|".join([*names, platform.machine(), ort.get_device()]).encode("utf-8"))
+    return h.hexdigest()[:8]
+
+
+def cache_path(model: Union[str, bytes], name: str, level_name: str, providers=None) -> Path:
+    import onnxruntime as ort
+    return ONNX_CACHE_DIR / (
+        f"{name}-{_model_digest(model)}-{level_name.lower()}-ort{ort.__version__}-{_target_digest(providers)}.onnx"
+    )
+
+
+def create_session(model: Union[str, bytes], sess_options=None, providers=None, name: str = "model", **kwargs):
+    """创建 InferenceSession，优先加载缓存的优化图；缓存未命中时生成缓存。
+
+    缓存不可用（关闭、目录不可写、生成失败等）时退化为直接创建会话。
+    """
+    import onnxruntime as ort
+
+    options = sess_options or ort.SessionOptions()
+    if not ONNX_CACHE_ENABLED or options.graph_optimization_level == ort.GraphOptimizationLevel.ORT_DISABLE_ALL:
+        return ort.InferenceSession(model, sess_options=options, providers=providers, **kwargs)
+
+    target: Optional[Path] = None
+    try:
+        target = cache_path(model, name, str(options.graph_optimization_level).rsplit(".", 1)[-1], providers)
+        if target.exists():
+            level = options.graph_optimization_level
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+            try:
+                session = ort.InferenceSession(str(target), sess_options=options, providers=providers, **kwargs)
+                _count("hits")
+                logger.debug(f"已加载缓存的 ONNX 优化图: {target.name}")
+                return session
+            except Exception as e:
+                # 缓存损坏：删除后按未命中处理
+                logger.warning(f"ONNX 优化图缓存不可用，重新生成: {target.name}, reason={e}")
+                options.graph_optimization_level = level
+                try:
+                    target.unlink()
+                except Exception:
+                    pass
+    except Exception as e:
+        logger.debug(f"ONNX 优化图缓存查找失败: {e}")
+        target = None
+
+    if target is None:
+        _count("errors")
+        return ort.InferenceSession(model, sess_options=options, providers=providers, **kwargs)
+
+    _count("misses")
+    tmp = target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        options.optimized_model_filepath = str(tmp)
+        session = ort.InferenceSession(model, sess_options=options, providers=providers, **kwargs)
+        # 先写临时文件再原子替换，多个进程同时生成也不会读到半个文件
+        os.replace(tmp, target)
+        logger.info(f"已写入 ONNX 优化图缓存: {target.name}")
+        return session
+    except Exception as e:
+        _count("errors")
+        logger.warning(f"生成 ONNX 优化图缓存失败，直接创建会话: {e}")
+        try:
+            tmp.unlink()
+        except Exception:
+            pass
+        options.optimized_model_filepath = ""
+        return ort.InferenceSession(model, sess_options=options, providers=providers, **kwargs)
+
+
+def cache_stats() -> Dict[str, object]:
+    with _stats_lock:
+        stats: Dict[str, object] = dict(_stats)
+    stats["enabled"] = ONNX_CACHE_ENABLED
+    stats["dir"] = str(ONNX_CACHE_DIR)
+    return stats
+
+
+__all__ = [
+    "cache_path",
+    "create_session",
+    "cache_stats",
+]
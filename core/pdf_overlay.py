@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""“文字覆写”模式的 PDF 写入：覆写字体每个文档只登记一次，每页的译文经同一个 TextWriter 一次写入。
+
+字号与换行在写入前按字体的字符宽度算好（换行规则与 TextWriter.fill_textbox 一致），
+不再依赖 insert_textbox 返回值判断溢出后逐级回退重试。
+"""
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+from core.text_layout import DEFAULT_FONT_RELATIVE_PATH
+
+logger = logging.getLogger(__name__)
+
+# 覆写字号下限（PDF 点）
+MIN_OVERLAY_FONT_SIZE = 4.0
+# 与 fill_textbox 一致：首字相对左边框的缩进为字号的 0.2 倍
+_TOLERANCE = 0.2
+
+# 进程内共享的已解析字体：大字体文件（CJK 字库）只解析一次，各文档复用
+_fonts: Dict[str, "fitz.Font"] = {}
+_fonts_lock = threading.Lock()
+
+
+def _load_font(font_path: str) -> Tuple["fitz.Font", str]:
+    """按字体管理器的解析结果加载字体文件；无可用字体文件时使用 PyMuPDF 内置 helv。返回 (字体, 来源)。"""
+    from core.font_manager import font_manager
+
+    resolved = font_manager.resolve(font_path)
+    with _fonts_lock:
+        font = _fonts.get(resolved)
+        if font is not None:
+            return font, resolved
+        try:
+            font = fitz.Font(fontfile=resolved)
+        except Exception as e:
+            logger.warning(f"[overlay] 字体文件不可用: {resolved} ({e})，使用内置 helv")
+            resolved = "helv"
+            font = _fonts.get(resolved) or fitz.Font("helv")
+        _fonts[resolved] = font
+        return font, resolved
+
+
+class OverlayFontRegistry:
+    """单个文档的覆写字体登记。
+
+    同一个 Font 对象写入同一文档时，MuPDF 只嵌入一份字体（按字体摘要复用资源），
+    BabelDOC 在写出前的字体子集化阶段再将其裁剪为实际用到的字形。
+    字符宽度（字号 1 下）在此缓存：PyMuPDF 逐字符测量较慢，而覆写文字的字符集很小。
+    """
+
+    def __init__(self, font_path: str = DEFAULT_FONT_RELATIVE_PATH):
+        self.font, self.source = _load_font(font_path)
+        asc, dsc = self.font.ascender, self.font.descender
+        self.ascender = asc
+        # 与 fill_textbox 一致：字体未给出有效行高时按 1.2 倍字号
+        self.line_height = (asc - dsc) if asc - dsc > 1 else 1.2
+        self._advances: Dict[str, float] = {}
+        self.pages = 0
+        self.items = 0
+        self.overflows = 0
+
+    def advances(self, text: str) -> List[float]:
+        """text 中各字符在字号 1 下的宽度。"""
+        missing = set(text).difference(self._advances)
+        if missing:
+            chars = "".join(missing)
+            self._advances.update(zip(chars, self.font.char_lengths(chars, fontsize=1)))
+        return [self._advances[c] for c in text]
+
+    def writer(self, pg) -> "PageOverlayWriter":
+        return PageOverlayWriter(self, pg)
+
+    def stats(self) -> Dict[str, object]:
+        return {"font": self.source, "pages": self.pages, "items": self.items, "overflows": self.overflows}
+
+
+def _wrap(registry: OverlayFontRegistry, text: str, width: float) -> List[str]:
+    """按 fill_textbox 的规则换行（width 为字号 1 下的单位宽度）：单词间按空格贪心装行，超宽单词按字符切分。"""
+    space = registry.advances(" ")[0]
+    lines: List[str] = []
+    for line in text.splitlines() or [""]:
+        if sum(registry.advances(line)) <= width:
+            lines.append(line)
+            continue
+        # 超宽单词先按字符切成不超过 width 的片段
+        pieces: List[Tuple[str, float]] = []
+        for word in line.split(" "):
+            widths = registry.advances(word)
+            total = sum(widths)
+            if total <= width:
+                pieces.append((word, total))
+                continue
+            start, acc = 0, 0.0
+            for i, w in enumerate(widths):
+                if acc and acc + w > width:
+                    pieces.append((word[start:i], acc))
+                    start, acc = i, 0.0
+                acc += w
+            if acc:
+                pieces.append((word[start:], acc))
+        current: List[str] = []
+        length = 0.0
+        for piece, w in pieces:
+            if current and length + space + w > width:
+                lines.append(" ".join(current))
+                current, length = [], 0.0
+            length = length + space + w if current else w
+            current.append(piece)
+        lines.append(" ".join(current))
+    return lines
+
+
+def _fits(registry: OverlayFontRegistry, text: str, rect: "fitz.Rect", size: float) -> Optional[List[str]]:
+    """size 下能放进 rect 时返回换行结果，否则返回 None。"""
+    width = (rect.width - size * _TOLERANCE) / size
+    if width <= 0:
+        return None
+    lines = _wrap(registry, text, width)
+    # 首行基线位于 rect 顶部下方 size * asc，末行基线必须严格落在 rect 内
+    if size * registry.ascender + (len(lines) - 1) * size * registry.line_height < rect.height:
+        return lines
+    return None
+
+
+def fit_font_size(registry: OverlayFontRegistry, text: str, rect: "fitz.Rect", font_size: float,
+                  min_size: float = MIN_OVERLAY_FONT_SIZE) -> Tuple[float, List[str], bool]:
+    """计算不超过 font_size、能在 rect 内放下全部文字的最大字号。
+
+    返回 (字号, 换行结果, 是否放得下)；最小字号仍放不下时返回最小字号下能放下的前若干行。
+    字符宽度与字号成正比，二分查找只需对缓存的单位宽度做乘法。
+    """
+    font_size = max(min_size, float(font_size))
+    if rect.is_empty:
+        return font_size, [], False
+    lines = _fits(registry, text, rect, font_size)
+    if lines is not None:
+        return font_size, lines, True
+    lines = _fits(registry, text, rect, min_size)
+    if lines is None:
+        # 最小字号仍放不下：保留能放下的前若干行
+        width = (rect.width - min_size * _TOLERANCE) / min_size
+        room = rect.height - min_size * registry.ascender
+        if width <= 0 or room <= 0:
+            return min_size, [], False
+        keep = int(room / (min_size * registry.line_height)) + 1
+        return min_size, _wrap(registry, text, width)[:keep], False
+    lo, hi = min_size, font_size
+    while hi - lo > 0.25:
+        mid = (lo + hi) / 2.0
+        candidate = _fits(registry, text, rect, mid)
+        if candidate is not None:
+            lo, lines = mid, candidate
+        else:
+            hi = mid
+    return lo, lines, True
+
+
+class PageOverlayWriter:
+    """收集一页的覆写文字，flush() 时经单个 TextWriter 一次写入页面内容流。"""
+
+    def __init__(self, registry: OverlayFontRegistry, pg):
+        self.registry = registry
+        self.pg = pg
+        self._tw: Optional["fitz.TextWriter"] = None
+        self.items = 0
+
+    def add(self, rect: "fitz.Rect", text: str, font_size: float) -> None:
+        """按 fit_font_size 的字号与换行结果左上对齐排入 rect（与 fill_textbox 的排版位置一致）。"""
+        text = str(text or "")
+        if not text.strip():
+            return
+        size, lines, ok = fit_font_size(self.registry, text, rect, font_size)
+        if not ok:
+            self.registry.overflows += 1
+            logger.debug(f"[overlay] 最小字号仍放不下，超出部分截断: rect={tuple(rect)}, text={text[:20]!r}")
+        if not lines:
+            return
+        if self._tw is None:
+            self._tw = fitz.TextWriter(self.pg.rect)
+        x = rect.x0 + size * _TOLERANCE
+        y = rect.y0 + size * self.registry.ascender
+        step = size * self.registry.line_height
+        for line in lines:
+            if line.strip():
+                self._tw.append((x, y), line, font=self.registry.font, fontsize=size)
+            y += step
+        self.items += 1
+
+    def flush(self) -> int:
+        """写入本页收集的文字，返回写入的条目数。"""
+        if self._tw is None:
+            return 0
+        self._tw.write_text(self.pg, color=(0, 0, 0))
+        self._tw = None
+        self.registry.pages += 1
+        self.registry.items += self.items
+        written, self.items = self.items, 0
+        return written
+
+
+__all__ = [
+    "MIN_OVERLAY_FONT_SIZE",
+    "OverlayFontRegistry",
+    "PageOverlayWriter",
+    "fit_font_size",
+]
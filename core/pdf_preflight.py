@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""上传文件预检：不做版面解析，只用 PyMuPDF 读取页数、图片、文字层与加密信息，并粗略估算翻译所需的 LLM token。
+
+结果用于在任务占用并发位之前拒绝无法处理或超出上限的文件，也供调度与前端展示任务规模。
+"""
+import logging
+import math
+import re
+import time
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+from core.config import PREFLIGHT_MAX_PAGES, PREFLIGHT_MAX_IMAGES
+
+logger = logging.getLogger(__name__)
+
+# 预检状态
+PREFLIGHT_PENDING = "pending"
+PREFLIGHT_OK = "ok"
+PREFLIGHT_REJECTED = "rejected"
+
+# CJK 等表意文字按 1 字 ≈ 1 token，其余文字按 4 字符 ≈ 1 token 估算
+_CJK_RE = re.compile("[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+_LATIN_CHARS_PER_TOKEN = 4.0
+# 译文与原文 token 数大致相当：总消耗 ≈ 输入 ×（1 + 输出比例）
+_OUTPUT_TOKEN_RATIO = 1.0
+
+
+def estimate_tokens(text: str) -> int:
+    """估算一段原文的输入 token 数（不含提示词）。"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    other = len(re.sub(r"\s+", "", text)) - cjk
+    return cjk + int(math.ceil(max(0, other) / _LATIN_CHARS_PER_TOKEN))
+
+
+def _rejected(result: Dict[str, object], reason: str) -> Dict[str, object]:
+    result["status"] = PREFLIGHT_REJECTED
+    result["error"] = reason
+    return result
+
+
+def analyze_pdf(pdf_path: Union[str, Path], max_pages: Optional[int] = None,
+                max_images: Optional[int] = None) -> Dict[str, object]:
+    """分析 PDF 并返回预检结果字典（字段与 uploads 表的预检列一一对应）。
+
+    - status: ok / rejected；rejected 时 error 为原因
+    - page_count / text_pages / text_chars: 页数、含文字层的页数与文字层字符数（不含空白）
+    - image_count / image_pixels: 去重后的图片数与总像素面积（按图片原始尺寸）
+    - encrypted: 是否加密（需要密码才能打开的文件直接拒绝）
+    - estimated_tokens: 翻译文字层的 LLM token 估算（输入 + 输出，不含提示词与图片内文字）
+    """
+    import fitz  # PyMuPDF
+
+    max_pages = PREFLIGHT_MAX_PAGES if max_pages is None else max_pages
+    max_images = PREFLIGHT_MAX_IMAGES if max_images is None else max_images
+    started = time.perf_counter()
+    result: Dict[str, object] = {
+        "status": PREFLIGHT_OK,
+        "error": None,
+        "page_count": 0,
+        "text_pages": 0,
+        "text_chars": 0,
+        "image_count": 0,
+        "image_pixels": 0,
+        "encrypted": False,
+        "estimated_tokens": 0,
+    }
+    try:
+        try:
+            doc = fitz.open(str(pdf_path))
+        except Exception as e:
+            return _rejected(result, f"无法解析 PDF: {e}")
+        with doc:
+            if not doc.is_pdf:
+                return _rejected(result, "文件不是 PDF")
+            # needs_pass：需要用户密码才能打开；仅设置了所有者密码（权限限制）的文件仍可读取
+            result["encrypted"] = bool(doc.needs_pass or (doc.metadata or {}).get("encryption"))
+            if doc.needs_pass:
+                return _rejected(result, "PDF 已加密，需要密码才能打开")
+            result["page_count"] = pages = doc.page_count
+            if pages == 0:
+                return _rejected(result, "PDF 不包含任何页面")
+            if max_pages and pages > max_pages:
+                return _rejected(result, f"页数 {pages} 超过上限 {max_pages}")
+
+            seen_xrefs = set()
+            input_tokens = 0
+            for page in doc:
+                for img in page.get_images(full=True):
+                    xref, width, height = img[0], img[2], img[3]
+                    if xref in seen_xrefs:
+                        continue
+                    seen_xrefs.add(xref)
+                    result["image_pixels"] += int(width or 0) * int(height or 0)
+                text = page.get_text("text")
+                chars = len(re.sub(r"\s+", "", text))
+                if chars:
+                    result["text_pages"] += 1
+                    result["text_chars"] += chars
+                    input_tokens += estimate_tokens(text)
+            result["image_count"] = len(seen_xrefs)
+            result["estimated_tokens"] = int(input_tokens * (1.0 + _OUTPUT_TOKEN_RATIO))
+            if max_images and result["image_count"] > max_images:
+                return _rejected(result, f"图片数 {result['image_count']} 超过上限 {max_images}")
+            return result
+    finally:
+        result["ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+
+
+__all__ = [
+    "PREFLIGHT_PENDING",
+    "PREFLIGHT_OK",
+    "PREFLIGHT_REJECTED",
+    "estimate_tokens",
+    "analyze_pdf",
+]
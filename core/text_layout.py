@@ -0,0 +1,453 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import logging
+import math
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from itertools import groupby
+from typing import Dict, List, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from core.config import TEXT_ADVANCE_CACHE_SIZE, TEXT_GLYPH_CACHE_SIZE
+from core.path_util import resource_path
+
+NOTOSANS_FONT_PATH = resource_path('fonts/NotoSans-Medium.ttf')
+DEFAULT_FONT_RELATIVE_PATH = resource_path('fonts/SourceHanSansCN-Regular.ttf')
+# --- 需要使用特殊字体渲染的字符 ---
+SPECIAL_CHARS = {'‼', '⁉'}
+
+logger = logging.getLogger(__name__)
+
+# 建表时预先测量的字符：ASCII 可见字符与常用中文标点
+_PRELOAD_CHARS = "".join(chr(c) for c in range(0x20, 0x7F)) + "，。、；：？！“”‘’（）《》【】—…·「」『』"
+
+
+def line_height(font_size: int) -> int:
+    """横排文字的行高（像素），排版与绘制共用。"""
+    return int(font_size) + 5
+
+
+def _font_key(font) -> Tuple:
+    """字体对象的缓存键：TrueType 字体按 (文件路径, 字号)，其余（如 Pillow 内置字体）按对象标识。"""
+    path = getattr(font, "path", None)
+    if path:
+        return (str(path), int(getattr(font, "size", 0) or 0))
+    return ("<builtin>", id(font))
+
+
+class AdvanceCache:
+    """(字体, 字号, 字符) → advance 宽度（像素）的有界 LRU 缓存，进程内所有任务共享。
+
+    FreeType 的 hinting 会让各字号下的 advance 不严格成比例，因此按字号分别缓存。
+    一次查询整段文字时只对其中的不同字符加锁查找一次，缺失的字符当场测量。
+    """
+
+    def __init__(self, capacity: int = TEXT_ADVANCE_CACHE_SIZE):
+        self.capacity = max(1024, int(capacity))
+        self._data: "OrderedDict[Tuple, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._warm: set = set()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, font, chars) -> Dict[str, float]:
+        """返回 {字符: advance}。"""
+        key = _font_key(font)
+        chars = set(chars)
+        result: Dict[str, float] = {}
+        missing = []
+        with self._lock:
+            if key not in self._warm:
+                # 首次遇到该字体/字号时预先测量常用字符
+                self._warm.add(key)
+                chars |= set(_PRELOAD_CHARS)
+            for c in chars:
+                k = (key, c)
+                v = self._data.get(k)
+                if v is None:
+                    missing.append(c)
+                else:
+                    self._data.move_to_end(k)
+                    result[c] = v
+            self.hits += len(result)
+            self.misses += len(missing)
+        if missing:
+            measured = {}
+            for c in missing:
+                try:
+                    measured[c] = float(font.getlength(c))
+                except Exception:
+                    # 无法测量的字符按 1em 处理
+                    measured[c] = float(getattr(font, "size", 0) or 0)
+            with self._lock:
+                for c, v in measured.items():
+                    self._data[(key, c)] = v
+                while len(self._data) > self.capacity:
+                    self._data.popitem(last=False)
+            result.update(measured)
+        return result
+
+    def widths(self, font, text: str) -> np.ndarray:
+        """返回 text 中每个字符的 advance（像素）。"""
+        table = self.lookup(font, text)
+        return np.fromiter((table[c] for c in text), dtype=np.float64, count=len(text))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._data), "capacity": self.capacity, "hits": self.hits, "misses": self.misses}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._warm.clear()
+
+
+advance_cache = AdvanceCache()
+
+
+class GlyphMaskCache:
+    """(字体, 字号, 字符) → 栅格化后的字形掩码的有界 LRU 缓存，进程内所有任务共享。
+
+    Pillow 每次 draw.text 都会重新让 FreeType 栅格化整段文字，字形本身却高度重复；
+    这里每个字形只栅格化一次，绘制时把掩码拼到一张整块掩码上。
+    值为 (掩码 uint8 数组, 相对笔位置的 x 偏移, 相对行顶的 y 偏移)；空白字符的掩码为 None。
+    """
+
+    def __init__(self, capacity: int = TEXT_GLYPH_CACHE_SIZE):
+        self.capacity = max(256, int(capacity))
+        self._data: "OrderedDict[Tuple, Tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _render(font, char: str) -> Tuple:
+        left, top, right, bottom = font.getbbox(char)
+        if right <= left or bottom <= top:
+            return (None, 0, 0)
+        glyph = Image.new("L", (right - left, bottom - top), 0)
+        ImageDraw.Draw(glyph).text((-left, -top), char, font=font, fill=255)
+        return (np.asarray(glyph), left, top)
+
+    def lookup(self, font, chars) -> Dict[str, Tuple]:
+        """返回 {字符: (掩码, dx, dy)}。"""
+        key = _font_key(font)
+        result: Dict[str, Tuple] = {}
+        missing = []
+        with self._lock:
+            for c in set(chars):
+                k = (key, c)
+                v = self._data.get(k)
+                if v is None:
+                    missing.append(c)
+                else:
+                    self._data.move_to_end(k)
+                    result[c] = v
+            self.hits += len(result)
+            self.misses += len(missing)
+        if missing:
+            rendered = {}
+            for c in missing:
+                try:
+                    rendered[c] = self._render(font, c)
+                except Exception:
+                    rendered[c] = (None, 0, 0)
+            with self._lock:
+                for c, v in rendered.items():
+                    self._data[(key, c)] = v
+                while len(self._data) > self.capacity:
+                    self._data.popitem(last=False)
+            result.update(rendered)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._data), "capacity": self.capacity, "hits": self.hits, "misses": self.misses}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+glyph_cache = GlyphMaskCache()
+
+
+def _load_font(font_path: str, font_size: int):
+    from core.font_manager import get_font
+    return get_font(font_path, font_size)
+
+
+def char_widths(text: str, font_size: int, font_path: str = DEFAULT_FONT_RELATIVE_PATH) -> np.ndarray:
+    """按绘制时实际使用的字体（SPECIAL_CHARS 使用 NotoSans）返回每个字符的像素宽度。"""
+    widths = advance_cache.widths(_load_font(font_path, font_size), text)
+    if SPECIAL_CHARS.intersection(text):
+        special = advance_cache.lookup(_load_font(NOTOSANS_FONT_PATH, font_size), SPECIAL_CHARS.intersection(text))
+        for i, c in enumerate(text):
+            if c in SPECIAL_CHARS:
+                widths[i] = special[c]
+    return widths
+
+
+def _paragraphs(text: str) -> List[str]:
+    """按硬换行切分。与逐字绘制的语义一致：末尾换行不产生空行，中间的空段落保留为空行。"""
+    parts = text.replace("\r", "").split("\n")
+    if parts and parts[-1] == "":
+        parts.pop()
+    return parts
+
+
+def _break_spans(cum: np.ndarray, max_width: float) -> List[Tuple[int, int]]:
+    """在单个段落的累积宽度上贪心断行，返回每行的 [start, end) 字符区间。
+
+    与逐字排版一致：字符放得下（当前行宽 + 字宽 <= max_width）就放入，否则换行；每行至少一个字符。
+    """
+    n = len(cum) - 1
+    if n <= 0:
+        return [(0, 0)]
+    spans: List[Tuple[int, int]] = []
+    start = 0
+    while start < n:
+        end = int(np.searchsorted(cum, cum[start] + max_width, side="right")) - 1
+        end = min(n, max(end, start + 1))
+        spans.append((start, end))
+        start = end
+    return spans
+
+
+@dataclass
+class TextLayout:
+    """排版结果：字号、每行文本及其像素宽度。"""
+    font_size: int
+    lines: List[str] = field(default_factory=list)
+    widths: List[float] = field(default_factory=list)
+
+    @property
+    def line_height(self) -> int:
+        return line_height(self.font_size)
+
+    @property
+    def height(self) -> int:
+        return len(self.lines) * self.line_height
+
+
+class _PreparedText:
+    """缓存各字号下每个段落的字宽前缀和，断行只需在前缀和上 searchsorted。"""
+
+    def __init__(self, text: str, font_path: str):
+        self.font_path = font_path
+        self.paragraphs = _paragraphs(text)
+        self._cums: Dict[int, List[np.ndarray]] = {}
+
+    def cums(self, font_size: int) -> List[np.ndarray]:
+        cached = self._cums.get(font_size)
+        if cached is None:
+            cached = []
+            for para in self.paragraphs:
+                cum = np.zeros(len(para) + 1, dtype=np.float64)
+                if para:
+                    np.cumsum(char_widths(para, font_size, self.font_path), out=cum[1:])
+                cached.append(cum)
+            self._cums[font_size] = cached
+        return cached
+
+    def spans(self, font_size: int, max_width: float) -> List[List[Tuple[int, int]]]:
+        return [_break_spans(cum, float(max_width)) for cum in self.cums(font_size)]
+
+    def line_count(self, font_size: int, max_width: float) -> int:
+        return sum(len(s) for s in self.spans(font_size, max_width))
+
+    def layout(self, font_size: int, max_width: float) -> TextLayout:
+        result = TextLayout(font_size=font_size)
+        for para, cum, spans in zip(self.paragraphs, self.cums(font_size), self.spans(font_size, max_width)):
+            for start, end in spans:
+                result.lines.append(para[start:end])
+                result.widths.append(float(cum[end] - cum[start]))
+        return result
+
+
+def layout_text(text: str, font_size: int, max_width: float,
+                font_path: str = DEFAULT_FONT_RELATIVE_PATH) -> TextLayout:
+    """按给定字号与最大行宽排版（横排）。"""
+    return _PreparedText(text or "", font_path).layout(max(1, int(font_size)), max_width)
+
+
+def fit_text(text: str,
+             box_width: float,
+             box_height: float,
+             font_path: str = DEFAULT_FONT_RELATIVE_PATH,
+             min_size: int = 12,
+             max_size: int = 60) -> TextLayout:
+    """在 box 内横排放置文字，返回能放下的最大字号及其排版结果。
+
+    每个字号的字宽来自缓存的字宽表，前缀和只算一次，断行仅需 O(行数 · log n)；
+    对字号二分通常只涉及 5~6 个字号。
+    即使最小字号也放不下时返回最小字号的排版（由调用方决定是否溢出绘制）。
+    """
+    prepared = _PreparedText(text or "", font_path)
+    low, high = int(min_size), int(max_size)
+    best = low
+    while low <= high:
+        mid = (low + high) // 2
+        if mid <= 0:
+            break
+        fits = prepared.line_count(mid, box_width) * line_height(mid) <= box_height
+        if fits:
+            best = mid
+            low = mid + 1
+        else:
+            high = mid - 1
+    return prepared.layout(max(1, best), box_width)
+
+
+def _runs(line: str):
+    """将一行切分为 (是否特殊字符, 片段)：普通字符的连续片段合并，特殊字符逐个输出。"""
+    for special, group in groupby(line, key=lambda c: c in SPECIAL_CHARS):
+        if special:
+            for c in group:
+                yield True, c
+        else:
+            yield False, "".join(group)
+
+
+def _draw_runs(draw, layout: TextLayout, font, special_font, x: float, y: float,
+               fill: str, stroke_width: int, stroke_fill: str) -> None:
+    """描边绘制：同一字体的连续字符合并为一次 draw.text 调用，片段起点由缓存的 advance 累加。"""
+    current_y = y
+    for line in layout.lines:
+        current_x = x
+        for special, run in _runs(line):
+            run_font = special_font if special else font
+            draw.text((current_x, current_y), run, font=run_font, fill=fill,
+                      stroke_width=stroke_width, stroke_fill=stroke_fill)
+            current_x += float(advance_cache.widths(run_font, run).sum())
+        current_y += layout.line_height
+
+
+def _compose_mask(layout: TextLayout, font, special_font, pad: int) -> np.ndarray:
+    """把缓存的字形掩码按排版位置拼成整块掩码（四周留 pad 以容纳越出 advance 的笔画）。"""
+    width = int(math.ceil(max(layout.widths, default=0))) + 2 * pad
+    height = layout.height + 2 * pad
+    mask = np.zeros((height, width), dtype=np.uint8)
+    chars = set().union(*layout.lines)
+    special = chars & SPECIAL_CHARS if special_font is not None else set()
+    glyphs = glyph_cache.lookup(font, chars - special)
+    advances = advance_cache.lookup(font, chars - special)
+    if special:
+        glyphs.update(glyph_cache.lookup(special_font, special))
+        advances.update(advance_cache.lookup(special_font, special))
+    for row, line in enumerate(layout.lines):
+        pen = 0.0
+        top = pad + row * layout.line_height
+        for c in line:
+            glyph, dx, dy = glyphs[c]
+            if glyph is not None:
+                gx, gy = pad + int(round(pen)) + dx, top + dy
+                h, w = glyph.shape
+                if 0 <= gx and 0 <= gy and gx + w <= width and gy + h <= height:
+                    region = mask[gy:gy + h, gx:gx + w]
+                    np.maximum(region, glyph, out=region)
+            pen += advances[c]
+    return mask
+
+
+def draw_layout(draw, layout: TextLayout, font, x: float, y: float,
+                fill: str = '#231816', stroke_width: int = 0, stroke_fill: str = "#FFFFFF") -> None:
+    """按行绘制排版结果。
+
+    无描边时，每个字形只栅格化一次（GlyphMaskCache），整段文字拼成一张掩码后一次性着色；
+    需要描边时回退为按片段 draw.text：同一字体的连续字符一次调用，仅 SPECIAL_CHARS 使用 NotoSans 逐字绘制。
+    """
+    if not layout.lines:
+        return
+    special_font = None
+    if any(c in SPECIAL_CHARS for line in layout.lines for c in line):
+        try:
+            special_font = _load_font(NOTOSANS_FONT_PATH, layout.font_size)
+        except Exception as e:
+            logger.error(f"加载NotoSans字体失败: {e}，回退到普通字体")
+            special_font = font
+    if stroke_width > 0:
+        _draw_runs(draw, layout, font, special_font or font, x, y, fill, int(stroke_width), stroke_fill)
+        return
+    pad = int(layout.font_size)
+    mask = _compose_mask(layout, font, special_font, pad)
+    draw.bitmap((int(round(x)) - pad, int(round(y)) - pad), Image.fromarray(mask), fill=fill)
+
+
+def draw_multiline_text(draw, text: str, font, x: int, y: int, max_width: int,
+                        fill: str = '#231816',
+                        rotation_angle: int = 0,
+                        enable_stroke: bool = False,
+                        stroke_color: str = "#FFFFFF",
+                        stroke_width: int = 0) -> None:
+    """在 (x, y) 处按 max_width 自动换行绘制文字（支持 \n 硬换行与整块旋转）。"""
+    if not text:
+        return
+    font_path = getattr(font, "path", None) or DEFAULT_FONT_RELATIVE_PATH
+    layout = layout_text(text, getattr(font, "size", 12), max_width, font_path)
+    if not layout.lines:
+        return
+    max_line_width = max(layout.widths, default=0)
+    if max_line_width <= 0 or layout.height <= 0:
+        return
+    stroke = int(stroke_width) if enable_stroke and stroke_width > 0 else 0
+
+    if rotation_angle == 0:
+        draw_layout(draw, layout, font, x, y, fill, stroke, stroke_color)
+        return
+
+    # 旋转：对整块文字进行一次性渲染与旋转
+    original_image = getattr(draw, '_image', None)
+    if original_image is None:
+        logger.warning("无法获取原始图像对象，旋转渲染回退为直接绘制")
+        draw_layout(draw, layout, font, x, y, fill, stroke, stroke_color)
+        return
+
+    block = Image.new('RGBA', (int(math.ceil(max_line_width)), int(layout.height)), (0, 0, 0, 0))
+    draw_layout(ImageDraw.Draw(block), layout, font, 0, 0, fill, stroke, stroke_color)
+    rotated = block.rotate(rotation_angle, resample=Image.Resampling.BICUBIC, expand=True)
+    # 旋转整块并粘贴到原图，确保中心对齐
+    paste_x = int(x + max_width / 2 - rotated.width / 2)
+    paste_y = int(y + layout.height / 2 - rotated.height / 2)
+    original_image.paste(rotated, (paste_x, paste_y), rotated)
+
+
+def estimate_vertical_font_size(text: str, box_width: float, box_height: float,
+                                min_size: int = 12, max_size: int = 60) -> int:
+    """竖排字号估算：每字占 1em 高，列宽按 1.05em 计。"""
+    n = len(text)
+    best = min_size
+    low, high = min_size, max_size
+    while low <= high:
+        mid = (low + high) // 2
+        if mid <= 0:
+            break
+        per_column = max(1, int(box_height / mid))
+        if math.ceil(n / per_column) * mid * 1.05 <= box_width:
+            best = mid
+            low = mid + 1
+        else:
+            high = mid - 1
+    return best
+
+
+__all__ = [
+    "NOTOSANS_FONT_PATH",
+    "DEFAULT_FONT_RELATIVE_PATH",
+    "SPECIAL_CHARS",
+    "line_height",
+    "AdvanceCache",
+    "advance_cache",
+    "GlyphMaskCache",
+    "glyph_cache",
+    "char_widths",
+    "TextLayout",
+    "layout_text",
+    "fit_text",
+    "draw_layout",
+    "draw_multiline_text",
+    "estimate_vertical_font_size",
+]
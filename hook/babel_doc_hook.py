@@ -1,15 +1,14 @@
-import io
+import copy
 import logging
 import fitz  # PyMuPDF
 
-from PIL import Image
 from babeldoc.babeldoc_exception.BabelDOCException import ExtractTextError
 from babeldoc.format.pdf.document_il.backend.pdf_creater import PDFCreater
-from types import MethodType
+from types import MethodType, SimpleNamespace
 
 from babeldoc.format.pdf.document_il.midend.paragraph_finder import ParagraphFinder
 
-from core.image_translate import translate_image, prepare_text_overlay
+from core.image_pool import get_image_pipeline
 
 logger = logging.getLogger(__name__)
 
@@ -26,176 +25,112 @@ old_process = ParagraphFinder.process
 def new_update_page_content_stream(
         self, check_font_exists, page, pdf, translation_config, skip_char: bool = False
     ):
-    # 始终调用原始处理逻辑（文本翻译等）
-    old_update_page_content_stream(self, check_font_exists, page, pdf, translation_config, skip_char)
-
     # 仅在启用实验性图片翻译时执行图片处理
     try:
         enabled = bool(getattr(translation_config, "enable_image_experimental", False))
     except Exception:
         enabled = False
-    if not enabled:
+
+    pipeline = None
+    if enabled:
+        # 先提交本页与下一页图片的布局检测/OCR（进程池中执行），与原始文本处理并行
+        try:
+            pipeline = get_image_pipeline(translation_config)
+            pipeline.submit_page(pdf, page.page_number)
+            next_page = pipeline.next_page_number(getattr(getattr(self, "docs", None), "page", None), page.page_number)
+            if next_page is not None:
+                pipeline.submit_page(pdf, next_page)
+        except Exception as e:
+            logger.error(f"[实验性] 图片预处理提交失败: page={page.page_number}, reason={e}")
+
+    # 始终调用原始处理逻辑（文本翻译等）
+    old_update_page_content_stream(self, check_font_exists, page, pdf, translation_config, skip_char)
+
+    if pipeline is None:
         return
 
     logger.debug("[实验性] 执行图片翻译处理")
     pg = pdf[page.page_number]
-    img_list = pg.get_images(full=True)
     hook_trans(translation_config)
-
-    for idx, img in enumerate(img_list):
-        xref = img[0]
-
-        # 提取图片
-        base_image = pdf.extract_image(xref)
-        image_bytes = base_image["image"]
-        bbox = pg.get_image_bbox(img)  # 获取图片所在位置矩形
-
-        # 处理图片
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-
-        # 判断是否启用“文字覆写”模式
-        overlay_enabled = bool(getattr(translation_config, "enable_image_text_overlay", False))
-        if overlay_enabled:
-            # 1) 生成清理后的背景与覆写项
-            cleaned_image, overlay_items = prepare_text_overlay(image, translation_config)
-
-            # 2) 插入清理后的图片作为背景
-            bg_bytes = io.BytesIO()
-            cleaned_image.save(bg_bytes, format="PNG")
-            bg_bytes = bg_bytes.getvalue()
-            pg.insert_image(bbox, stream=bg_bytes)
-
-            # 3) 字体选择与传递（兼容无 Document.insert_font 的环境）
-            # 说明：部分 PyMuPDF 版本不存在 Document.insert_font。
-            # 这里不进行文档级注册，而是直接在 Page.insert_textbox 调用中传入 fontfile。
-            # 要求：当传入 fontfile 时，fontname 不可为保留名（如 "helv"、"tiro" 等）。
-            font_path = None
+    try:
+        # 翻译在当前线程执行，清理与绘制提交到进程池
+        pipeline.translate_page(page.page_number)
+
+        # 覆写模式：本页所有图片的译文收集到同一个写入器，最后一次写入
+        writer = pipeline.overlay_writer(pg) if pipeline.overlay else None
+        for job in pipeline.pages.get(page.page_number, []):
+            encoded = pipeline.encoded_result(job)
+            if encoded is None:
+                # 无译文变化或处理失败：保持原图
+                continue
+
+            # 在原图之上插入新图：整图模式覆盖整个 bbox，补丁模式只覆盖变化区域（覆写模式下为清理后的背景）
+            for rect, data in encoded.patches:
+                pg.insert_image(_pdf_rect(job.bbox, job.size, rect), stream=data)
+
+            # 判断是否启用“文字覆写”模式
+            if writer is not None:
+                _insert_overlay_text(writer, job.bbox, job.size, pipeline.overlay_items(job), page.page_number)
+        if writer is not None:
             try:
-                from core.path_util import resource_path as _rp
-                font_path = _rp('fonts/SourceHanSansCN-Regular.ttf')
-            except Exception:
-                font_path = None
-            # 默认使用自定义名称，避免与保留名冲突
-            overlay_fontname = "OverlaySansCN"
-
-            # 4) 将文字按坐标映射填充到 PDF
-            x0_pdf, y0_pdf, x1_pdf, y1_pdf = bbox
-            img_w, img_h = image.size
-            scale_x = (x1_pdf - x0_pdf) / float(img_w or 1)
-            scale_y = (y1_pdf - y0_pdf) / float(img_h or 1)
-
-            for item in overlay_items:
-                try:
-                    (ix0, iy0, ix1, iy1) = item.get("region", (0, 0, 0, 0))
-                    text = str(item.get("text", ""))
-                    fontsize_px = float(item.get("font_size", 12) or 12)
-                    # 映射到 PDF 坐标
-                    px0 = x0_pdf + ix0 * scale_x
-                    py0 = y0_pdf + iy0 * scale_y
-                    px1 = x0_pdf + ix1 * scale_x
-                    py1 = y0_pdf + iy1 * scale_y
-
-                    rect = fitz.Rect(px0, py0, px1, py1)
-                    # 插入文本框（左上对齐，尽量在框内排版）
-                    # 将像素字体大小按垂直缩放映射到 PDF 点大小
-                    pdf_fontsize = max(4.0, fontsize_px * float(scale_y))
-                    # 组装字体参数：如有字体文件，按非保留名 + fontfile 方式传入
-                    font_kwargs = {}
-                    try:
-                        import os
-                        if font_path and os.path.exists(font_path):
-                            font_kwargs = {
-                                "fontname": overlay_fontname,
-                                "fontfile": font_path,
-                            }
-                        else:
-                            font_kwargs = {"fontname": "helv"}
-                    except Exception:
-                        font_kwargs = {"fontname": "helv"}
-
-                    # 首选：Page.insert_textbox（带字体文件）。返回值为插入的行数。
-                    inserted_lines = None
-                    try:
-                        inserted_lines = pg.insert_textbox(
-                            rect,
-                            text,
-                            fontsize=pdf_fontsize,
-                            color=(0, 0, 0),
-                            align=0,  # 左上
-                            **font_kwargs,
-                        )
-                    except Exception as e_ins:
-                        inserted_lines = -1
-                        logger.warning(f"[overlay] Page.insert_textbox 异常，将尝试回退: {e_ins}")
-
-                    # 若 Page.insert_textbox 未插入任何文本（返回<=0），执行回退策略
-                    if not isinstance(inserted_lines, (int, float)) or inserted_lines <= 0:
-                        # 回退一：TextWriter + Font
-                        try:
-                            tw = fitz.TextWriter(pg.rect)
-                            tw.color = (0, 0, 0)
-                            font_obj = None
-                            if "fontfile" in font_kwargs and font_kwargs.get("fontfile"):
-                                font_obj = fitz.Font(fontfile=font_kwargs["fontfile"])  # 嵌入自定义字体
-                            tw.fill_textbox(rect, text, font=font_obj, fontsize=pdf_fontsize)
-                            tw.write_text(pg)
-                            logger.debug("[overlay] 已使用 TextWriter 回退写入文本")
-                        except Exception as e_tw:
-                            logger.warning(f"[overlay] TextWriter 回退失败，将尝试 Shape.insert_textbox: {e_tw}")
-                            # 回退二：Shape.insert_textbox（更老版本兼容）
-                            try:
-                                shape = pg.new_shape()
-                                import os
-                                if font_path and os.path.exists(font_path):
-                                    shape.insert_textbox(
-                                        rect,
-                                        text,
-                                        fontsize=pdf_fontsize,
-                                        fontname=overlay_fontname,
-                                        fontfile=font_path,
-                                        align=0,
-                                    )
-                                else:
-                                    shape.insert_textbox(
-                                        rect,
-                                        text,
-                                        fontsize=pdf_fontsize,
-                                        fontname="helv",
-                                        align=0,
-                                    )
-                                shape.commit()
-                                logger.debug("[overlay] 已使用 Shape.insert_textbox 回退写入文本")
-                            except Exception as e_shape:
-                                logger.error(f"[overlay] 文本覆写失败（所有回退均失败）: {e_shape}")
-
-                    # 质量控制：±2px 误差检测（线性映射应趋近 0）
-                    # 将 PDF 坐标逆映射回图像坐标，计算四角误差
-                    def _inv(px, py):
-                        return ((px - x0_pdf) / scale_x, (py - y0_pdf) / scale_y)
-                    corners_img = [(ix0, iy0), (ix1, iy0), (ix1, iy1), (ix0, iy1)]
-                    corners_pdf = [(px0, py0), (px1, py0), (px1, py1), (px0, py1)]
-                    max_err = 0.0
-                    for (px, py), (ix, iy) in zip(corners_pdf, corners_img):
-                        rx, ry = _inv(px, py)
-                        err = max(abs(rx - ix), abs(ry - iy))
-                        if err > max_err:
-                            max_err = err
-                    if max_err > 2.0:
-                        logger.warning(f"[overlay] 坐标映射误差超限: max_err={max_err:.2f}px, region={item.get('region')}, page={page.page_number}")
-                except Exception as e:
-                    logger.error(f"[overlay] 绘制文字失败: {e}")
-        else:
-            # 走原有“整图回写”流程
-            new_image = translate_image(image, translation_config)
-
-            # 转字节流
-            img_bytes = io.BytesIO()
-            new_image.save(img_bytes, format="PNG")
-            img_bytes = img_bytes.getvalue()
-
-            # 在原位置插入新图
-            pg.insert_image(bbox, stream=img_bytes)
-    unhook_trans(translation_config)
+                writer.flush()
+            except Exception as e:
+                logger.error(f"[overlay] 写入页面文字失败: page={page.page_number}, reason={e}")
+    finally:
+        pipeline.release_page(page.page_number)
+        unhook_trans(translation_config)
+
+
+def start_image_prepass(translation_config):
+    """任务开始时启动图片预处理，与 BabelDOC 的版面解析、段落翻译并行（仅在启用实验性图片翻译时）。
+
+    图片翻译使用翻译器的浅拷贝并为其绑定图片 prompt：文本阶段仍在使用原实例，不能在其上临时替换 prompt。
+    """
+    if not bool(getattr(translation_config, "enable_image_experimental", False)):
+        return False
+    translator = copy.copy(translation_config.translator)
+    hook_trans(SimpleNamespace(translator=translator))
+    return get_image_pipeline(translation_config).start_prepass(translation_config.input_file, translator)
+
+
+def _pdf_rect(bbox, image_size, rect):
+    """将图像像素坐标下的矩形映射到图片在 PDF 页面上的 bbox 内。"""
+    x0_pdf, y0_pdf, x1_pdf, y1_pdf = bbox
+    img_w, img_h = image_size
+    scale_x = (x1_pdf - x0_pdf) / float(img_w or 1)
+    scale_y = (y1_pdf - y0_pdf) / float(img_h or 1)
+    x0, y0, x1, y1 = rect
+    return fitz.Rect(x0_pdf + x0 * scale_x, y0_pdf + y0 * scale_y, x0_pdf + x1 * scale_x, y0_pdf + y1 * scale_y)
+
+
+def _insert_overlay_text(writer, bbox, image_size, overlay_items, page_number):
+    """“文字覆写”模式：将译文按图像坐标映射到 PDF 页面（位于清理后的背景图之上），加入本页的写入器。"""
+    x0_pdf, y0_pdf, x1_pdf, y1_pdf = bbox
+    img_w, img_h = image_size
+    scale_x = (x1_pdf - x0_pdf) / float(img_w or 1)
+    scale_y = (y1_pdf - y0_pdf) / float(img_h or 1)
+
+    for item in overlay_items:
+        try:
+            (ix0, iy0, ix1, iy1) = item.get("region", (0, 0, 0, 0))
+            fontsize_px = float(item.get("font_size", 12) or 12)
+            rect = _pdf_rect(bbox, image_size, (ix0, iy0, ix1, iy1))
+            # 将像素字体大小按垂直缩放映射到 PDF 点大小；写入器会在放不下时缩小到恰好放下
+            writer.add(rect, str(item.get("text", "")), fontsize_px * float(scale_y))
+
+            # 质量控制：±2px 误差检测（线性映射应趋近 0）
+            max_err = max(
+                max(abs((px - x0_pdf) / scale_x - ix), abs((py - y0_pdf) / scale_y - iy))
+                for (px, py), (ix, iy) in zip(
+                    [(rect.x0, rect.y0), (rect.x1, rect.y1)],
+                    [(ix0, iy0), (ix1, iy1)],
+                )
+            )
+            if max_err > 2.0:
+                logger.warning(f"[overlay] 坐标映射误差超限: max_err={max_err:.2f}px, region={item.get('region')}, page={page_number}")
+        except Exception as e:
+            logger.error(f"[overlay] 绘制文字失败: {e}")
+
 
 def new_process(self, document):
         with self.translation_config.progress_monitor.stage_start(
@@ -1,4 +1,7 @@
 import asyncio
+import copy
+import random
+import statistics
 import unittest
 from pathlib import Path
 
@@ -7,6 +10,7 @@ import numpy as np
 from babeldoc.docvision.base_doclayout import DocLayoutModel
 from rapidocr import RapidOCR, OCRVersion
 
+from core.image_translate import _group_items_into_lines, _remove_fully_contained_boxes
 from main import TranslationRequest, start_translation
 
 
@@ -41,6 +45,384 @@ class MyTestCase(unittest.TestCase):
         )
 
 
+def _reference_group_items_into_lines(items):
+    """_group_items_into_lines 的原始实现（逐行比较 statistics.fmean），作为等价性测试的参照。"""
+    if not items:
+        return []
+    for it in items:
+        x0, y0, x1, y1 = it["bbox"]
+        it["_height"] = max(1, y1 - y0)
+        it["_cy"] = (y0 + y1) / 2.0
+        it["_x0"] = x0
+        it["_y0"] = y0
+        it["_x1"] = x1
+        it["_y1"] = y1
+    items_sorted = sorted(items, key=lambda d: (d["_cy"], d["_x0"]))
+    heights = [it["_height"] for it in items_sorted]
+    h_med = statistics.median(heights) if heights else 16
+    threshold = max(4, h_med * 0.6)
+    lines = []
+    for it in items_sorted:
+        placed = False
+        for ln in lines:
+            avg_cy = statistics.fmean([x["_cy"] for x in ln])
+            if abs(it["_cy"] - avg_cy) <= threshold:
+                ln.append(it)
+                placed = True
+                break
+        if not placed:
+            lines.append([it])
+    for ln in lines:
+        ln.sort(key=lambda d: d["_x0"])
+        ln_bbox = (min(d["_x0"] for d in ln), min(d["_y0"] for d in ln),
+                   max(d["_x1"] for d in ln), max(d["_y1"] for d in ln))
+        for d in ln:
+            d["_line_bbox"] = ln_bbox
+    return lines
+
+
+def _random_ocr_items(rng: random.Random, n: int):
+    """生成随机 OCR 片段：密集的表格行、抖动的中心线与重复坐标都会覆盖到。"""
+    items = []
+    row_h = rng.randint(8, 40)
+    for i in range(n):
+        row = rng.randint(0, max(1, n // 4))
+        h = max(1, row_h + rng.randint(-row_h // 2, row_h // 2))
+        y0 = row * row_h + rng.randint(-row_h // 2, row_h // 2)
+        x0 = rng.randint(0, 2000)
+        if rng.random() < 0.1 and items:
+            # 完全重复的坐标，检验稳定排序
+            x0, y0 = items[-1]["bbox"][0], items[-1]["bbox"][1]
+        items.append({"text": f"t{i}", "score": 0.9, "bbox": (x0, y0, x0 + rng.randint(1, 300), y0 + h)})
+    return items
+
+
+class LineGroupingTestCase(unittest.TestCase):
+    def test_matches_reference_implementation(self):
+        rng = random.Random(20251018)
+        for trial in range(400):
+            items = _random_ocr_items(rng, rng.randint(0, 120))
+            expected = _reference_group_items_into_lines(copy.deepcopy(items))
+            actual = _group_items_into_lines(copy.deepcopy(items))
+            self.assertEqual(
+                [[(d["text"], d["_line_bbox"]) for d in ln] for ln in expected],
+                [[(d["text"], d["_line_bbox"]) for d in ln] for ln in actual],
+                f"trial={trial}",
+            )
+
+
+def _reference_remove_fully_contained_boxes(boxes, tolerance=2.0):
+    """_remove_fully_contained_boxes 的原始实现（逐对比较），作为等价性测试的参照。"""
+    def _xyxy(b):
+        return tuple(b.xyxy)
+
+    def _area(b):
+        x0, y0, x1, y1 = _xyxy(b)
+        return max(0.0, float(x1 - x0) * float(y1 - y0))
+
+    def _contains(outer, inner):
+        ix0, iy0, ix1, iy1 = _xyxy(inner)
+        ox0, oy0, ox1, oy1 = _xyxy(outer)
+        return (ix0 >= ox0 - tolerance and iy0 >= oy0 - tolerance and
+                ix1 <= ox1 + tolerance and iy1 <= oy1 + tolerance)
+
+    kept = []
+    for b in sorted(list(boxes), key=_area, reverse=True):
+        if not any(_contains(k, b) for k in kept):
+            kept.append(b)
+    return kept
+
+
+class _Box:
+    def __init__(self, xyxy):
+        self.xyxy = xyxy
+
+
+def random_layout_boxes(rng: random.Random, n: int, dtype=None):
+    """生成随机布局框：包含嵌套、边界贴合（容差内）、重复与零面积的框。"""
+    boxes = []
+    for _ in range(n):
+        if boxes and rng.random() < 0.4:
+            # 在已有框内部（或越出不超过容差）生成子框
+            px0, py0, px1, py1 = boxes[rng.randrange(len(boxes))].xyxy
+            x0 = px0 + rng.uniform(-2.5, max(0.0, (px1 - px0) / 2))
+            y0 = py0 + rng.uniform(-2.5, max(0.0, (py1 - py0) / 2))
+            xyxy = (x0, y0, x0 + rng.uniform(0, px1 - x0 + 2.5), y0 + rng.uniform(0, py1 - y0 + 2.5))
+        elif boxes and rng.random() < 0.05:
+            xyxy = tuple(boxes[rng.randrange(len(boxes))].xyxy)
+        else:
+            x0, y0 = rng.uniform(0, 1000), rng.uniform(0, 1000)
+            xyxy = (x0, y0, x0 + rng.uniform(0, 400), y0 + rng.uniform(0, 400))
+        if dtype is not None:
+            xyxy = np.array(xyxy, dtype=dtype)
+        elif rng.random() < 0.3:
+            xyxy = tuple(float(round(v)) for v in xyxy)
+        boxes.append(_Box(xyxy))
+    return boxes
+
+
+class ContainedBoxesTestCase(unittest.TestCase):
+    def test_matches_reference_implementation(self):
+        rng = random.Random(20251018)
+        for trial in range(300):
+            n = rng.choice([0, 1, 2, 5, 10, 40, 150])
+            dtype = np.float32 if trial % 3 == 0 else None
+            boxes = random_layout_boxes(rng, n, dtype)
+            expected = _reference_remove_fully_contained_boxes(boxes)
+            actual = _remove_fully_contained_boxes(boxes)
+            self.assertEqual([id(b) for b in expected], [id(b) for b in actual], f"trial={trial}")
+
+    def test_blocked_containment_matches_reference(self):
+        import core.image_translate as image_translate
+        rng = random.Random(7)
+        boxes = random_layout_boxes(rng, 300)
+        old_block = image_translate._CONTAINMENT_BLOCK
+        image_translate._CONTAINMENT_BLOCK = 64
+        try:
+            actual = _remove_fully_contained_boxes(boxes)
+        finally:
+            image_translate._CONTAINMENT_BLOCK = old_block
+        self.assertEqual([id(b) for b in _reference_remove_fully_contained_boxes(boxes)], [id(b) for b in actual])
+
+
+class TaskListingQueryCountTestCase(unittest.TestCase):
+    """任务列表与 uploads 表一次连接取得原始文件名：查询次数与每页条数、翻页深度无关。"""
+
+    def setUp(self):
+        from sqlalchemy import event
+        from sqlmodel import SQLModel, Session, create_engine
+        from app.db import Upload
+        from app.repositories.history_repository import save_or_update_history
+
+        self.engine = create_engine("sqlite://", connect_args={"check_same_thread": False})
+        SQLModel.metadata.create_all(self.engine)
+        with Session(self.engine) as session:
+            for i in range(40):
+                file_id = f"file-{i:02d}"
+                if i % 4:
+                    session.add(Upload(file_id=file_id, filename=f"原始文件-{i}.pdf"))
+                    session.commit()
+                save_or_update_history({
+                    "task_id": f"task-{i:02d}",
+                    "status": "completed",
+                    "filename": f"{file_id}.pdf",
+                    "owner_ip": "10.0.0.1" if i % 2 else "10.0.0.2",
+                    "config": {"translate_images_experimental": True},
+                }, session)
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self._count)
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def _queries(self, fn, cold=True, **kwargs):
+        from sqlmodel import Session
+        from app.repositories.history_repository import _invalidate_total_cache
+        if cold:
+            _invalidate_total_cache()
+        with Session(self.engine) as session:
+            self.statements.clear()
+            result = fn(session=session, **kwargs)
+            return result, len(self.statements)
+
+    def test_list_tasks_db_query_count_independent_of_page_size(self):
+        from app.repositories.history_repository import list_tasks_db
+
+        counts = set()
+        for page_size in (1, 5, 15, 40):
+            (tasks, total, _), n = self._queries(list_tasks_db, page=1, page_size=page_size)
+            self.assertEqual(40, total)
+            self.assertEqual(page_size, len(tasks))
+            counts.add(n)
+        self.assertEqual({2}, counts)
+
+        (tasks, total, next_cursor), n = self._queries(list_tasks_db, page=2, page_size=15, owner_ip_filter="10.0.0.1")
+        self.assertEqual(2, n)
+        self.assertEqual(20, total)
+        self.assertEqual(5, len(tasks))
+        self.assertIsNone(next_cursor)
+        self.assertTrue(all(t["owner_ip"] == "10.0.0.1" for t in tasks))
+
+        # 总数命中缓存时每页只有一次查询
+        (_, total, _), n = self._queries(list_tasks_db, cold=False, page=2, page_size=15, owner_ip_filter="10.0.0.1")
+        self.assertEqual((1, 20), (n, total))
+
+    def test_list_tasks_db_cursor_pagination(self):
+        from app.repositories.history_repository import list_tasks_db, list_tasks
+
+        expected = [t["task_id"] for t in self._queries(list_tasks)[0]]
+        (tasks, total, cursor), _ = self._queries(list_tasks_db, page_size=7)
+        seen, counts = [t["task_id"] for t in tasks], set()
+        while cursor is not None:
+            (tasks, total, cursor), n = self._queries(list_tasks_db, cold=False, page_size=7, cursor=cursor)
+            self.assertEqual(40, total)
+            seen.extend(t["task_id"] for t in tasks)
+            counts.add(n)
+        self.assertEqual(expected, seen)
+        self.assertEqual({1}, counts)
+
+        with self.assertRaises(ValueError):
+            self._queries(list_tasks_db, page_size=7, cursor="not-a-cursor")
+
+    def test_list_tasks_single_query_with_original_filename(self):
+        from app.repositories.history_repository import list_tasks
+
+        tasks, n = self._queries(list_tasks)
+        self.assertEqual(1, n)
+        self.assertEqual(40, len(tasks))
+        for t in tasks:
+            i = int(t["task_id"][-2:])
+            self.assertEqual(f"原始文件-{i}.pdf" if i % 4 else None, t["original_filename"])
+            self.assertTrue(t["translate_images_experimental"])
+
+
+def _text_image(w, h, text, scale, thickness, org):
+    from PIL import Image
+    canvas = np.full((h, w, 3), 255, np.uint8)
+    cv2.putText(canvas, text, org, cv2.FONT_HERSHEY_SIMPLEX, scale, (0, 0, 0), thickness, cv2.LINE_AA)
+    return Image.fromarray(canvas)
+
+
+def _cjk_line_image(w=600, h=120, n=8, size=60):
+    """合成的一行方块字：每个字由若干横竖撇笔画组成，不依赖 CJK 字体。"""
+    from PIL import Image
+    rng = random.Random(3)
+    canvas = np.full((h, w, 3), 255, np.uint8)
+    y0 = (h - size) // 2
+    for i in range(n):
+        x = 20 + i * (size + 8)
+        cv2.line(canvas, (x + 5, y0 + 8), (x + size - 5, y0 + 8), (0, 0, 0), 4)
+        cv2.line(canvas, (x + size // 2, y0 + 2), (x + size // 2, y0 + size - 2), (0, 0, 0), 4)
+        for _ in range(3):
+            y = rng.randint(y0 + 15, y0 + size - 5)
+            cv2.line(canvas, (x + 8, y), (x + size - 8, y), (0, 0, 0), 3)
+        x1 = rng.randint(x + 8, x + size - 8)
+        cv2.line(canvas, (x1, y0 + size // 2), (x1 - 10, y0 + size - 4), (0, 0, 0), 3)
+    return Image.fromarray(canvas)
+
+
+class ImageTriageTestCase(unittest.TestCase):
+    """图片预筛选：含少量文字的图片必须保留，纯色、噪声与渐变图片跳过。"""
+
+    def assertKept(self, image, keep=True):
+        from core.image_triage import triage_image
+        result = triage_image(image)
+        self.assertEqual(keep, result.keep, f"reason={result.reason}, metrics={result.metrics}")
+        return result
+
+    def test_single_cjk_line_kept(self):
+        self.assertKept(_cjk_line_image())
+
+    def test_single_word_kept(self):
+        self.assertKept(_text_image(500, 300, "STOP", 4.0, 12, (40, 200)))
+        self.assertKept(_text_image(300, 40, "Temperature", 0.9, 2, (10, 30)))
+
+    def test_chart_with_one_label_kept(self):
+        from PIL import Image
+        chart = np.full((400, 640, 3), 255, np.uint8)
+        cv2.rectangle(chart, (60, 40), (600, 340), (0, 0, 0), 2)
+        for i, v in enumerate([120, 200, 90, 250]):
+            cv2.rectangle(chart, (100 + i * 120, 340 - v), (160 + i * 120, 340), (200, 120, 40), -1)
+        cv2.putText(chart, "Revenue 2023", (230, 380), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2, cv2.LINE_AA)
+        self.assertKept(Image.fromarray(chart))
+
+    def test_sparse_text_on_blank_canvas_kept(self):
+        self.assertKept(_text_image(800, 600, "Axis label", 0.6, 1, (350, 580)))
+        self.assertKept(_text_image(800, 600, "Axis label", 0.4, 1, (350, 580)))
+
+    def test_blank_noise_and_gradient_skipped(self):
+        from PIL import Image
+        rng = np.random.default_rng(0)
+        gray_noise = rng.integers(0, 256, (300, 400), dtype=np.uint8)
+        ramp = np.tile(np.linspace(0, 255, 400, dtype=np.uint8), (300, 1))
+        colour_ramp = np.zeros((300, 400, 3), np.uint8)
+        colour_ramp[..., 0] = np.linspace(0, 255, 400, dtype=np.uint8)[None, :]
+        colour_ramp[..., 2] = np.linspace(255, 0, 300, dtype=np.uint8)[:, None]
+        cases = {
+            "uniform_colour": Image.new("RGB", (400, 300), "white"),
+            "photo_like": Image.fromarray(rng.integers(0, 256, (300, 400, 3), dtype=np.uint8)),
+            "no_text_candidates": Image.fromarray(np.stack([gray_noise] * 3, -1)),
+            "low_edge_density": Image.fromarray(np.stack([ramp] * 3, -1)),
+        }
+        for reason, image in cases.items():
+            self.assertEqual(reason, self.assertKept(image, keep=False).reason)
+        self.assertKept(Image.fromarray(colour_ramp), keep=False)
+
+
+class _FakePage:
+    def __init__(self, images):
+        self.images = images
+
+    def get_images(self, full=False):
+        if isinstance(self.images, Exception):
+            raise self.images
+        return self.images
+
+
+class _FakeDoc:
+    def __init__(self, pages, blobs):
+        self.pages = pages
+        self.blobs = blobs
+
+    @property
+    def page_count(self):
+        return len(self.pages)
+
+    def __getitem__(self, page_number):
+        return self.pages[page_number]
+
+    def extract_image(self, xref):
+        return {"image": self.blobs[xref], "ext": "png"}
+
+    def close(self):
+        pass
+
+
+class ImagePrepassTestCase(unittest.TestCase):
+    """图片预处理中途失败时，已登记的图片也要收尾，hook 不会无限等待。"""
+
+    def _run_prepass(self, pages, blobs, **patches):
+        from types import SimpleNamespace
+        from unittest import mock
+        import fitz
+        import core.image_pool as image_pool
+
+        with mock.patch.object(fitz, "open", return_value=_FakeDoc(pages, blobs)), \
+                mock.patch.multiple(image_pool, get_image_pool=mock.Mock(return_value=None), **patches):
+            pipeline = image_pool.ImagePipeline(SimpleNamespace())
+            pipeline._run_prepass("fake.pdf", SimpleNamespace(translator=None))
+        return pipeline
+
+    @staticmethod
+    def _png(color):
+        import io
+        from PIL import Image
+        buf = io.BytesIO()
+        Image.new("RGB", (8, 8), color).save(buf, "PNG")
+        return buf.getvalue()
+
+    def test_get_images_failure_after_claim(self):
+        pipeline = self._run_prepass([_FakePage([(1,)]), _FakePage(RuntimeError("broken page"))], {1: b"not an image"})
+        self.assertEqual(1, len(pipeline._claimed))
+        self.assertTrue(all(entry.done.is_set() for entry in pipeline._claimed))
+        self.assertEqual(1, pipeline.config.image_stats["prepass"]["images"])
+
+    def test_prepare_failure_finishes_remaining_claims(self):
+        from unittest import mock
+
+        blobs = {1: self._png("red"), 2: self._png("blue"), 3: self._png("green")}
+        pipeline = self._run_prepass(
+            [_FakePage([(1,), (2,)]), _FakePage([(3,)])], blobs,
+            triage_image=mock.Mock(side_effect=RuntimeError("triage failed")),
+        )
+        self.assertEqual(3, len(pipeline._claimed))
+        self.assertTrue(all(entry.done.is_set() for entry in pipeline._claimed))
+        self.assertTrue(all(entry.encoded is None for entry in pipeline._claimed))
+
+
 def _save_debug_image(image: np.ndarray, layout):
     debug_image = image.copy()
     for box in layout.boxes: